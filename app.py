@@ -3,19 +3,19 @@ AI-Augmented Customer Onboarding POC
 Streamlit Application for Investor Demonstration
 """
 
+import time
+from uuid import uuid4
+
 import streamlit as st
 from streamlit_option_menu import option_menu
-import views.home as home_page
-import views.onboarding as onboarding_page
-import views.ekyc as ekyc_page
-import views.asset_valuation as asset_valuation_page
-import views.loan_application as loan_application_page
-import views.results as results_page
-import views.architecture as architecture_page
-import views.wireframes as wireframes_page
-import views.investor_pitch as investor_pitch_page
-import views.investor_targeting as investor_targeting_page
-import views.crowdfunding as crowdfunding_page
+from utils import instrumentation, profiling
+from utils.instrumentation import section
+from utils.page_registry import page_icons, page_names, render_page
+from utils.runtime import env_flag
+from utils.session_store import persistence_from_env
+
+rerun_started = time.perf_counter()
+admin_mode = env_flag('INSTRUMENTATION_ADMIN')
 
 # Page configuration
 st.set_page_config(
@@ -57,6 +57,34 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def session_persistence():
+    return persistence_from_env()
+
+@st.cache_resource
+def metrics_endpoint():
+    instrumentation.start_from_env()
+
+metrics_endpoint()
+
+# Rehydrate a persisted application (SESSION_STORE_URL). Signed-in users
+# resume by identity; anonymous sessions only through a signed, expiring
+# ?session= link when SESSION_STORE_LINKS is on
+persistence, session_ids = session_persistence()
+session_id = None
+if persistence is not None:
+    with section('session_restore'):
+        if st.user.get('is_logged_in'):
+            session_id = session_ids.for_user(st.user.get('sub') or st.user.get('email'))
+        elif session_ids.links:
+            session_id = session_ids.open_link(st.query_params.get('session'))
+            if session_id is None:
+                session_id = st.session_state.get('session_id') or uuid4().hex
+                st.query_params['session'] = session_ids.link(session_id)
+        if session_id and st.session_state.get('session_id') != session_id:
+            st.session_state.update(persistence.load(session_id))
+            st.session_state.session_id = session_id
+
 # Initialize session state
 if 'customer_data' not in st.session_state:
     st.session_state.customer_data = {}
@@ -68,15 +96,16 @@ if 'loan_decision' not in st.session_state:
     st.session_state.loan_decision = {}
 
 # Sidebar navigation
-with st.sidebar:
+with st.sidebar, section('sidebar'):
     st.image("https://via.placeholder.com/200x60/1f77b4/ffffff?text=FPT+Banking", use_container_width=True)
     
     selected = option_menu(
         menu_title="Navigation",
-        options=["Home", "Onboarding", "eKYC", "Asset Valuation", "Loan Application", "Results", "Wireframes", "Investor Pitch", "Investor Targeting", "Crowdfunding", "Architecture"],
-        icons=["house", "person-plus", "shield-check", "image", "file-earmark-text", "graph-up", "palette", "briefcase", "search", "piggy-bank", "diagram-3"],
+        options=page_names(),
+        icons=page_icons(),
         menu_icon="cast",
         default_index=0,
+        key="navigation",
         styles={
             "container": {"padding": "5!important", "background-color": "#fafafa"},
             "icon": {"color": "#1f77b4", "font-size": "18px"},
@@ -85,27 +114,25 @@ with st.sidebar:
         }
     )
 
-# Route to appropriate page
-if selected == "Home":
-    home_page.show()
-elif selected == "Onboarding":
-    onboarding_page.show()
-elif selected == "eKYC":
-    ekyc_page.show()
-elif selected == "Asset Valuation":
-    asset_valuation_page.show()
-elif selected == "Loan Application":
-    loan_application_page.show()
-elif selected == "Results":
-    results_page.show()
-elif selected == "Wireframes":
-    wireframes_page.show()
-elif selected == "Investor Pitch":
-    investor_pitch_page.show()
-elif selected == "Investor Targeting":
-    investor_targeting_page.show()
-elif selected == "Crowdfunding":
-    crowdfunding_page.show()
-elif selected == "Architecture":
-    architecture_page.show()
+# ?profile=N (admin mode) profiles this and the next N-1 reruns of the session
+if admin_mode and 'profile' in st.query_params:
+    profiling.arm(st.session_state, st.query_params['profile'],
+                  memory=st.query_params.get('profile_memory') == '1')
+    del st.query_params['profile']
+    st.query_params.pop('profile_memory', None)
+
+# Route to appropriate page (view modules are imported on first visit)
+try:
+    with section(f"page:{selected}"), profiling.capture(selected, st.session_state):
+        render_page(selected)
+finally:
+    # Queue what changed for the write-behind store (also on st.rerun/st.stop)
+    if session_id:
+        with section('session_store'):
+            persistence.track(session_id, st.session_state)
+    instrumentation.record_rerun(selected, time.perf_counter() - rerun_started)
 
+if admin_mode:
+    from views import admin_panel
+    with st.sidebar:
+        admin_panel.show()
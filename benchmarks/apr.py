@@ -0,0 +1,84 @@
+"""
+APR Solver Benchmark
+Accuracy and loans per second of the vectorized APR solver against a scalar reference
+
+Run from the repository root:
+    python -m benchmarks.apr [--loans 1000000] [--verify 2000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from utils.amortization import loan_apr, monthly_payment
+
+FEES = [0.0, 99.0, 199.0, 495.0]
+
+
+def make_book(loans, seed=17):
+    """Synthetic book: amounts, rates, terms, fees and some balloons"""
+    rng = np.random.default_rng(seed)
+    principal = rng.integers(10, 500, loans) * 100.0
+    return {
+        'principal': principal,
+        'annual_rate': rng.choice([0.0, 2.9, 5.5, 6.5, 7.0, 8.0, 19.9], loans),
+        'months': rng.integers(1, 8, loans) * 12,
+        'fees': rng.choice(FEES, loans),
+        'balloon': np.where(rng.random(loans) < 0.25, (principal * rng.uniform(0, 0.5, loans)).round(-2), 0.0),
+    }
+
+
+def reference_apr(advance, cashflows):
+    """Scalar bisection on the monthly rate, to full float precision"""
+    k = np.arange(1, len(cashflows) + 1)
+    lo, hi = -0.9, 10.0
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if (cashflows / (1 + mid) ** k).sum() > advance:
+            lo = mid
+        else:
+            hi = mid
+    return ((1 + (lo + hi) / 2) ** 12 - 1) * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--loans', type=int, default=1_000_000)
+    parser.add_argument('--verify', type=int, default=2000)
+    args = parser.parse_args()
+
+    # No fees and no balloon: the APR is the effective annual rate
+    rates = np.array([1.0, 5.5, 6.5, 19.9])
+    no_fee_error = np.abs(loan_apr(10000, rates, 60) - ((1 + rates / 1200) ** 12 - 1) * 100).max()
+
+    book = make_book(args.verify)
+    found = loan_apr(**book)
+    worst = 0.0
+    for i in range(args.verify):
+        months = int(book['months'][i])
+        payment = monthly_payment(book['principal'][i], book['annual_rate'][i], months, book['balloon'][i])
+        cashflows = np.full(months, payment)
+        cashflows[-1] += book['balloon'][i]
+        expected = reference_apr(book['principal'][i] - book['fees'][i], cashflows)
+        worst = max(worst, abs(found[i] - expected))
+        # A loan priced on its own matches the same loan priced in the batch
+        if round(loan_apr(*(book[c][i] for c in ('principal', 'annual_rate', 'months', 'fees', 'balloon'))), 1) \
+                != round(found[i], 1):
+            raise SystemExit(f"loan {i}: scalar and batch APR disagree")
+
+    book = make_book(args.loans)
+    start = time.perf_counter()
+    result = loan_apr(**book)
+    secs = time.perf_counter() - start
+
+    print(f"no-fee APR    : max error {no_fee_error:.2e} pp vs (1 + r/12)^12 - 1")
+    print(f"vs bisection  : max error {worst:.2e} pp over {args.verify:,} loans")
+    print(f"batch         : {args.loans:>10,} loans  {secs:8.3f}s  {args.loans / secs:>12,.0f} loans/s")
+    print(f"unsolved      : {int(np.isnan(result).sum())}")
+    if no_fee_error > 1e-9 or worst > 1e-9 or np.isnan(result).any():
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Comparable Listings Benchmark
+Build time and k-NN lookup latency of ComparablesIndex on synthetic listings
+
+Run from the repository root:
+    python -m benchmarks.comparables [--listings 3000000] [--queries 2000]
+
+The same generator wrote the sample data/listings/vehicles.csv:
+    python -m benchmarks.comparables --write-sample data/listings/vehicles.csv
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.comparables import MILES_PER_YEAR, ComparablesIndex
+
+# (make, model, list price new) - popular UK used-car models
+MODELS = [
+    ('BMW', '320d', 38000), ('BMW', '520d', 46000), ('BMW', 'X3', 48000),
+    ('Audi', 'A3', 30000), ('Audi', 'A4', 37000), ('Audi', 'Q5', 47000),
+    ('Mercedes-Benz', 'C220d', 41000), ('Mercedes-Benz', 'A180', 30000),
+    ('Volkswagen', 'Golf', 27000), ('Volkswagen', 'Polo', 20000), ('Volkswagen', 'Tiguan', 33000),
+    ('Ford', 'Fiesta', 18000), ('Ford', 'Focus', 24000), ('Ford', 'Kuga', 30000),
+    ('Vauxhall', 'Corsa', 18000), ('Vauxhall', 'Astra', 23000),
+    ('Toyota', 'Yaris', 20000), ('Toyota', 'Corolla', 27000), ('Toyota', 'RAV4', 36000),
+    ('Nissan', 'Qashqai', 28000), ('Kia', 'Sportage', 30000), ('Hyundai', 'Tucson', 31000),
+    ('Tesla', 'Model 3', 43000), ('Land Rover', 'Range Rover Evoque', 45000),
+]
+
+
+def make_listings(rows, seed=11):
+    """Synthetic listings: exponential age depreciation, mileage and noise"""
+    rng = np.random.default_rng(seed)
+    model_idx = rng.integers(0, len(MODELS), rows)
+    year = rng.integers(2008, 2026, rows)
+    age = 2025 - year
+    mileage = np.maximum(0, rng.normal(age * 9000 + 3000, 4000 + age * 1500)).round(-2)
+    new_price = np.array([m[2] for m in MODELS])[model_idx]
+    price = (new_price * 0.85 ** age * (1 - mileage / 400000).clip(0.3) *
+             rng.normal(1.0, 0.06, rows)).clip(500).round(-1).astype(np.int64)
+    return pd.DataFrame({
+        'make': np.array([m[0] for m in MODELS])[model_idx],
+        'model': np.array([m[1] for m in MODELS])[model_idx],
+        'year': year,
+        'mileage': mileage.astype(np.int64),
+        'price': price,
+    })
+
+
+def brute_force(listings, make, model, year, mileage, k):
+    """Distances of the k nearest listings by a full scan of the model's rows"""
+    rows = listings[(listings['make'].str.upper() == make.upper()) &
+                    (listings['model'].str.upper() == model.upper())]
+    dist = (rows['year'].to_numpy() - year) ** 2 + \
+           ((rows['mileage'].to_numpy() - mileage) / MILES_PER_YEAR) ** 2
+    return np.sqrt(np.sort(dist)[:k])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--listings', type=int, default=3_000_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--verify', type=int, default=50)
+    parser.add_argument('--k', type=int, default=25)
+    parser.add_argument('--write-sample', metavar='PATH')
+    parser.add_argument('--sample-rows', type=int, default=6000)
+    args = parser.parse_args()
+
+    if args.write_sample:
+        make_listings(args.sample_rows).to_csv(args.write_sample, index=False)
+        print(f"wrote {args.sample_rows:,} listings to {args.write_sample}")
+        return
+
+    listings = make_listings(args.listings)
+    start = time.perf_counter()
+    index = ComparablesIndex(listings)
+    build_secs = time.perf_counter() - start
+
+    rng = np.random.default_rng(5)
+    queries = [(*MODELS[rng.integers(len(MODELS))][:2], int(rng.integers(2008, 2026)),
+                int(rng.integers(0, 150000))) for _ in range(args.queries)]
+    latencies = []
+    for make, model, year, mileage in queries:
+        start = time.perf_counter()
+        index.search(make, model, year, mileage, args.k)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    mismatches = 0
+    for make, model, year, mileage in queries[:args.verify]:
+        _, found = index.search(make, model, year, mileage, args.k)
+        expected = brute_force(listings, make, model, year, mileage, args.k)
+        mismatches += not np.allclose(found, expected)
+
+    print(f"index build   : {len(index):,} listings, {len(index.groups)} models in {build_secs:.2f}s")
+    print(f"k-NN (k={args.k}) : p50 {np.percentile(latencies, 50):.3f} ms, "
+          f"p99 {np.percentile(latencies, 99):.3f} ms")
+    print(f"mismatches    : {mismatches}/{min(args.verify, len(queries))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Counterfactual Explanation Benchmark
+Time per rejected application for the scalar explainer and the batch API, with parity and flip checks
+
+Run from the repository root:
+    python -m benchmarks.counterfactual [--rows 1000000] [--scalar-rows 20000]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.loan_batch import make_portfolio, to_application
+from utils.ai_simulation import simulate_loan_decision
+from utils.counterfactual import PENNIES, counterfactual, counterfactual_batch
+from utils.loan_batch import simulate_loan_decision_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--scalar-rows', type=int, default=20_000)
+    args = parser.parse_args()
+
+    # Scalar: the decisions carry their explanation; time the explainer on its own
+    loan_decision = getattr(simulate_loan_decision, '__wrapped__', simulate_loan_decision)
+    frame = make_portfolio(args.scalar_rows, seed=5)
+    random.seed(1)
+    decisions = [loan_decision(to_application(row)) for row in frame.itertuples(index=False)]
+    compliance = np.array([d['risk_breakdown']['compliance_risk'] for d in decisions])
+    rejected = [i for i, d in enumerate(decisions) if d['status'] == 'REJECTED']
+    inputs = [{'requested_amount': row.requested_amount, 'annual_income': row.annual_income,
+               'asset_value': row.asset_value, 'condition_score': row.condition_score,
+               'fraud_score': row.fraud_score, 'compliance_risk': compliance[i],
+               'debt_to_income': 0.0, 'ltv_ratio': 0.0}
+              for i, row in zip(rejected, frame.iloc[rejected].itertuples(index=False))]
+    timings = {}
+    for features in inputs:
+        start = time.perf_counter()
+        method = counterfactual(features)['method']
+        timings.setdefault(method, []).append(time.perf_counter() - start)
+
+    batch = counterfactual_batch(frame, compliance)
+    scalar = [decisions[i]['counterfactual'] for i in rejected]
+    agree = all((c['approvable'], c['max_amount'], c['reduction'], c['method']) ==
+                (batch['approvable'].iloc[i], batch['max_amount'].iloc[i], batch['reduction'].iloc[i],
+                 batch['method'].iloc[i]) for i, c in zip(rejected, scalar))
+
+    # Flip check: approved at max_amount, rejected a penny above it
+    flips = batch.iloc[rejected][batch['approvable'].iloc[rejected]]
+    book = frame.loc[flips.index].copy()
+    book['requested_amount'] = flips['max_amount']
+    at_max = simulate_loan_decision_batch(book, compliance_risk=compliance[flips.index])['status']
+    book['requested_amount'] = (np.round(flips['max_amount'] * PENNIES) + 1) / PENNIES
+    above = simulate_loan_decision_batch(book, compliance_risk=compliance[flips.index])['status']
+    flipped = bool((at_max == 'APPROVED').all() and (above == 'REJECTED').all())
+
+    book = make_portfolio(args.rows)
+    decided = simulate_loan_decision_batch(book, seed=0)
+    start = time.perf_counter()
+    explained = counterfactual_batch(book, decided['compliance_risk'])
+    batch_s = time.perf_counter() - start
+    rejected_rows = int((decided['status'] == 'REJECTED').sum())
+
+    for method, seconds in sorted(timings.items()):
+        print(f"scalar {method:<11}: {len(seconds):6,} rejections, p50 {np.median(seconds) * 1e6:6.1f} us, "
+              f"p99 {np.percentile(seconds, 99) * 1e6:6.1f} us")
+    print(f"batch             : {args.rows:,} rows ({rejected_rows:,} rejected) in {batch_s:.2f}s, "
+          f"{explained['approvable'].sum() - (args.rows - rejected_rows):,} rejections approvable at a lower amount")
+    print(f"parity            : scalar and batch {'agree' if agree else 'DISAGREE'} on {len(rejected):,} rejections; "
+          f"{len(flips):,} flip {'at' if flipped else 'NOT at'} max_amount + 1p")
+    if not (agree and flipped):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
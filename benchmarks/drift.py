@@ -0,0 +1,102 @@
+"""
+Drift Monitor Benchmark
+Per-decision cost, sketch accuracy and size, multi-pod merging and drift detection on a shifted book
+
+Run from the repository root:
+    python -m benchmarks.drift [--rows 1000000] [--pods 4]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.instrumentation import per_call_ns, sample_application
+from benchmarks.loan_batch import make_portfolio
+from utils.ai_simulation import simulate_loan_decision
+from utils.drift import METRICS, DriftMonitor, KLLSketch
+from utils.loan_batch import simulate_loan_decision_batch
+
+QUANTILES = [0.01, 0.1, 0.5, 0.9, 0.99]
+
+
+def rank_error(sketch, values):
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(QUANTILES), side='right') / len(values)
+    return float(np.max(np.abs(ranks - QUANTILES)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--pods', type=int, default=4)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Per-decision cost of the hook against the decision itself
+    application = sample_application()
+    loan_decision = getattr(simulate_loan_decision, '__wrapped__', simulate_loan_decision)
+    decision = loan_decision(application)
+    monitor = DriftMonitor()
+    start = time.perf_counter()
+    for _ in range(args.calls * 10):
+        monitor.observe(decision)
+    observe_us = (time.perf_counter() - start) / (args.calls * 10) * 1e6
+    decision_us = per_call_ns(loan_decision, application, args.calls) / 1000
+
+    # Sketch accuracy and size as the stream grows
+    book = simulate_loan_decision_batch(make_portfolio(args.rows), seed=0)
+    scores = np.asarray(book['risk_score'], dtype=float)
+    sizes = []
+    for repeat in (1, 10):
+        sketch = KLLSketch(seed=0)
+        sketch.update_many(np.tile(scores, repeat))
+        sizes.append((len(scores) * repeat, sum(len(items) for items in sketch.levels),
+                      rank_error(sketch, scores)))
+
+    # Pods: each sees a slice; the merged monitor must match one that saw everything
+    single = DriftMonitor(reference_size=args.rows, window_size=args.rows)
+    single.observe_batch(book)
+    pods = []
+    for part in np.array_split(np.arange(args.rows), args.pods):
+        pod = DriftMonitor(reference_size=len(part), window_size=args.rows)
+        pod.observe_batch({metric: np.asarray(book[metric])[part] for metric in METRICS})
+        pods.append(DriftMonitor.from_state(json.loads(json.dumps(pod.state()))))
+    merged = pods[0]
+    for pod in pods[1:]:
+        merged.merge(pod)
+    histograms_equal = all((merged.lifetime.histograms[m] == single.lifetime.histograms[m]).all() for m in METRICS)
+    merged_error = rank_error(merged.lifetime.sketches['risk_score'], scores)
+    state_bytes = len(json.dumps(merged.state()))
+
+    # Drift: reference on the book, a fresh book, then one with lower incomes and asset values and
+    # higher fraud scores
+    monitor = DriftMonitor(reference_size=args.rows, window_size=args.rows)
+    monitor.observe_batch(book)
+    shifted = make_portfolio(args.rows, seed=8)
+    stable_window = simulate_loan_decision_batch(shifted, seed=1)
+    shifted['annual_income'] *= 0.75
+    shifted['asset_value'] *= 0.85
+    shifted['fraud_score'] = np.minimum(shifted['fraud_score'] + 0.05, 1.0)
+    shifted_window = simulate_loan_decision_batch(shifted, seed=1)
+    monitor.observe_batch(stable_window)
+    stable = {row['metric']: row for row in monitor.report()}
+    monitor.observe_batch(shifted_window)
+    moved = {row['metric']: row for row in monitor.report()}
+
+    print(f"observe        : {observe_us:.1f} us per decision ({observe_us / decision_us:.1%} of a "
+          f"{decision_us:.0f} us loan decision)")
+    for n, items, error in sizes:
+        print(f"sketch         : {n:>11,} scores -> {items} items, max rank error {error:.4f}")
+    print(f"pods           : {args.pods} merged, histograms {'match' if histograms_equal else 'DIFFER'}, "
+          f"rank error {merged_error:.4f}, state {state_bytes / 1024:.0f} KiB")
+    for metric in METRICS:
+        print(f"{metric:<15}: new book PSI {stable[metric]['psi']:.3f} ({stable[metric]['status']}), "
+              f"shifted book PSI {moved[metric]['psi']:.3f} KS {moved[metric]['ks']:.3f} "
+              f"({moved[metric]['status']})")
+    if not histograms_equal or merged_error > 0.01:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
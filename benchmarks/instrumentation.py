@@ -0,0 +1,83 @@
+"""
+Instrumentation Overhead Benchmark
+Cost per call of the instrumented wrapper and section timer, enabled vs disabled
+
+Run from the repository root:
+    python -m benchmarks.instrumentation [--calls 200000]
+"""
+
+import argparse
+import time
+
+from utils import instrumentation
+from utils.ai_simulation import simulate_loan_decision
+from utils.amortization import monthly_payment
+from utils.instrumentation import REGISTRY, instrumented, section
+from utils.policy import current_policy
+from utils.workflow import STAGES, shared_resources, synthetic_applicant
+
+
+def _noop(data):
+    return data
+
+
+def sample_application(seed=4):
+    """A simulate_loan_decision input from a headless workflow (seed 4 is approved)"""
+    state, applicant, resources = {}, synthetic_applicant(seed, photos=1, photo_size=(320, 240)), shared_resources()
+    for stage in ('onboarding', 'ekyc', 'asset_valuation'):
+        STAGES[stage](state, applicant, resources)
+    amount = state['customer_data']['requested_amount']
+    return {
+        'customer': state['customer_data'], 'kyc': state['kyc_status'], 'asset': state['asset_data'],
+        'loan_request': {'amount': amount, 'term_years': 5, 'interest_rate': 6.5,
+                         'monthly_payment': monthly_payment(amount, 6.5, 60), 'balloon': 0.0,
+                         'fees': current_policy().arrangement_fee},
+    }
+
+
+def per_call_ns(fn, arg, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(arg)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def sections_ns(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with section('bench'):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--calls', type=int, default=200_000)
+    args = parser.parse_args()
+
+    application = sample_application()
+    loan_decision = getattr(simulate_loan_decision, '__wrapped__', simulate_loan_decision)
+
+    was_enabled = instrumentation.ENABLED
+    try:
+        instrumentation.ENABLED = False
+        disabled = (per_call_ns(instrumented(_noop), application, args.calls), sections_ns(args.calls))
+        instrumentation.ENABLED = True
+        enabled = (per_call_ns(instrumented(_noop), application, args.calls), sections_ns(args.calls))
+        calls = max(args.calls // 100, 100)
+        raw = per_call_ns(loan_decision, application, calls)
+        wrapped = per_call_ns(instrumented(loan_decision), application, calls)
+    finally:
+        instrumentation.ENABLED = was_enabled
+        REGISTRY.reset()
+    bare = per_call_ns(_noop, application, args.calls)
+
+    print(f"bare call          : {bare:8.0f} ns")
+    print(f"disabled           : {disabled[0]:8.0f} ns per call, {disabled[1]:6.0f} ns per section")
+    print(f"enabled            : {enabled[0]:8.0f} ns per call, {enabled[1]:6.0f} ns per section")
+    print(f"loan decision      : {raw / 1000:8.1f} us bare, {wrapped / 1000:.1f} us instrumented "
+          f"({(wrapped - raw) / raw:+.1%})")
+
+
+if __name__ == '__main__':
+    main()
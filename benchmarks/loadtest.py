@@ -0,0 +1,317 @@
+"""
+Multi-Session Load Test
+Scripted AppTest sessions against app.py run concurrently, with per-rerun latency, peak RSS and session-state size
+
+Run from the repository root:
+    python -m benchmarks.loadtest [--sessions 200] [--concurrency 50]
+    python -m benchmarks.loadtest --compare            # fail on regression vs the baseline
+    python -m benchmarks.loadtest --write-baseline     # refresh benchmarks/baselines/loadtest.json
+
+Each session opens the app, navigates with the sidebar menu (its
+"navigation" key), submits the onboarding form, reads the NFC passport,
+runs screening, prices a loan, submits it and opens Results. AppTest
+cannot drive st.file_uploader, so the document and photo upload steps
+are applied to session state with the headless workflow stages instead.
+All sessions share one process, and so the st.cache_resource indexes, as
+the sessions of one Streamlit server do. To let AppTest runs overlap, the
+harness patches Streamlit's Runtime singleton and serialises ast.parse
+for the duration of the run (see harness_patches); rerun latencies
+therefore include time spent waiting for another session's compile of
+app.py, which a real server does not serialise, so compile_ms and
+compile_wait_ms are reported separately. Baselines are machine-specific;
+refresh them on the machine that runs --compare.
+"""
+
+import argparse
+import ast
+import json
+import pickle
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+
+from utils.ai_simulation import simulate_kyc_verification
+from utils.workflow import asset_valuation, shared_resources, synthetic_applicant
+
+APP_PATH = Path(__file__).resolve().parent.parent / 'app.py'
+BASELINE_PATH = Path(__file__).parent / 'baselines' / 'loadtest.json'
+
+ONBOARDING_TEXT = {
+    'First Name': 'first_name', 'Last Name': 'last_name', 'Email': 'email', 'Phone': 'phone',
+    'Address Line 1': 'address_line1', 'City': 'city', 'Postcode': 'postcode',
+    'Employer Name': 'employer_name',
+}
+ONBOARDING_NUMBERS = {
+    'Annual Income': 'annual_income', 'Years at Current Employment': 'years_employed',
+    'Requested Loan Amount': 'requested_amount',
+}
+
+
+@contextmanager
+def harness_patches():
+    """Let AppTest runs overlap in one process, restoring Streamlit and ast afterwards
+
+    Each AppTest run installs a mock Runtime singleton and clears it when
+    it finishes, which would pull the runtime from under any other session
+    still running, so the most recent mock is kept available instead. And
+    each run recompiles app.py, where concurrent ast.parse calls can fail
+    with "AST constructor recursion depth mismatch" on Python 3.11, so
+    parses are serialised. Yields {'parse': [...], 'wait': [...]}, the
+    seconds each ast.parse call spent parsing and waiting for the lock.
+    """
+    saved = {name: Runtime.__dict__[name] for name in ('instance', 'exists')}
+    parse, lock = ast.parse, threading.Lock()
+    last = [None]
+    timings = {'parse': [], 'wait': []}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[0] = cls._instance
+        if last[0] is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    def exists(cls):
+        return cls._instance is not None or last[0] is not None
+
+    def locked_parse(*args, **kwargs):
+        start = time.perf_counter()
+        with lock:
+            acquired = time.perf_counter()
+            try:
+                return parse(*args, **kwargs)
+            finally:
+                timings['wait'].append(acquired - start)
+                timings['parse'].append(time.perf_counter() - acquired)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    ast.parse = locked_parse
+    try:
+        yield timings
+    finally:
+        for name, value in saved.items():
+            setattr(Runtime, name, value)
+        ast.parse = parse
+
+
+def _by_label(widgets, prefix):
+    for widget in widgets:
+        if widget.label.startswith(prefix):
+            return widget
+    raise LookupError(f"no widget labelled {prefix!r}...")
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+def _state_bytes(at):
+    """Pickled size of the session's state, skipping what cannot be pickled"""
+    total = 0
+    for value in at.session_state.to_dict().values():
+        try:
+            total += len(pickle.dumps(value))
+        except Exception:
+            continue
+    return total
+
+
+def run_session(seed, resources, timeout):
+    """Script one user session; returns ([(step, seconds)], state bytes, error)"""
+    applicant = synthetic_applicant(seed, photos=2, photo_size=(640, 480))
+    customer = applicant['customer']
+    reruns = []
+    page = [None]
+
+    def step(name, action, navigate_to=None):
+        page[0] = navigate_to or page[0]
+        # AppTest keeps no value for custom components, so the menu
+        # selection is sent again with every rerun, as the browser does
+        if page[0]:
+            at.session_state['navigation'] = page[0]
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as exc:
+            raise RuntimeError(f"{name}: {type(exc).__name__}: {exc}") from exc
+        reruns.append((name, time.perf_counter() - start))
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+
+    def fill_and_submit_onboarding():
+        for label, field in ONBOARDING_TEXT.items():
+            _by_label(at.text_input, label).input(str(customer[field]))
+        for label, field in ONBOARDING_NUMBERS.items():
+            _by_label(at.number_input, label).set_value(customer[field])
+        _by_label(at.button, 'Submit Application').click().run()
+
+    def upload_document():
+        kyc_status = dict(at.session_state['kyc_status'])
+        kyc_status['document_verified'] = True
+        kyc_status['document_data'] = simulate_kyc_verification(
+            at.session_state['customer_data'], applicant['doc_type'], 'document.jpg')
+        at.session_state['kyc_status'] = kyc_status
+        at.run()
+
+    def upload_photos_and_value():
+        state = {'customer_data': at.session_state['customer_data']}
+        asset_valuation(state, applicant, resources)
+        at.session_state['asset_data'] = state['asset_data']
+        at.run()
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    try:
+        step('open', at.run)
+        step('nav_onboarding', at.run, 'Onboarding')
+        step('submit_onboarding', fill_and_submit_onboarding)
+        step('nav_ekyc', at.run, 'eKYC')
+        step('read_nfc', lambda: _by_label(at.button, '🔍 Read NFC').click().run())
+        step('upload_document', upload_document)
+        step('run_screening', lambda: _by_label(at.button, '🚀 Run Screening').click().run())
+        step('nav_asset_valuation', at.run, 'Asset Valuation')
+        step('value_asset', upload_photos_and_value)
+        step('nav_loan_application', at.run, 'Loan Application')
+        step('move_term_slider', lambda: at.slider[0].set_value(applicant['term_years']).run())
+        step('submit_decision', lambda: _by_label(at.button, '✅ Submit').click().run())
+        step('nav_results', at.run, 'Results')
+        error = None
+    except Exception as exc:  # record and keep the other sessions running
+        error = f"{type(exc).__name__}: {exc}"
+    return reruns, _state_bytes(at), error
+
+
+def summarize(values, scale=1000):
+    values = np.asarray(values, dtype=float) * scale
+    if not values.size:
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': int(values.size), 'p50': round(float(p50), 1),
+            'p95': round(float(p95), 1), 'p99': round(float(p99), 1),
+            'max': round(float(values.max()), 1)}
+
+
+def run_load(sessions, concurrency, timeout=300, seed=0):
+    """Run the sessions and return the report"""
+    resources = shared_resources()
+    start_rss = _rss_mb()
+    peak = {'rss': start_rss}
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.wait(0.1):
+            peak['rss'] = max(peak['rss'], _rss_mb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with harness_patches() as compiles, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='session') as pool:
+        results = list(pool.map(lambda s: run_session(s, resources, timeout),
+                                range(seed, seed + sessions)))
+    wall = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+
+    steps = {}
+    for reruns, _, _ in results:
+        for name, seconds in reruns:
+            steps.setdefault(name, []).append(seconds)
+    errors = [error for _, _, error in results if error]
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 2),
+        'sessions_per_second': round(sessions / wall, 2),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'rerun_ms': {name: summarize(values) for name, values in steps.items()},
+        'all_reruns_ms': summarize([s for values in steps.values() for s in values]),
+        'session_ms': summarize([sum(s for _, s in reruns) for reruns, _, error in results if not error]),
+        'notes': "rerun_ms and session_ms include compile_wait_ms: the harness serialises ast.parse "
+                 "(app.py compilation) across sessions, which a Streamlit server does not",
+        # One entry per ast.parse call
+        'compile_ms': summarize(compiles['parse']),
+        'compile_wait_ms': summarize(compiles['wait']),
+        'compile_wait_seconds': round(sum(compiles['wait']), 2),
+        'start_rss_mb': round(start_rss, 1),
+        'peak_rss_mb': round(max(peak['rss'], resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024), 1),
+        'session_state_bytes': summarize([size for _, size, _ in results], scale=1),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Regressions beyond ``tolerance`` (a fraction) against the baseline"""
+    checks = [('all reruns p95 (ms)', report['all_reruns_ms']['p95'], baseline['all_reruns_ms']['p95']),
+              ('session p95 (ms)', report['session_ms']['p95'], baseline['session_ms']['p95']),
+              ('peak RSS (MB)', report['peak_rss_mb'], baseline['peak_rss_mb']),
+              ('session state p50 (bytes)', report['session_state_bytes']['p50'],
+               baseline['session_state_bytes']['p50'])]
+    for name, summary in report['rerun_ms'].items():
+        if name in baseline['rerun_ms']:
+            checks.append((f"{name} p95 (ms)", summary['p95'], baseline['rerun_ms'][name]['p95']))
+    return [(name, now, then) for name, now, then in checks if now > then * (1 + tolerance)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=300, help="seconds allowed per rerun")
+    parser.add_argument('--compare', action='store_true', help="compare against the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--write-baseline', action='store_true')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    report = run_load(args.sessions, args.concurrency, args.timeout)
+
+    print(f"{report['sessions']} sessions, {report['concurrency']} concurrent: "
+          f"{report['wall_seconds']}s ({report['sessions_per_second']} sessions/s), "
+          f"{report['errors']} errors")
+    print(f"{'rerun':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}   (ms)")
+    for name, s in list(report['rerun_ms'].items()) + [('all reruns', report['all_reruns_ms']),
+                                                       ('whole session', report['session_ms'])]:
+        if s['count']:
+            print(f"{name:<22}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}{s['max']:>9.1f}")
+    for name in ('compile_ms', 'compile_wait_ms'):
+        s = report[name]
+        if s['count']:
+            print(f"{name.replace('_ms', '').replace('_', ' '):<22}{s['p50']:>9.1f}{s['p95']:>9.1f}"
+                  f"{s['p99']:>9.1f}{s['max']:>9.1f}   per ast.parse (serialised by the harness)")
+    print(f"compile wait  : {report['compile_wait_seconds']}s in total across all reruns")
+    print(f"RSS           : {report['start_rss_mb']} MB at start, {report['peak_rss_mb']} MB peak")
+    print(f"session state : p50 {report['session_state_bytes'].get('p50', 0):,.0f} bytes, "
+          f"max {report['session_state_bytes'].get('max', 0):,.0f} bytes")
+    for error in report['error_samples']:
+        print(f"error         : {error}")
+
+    if args.write_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"wrote baseline {args.baseline}")
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        if (baseline['sessions'], baseline['concurrency']) != (args.sessions, args.concurrency):
+            print(f"warning       : baseline ran {baseline['sessions']} sessions at "
+                  f"{baseline['concurrency']} concurrent; latencies are not comparable")
+        regressions = compare(report, baseline, args.tolerance)
+        for name, now, then in regressions:
+            print(f"REGRESSION    : {name} {now:,.1f} vs baseline {then:,.1f}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    if report['errors']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Loan Decision Benchmark
+Rows per second for simulate_loan_decision (scalar loop) vs the batch API
+
+Run from the repository root:
+    python -m benchmarks.loan_batch [--rows 1000000] [--scalar-rows 50000]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.ai_simulation import simulate_loan_decision
+from utils.loan_batch import simulate_loan_decision_batch
+
+RESULT_FIELDS = ['status', 'approved_amount', 'interest_rate', 'term_years',
+                 'monthly_payment', 'balloon_payment', 'fees', 'apr', 'risk_score']
+BREAKDOWN_FIELDS = ['credit_risk', 'asset_risk', 'fraud_risk', 'compliance_risk']
+
+
+def make_portfolio(rows, seed=7):
+    """Synthetic application book with realistic spreads"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'requested_amount': rng.integers(1, 101, rows) * 1000.0,
+        'annual_income': rng.integers(15, 151, rows) * 1000.0,
+        'asset_value': np.round(rng.uniform(3000, 60000, rows), 2),
+        'ltv_cap': rng.choice([0.65, 0.70, 0.75], rows),
+        'condition_score': np.round(rng.uniform(2, 10, rows), 1),
+        'fraud_score': np.round(rng.uniform(0.0, 0.5, rows), 2),
+        'term_years': rng.integers(1, 8, rows),
+        # A quarter of the book on PCP-style balloon terms
+        'balloon': np.where(rng.random(rows) < 0.25, rng.integers(1, 31, rows) * 500.0, 0.0),
+        'fees': rng.choice([0.0, 99.0, 199.0, 495.0], rows),
+    })
+
+
+def to_application(row):
+    return {
+        'customer': {'annual_income': row.annual_income},
+        'asset': {
+            'market_value': row.asset_value,
+            'ltv_ratio': row.ltv_cap,
+            'condition_score': row.condition_score,
+        },
+        'kyc': {'screening': {'fraud_check': {'fraud_score': row.fraud_score}}},
+        'loan_request': {'amount': row.requested_amount, 'term_years': int(row.term_years),
+                         'balloon': row.balloon, 'fees': row.fees},
+    }
+
+
+def run_scalar(frame, seed=11):
+    """Loop simulate_loan_decision; returns (decisions, compliance draws, seconds)"""
+    applications = [to_application(row) for row in frame.itertuples(index=False)]
+
+    # simulate_loan_decision makes exactly one random.uniform draw per call,
+    # so replaying the seed yields the compliance_risk values it used
+    random.seed(seed)
+    compliance = [round(random.uniform(0.05, 0.15), 2) for _ in applications]
+
+    random.seed(seed)
+    start = time.perf_counter()
+    decisions = [simulate_loan_decision(app) for app in applications]
+    return decisions, np.array(compliance), time.perf_counter() - start
+
+
+def mismatches(decisions, batch):
+    """Count rows where any output field differs from the scalar result"""
+    bad = 0
+    for i, decision in enumerate(decisions):
+        expected = [decision[f] for f in RESULT_FIELDS]
+        expected += [decision['risk_breakdown'][f] for f in BREAKDOWN_FIELDS]
+        got = [batch[f][i] for f in RESULT_FIELDS + BREAKDOWN_FIELDS]
+        if any(e != g for e, g in zip(expected, got)):
+            bad += 1
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--scalar-rows', type=int, default=50_000)
+    args = parser.parse_args()
+
+    sample = make_portfolio(args.scalar_rows)
+    decisions, compliance, scalar_secs = run_scalar(sample)
+    checked = simulate_loan_decision_batch(sample, compliance_risk=compliance)
+    bad = mismatches(decisions, checked)
+
+    book = make_portfolio(args.rows)
+    start = time.perf_counter()
+    simulate_loan_decision_batch(book, seed=0)
+    batch_secs = time.perf_counter() - start
+
+    scalar_rate = args.scalar_rows / scalar_secs
+    batch_rate = args.rows / batch_secs
+    print(f"scalar loop : {args.scalar_rows:>10,} rows  {scalar_secs:8.3f}s  {scalar_rate:>14,.0f} rows/s")
+    print(f"batch       : {args.rows:>10,} rows  {batch_secs:8.3f}s  {batch_rate:>14,.0f} rows/s")
+    print(f"speed-up    : {batch_rate / scalar_rate:,.1f}x")
+    print(f"parity      : {args.scalar_rows - bad:,}/{args.scalar_rows:,} rows identical to scalar")
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
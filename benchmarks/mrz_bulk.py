@@ -0,0 +1,64 @@
+"""
+MRZ Bulk Validation Benchmark
+Throughput of validate_bulk vs per-document decode_td3 on a synthetic back book
+
+Run from the repository root:
+    python -m benchmarks.mrz_bulk [--rows 1000000] [--corrupt 0.01]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from utils.mrz import decode_td3, encode_td3, validate_bulk
+
+SURNAMES = ['SMITH', 'JONES', 'TAYLOR', 'BROWN', 'WILLIAMS', 'OBRIEN', 'MUELLER']
+GIVEN = ['JOHN', 'MARY', 'AHMED', 'ANNA MARIA', 'LI', 'OLUWASEUN']
+
+
+def make_mrzs(rows, corrupt, seed=3):
+    """Synthetic TD3 MRZs; a `corrupt` fraction get one digit flipped"""
+    rng = random.Random(seed)
+    templates = []
+    for i in range(min(rows, 5000)):
+        dob = date(1950, 1, 1) + timedelta(days=rng.randrange(20000))
+        expiry = date.today() + timedelta(days=rng.randrange(3650))
+        templates.append(''.join(encode_td3(
+            f"{rng.randrange(10**9):09d}", 'GBR', 'GBR', rng.choice(SURNAMES),
+            rng.choice(GIVEN), dob, rng.choice('MF'), expiry)))
+    mrzs = [templates[i % len(templates)] for i in range(rows)]
+    for i in rng.sample(range(rows), int(rows * corrupt)):
+        s = mrzs[i]
+        pos = 44 + rng.randrange(9)
+        mrzs[i] = s[:pos] + str((int(s[pos]) + 1) % 10) + s[pos + 1:]
+    return mrzs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--scalar-rows', type=int, default=50_000)
+    parser.add_argument('--corrupt', type=float, default=0.01)
+    args = parser.parse_args()
+
+    mrzs = make_mrzs(args.rows, args.corrupt)
+
+    sample = mrzs[:args.scalar_rows]
+    start = time.perf_counter()
+    scalar_valid = [decode_td3([m[:44], m[44:]])['valid'] for m in sample]
+    scalar_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = validate_bulk(mrzs)
+    bulk_secs = time.perf_counter() - start
+
+    agree = sum(a == b for a, b in zip(scalar_valid, result['valid'][:len(sample)]))
+    print(f"decode_td3    : {len(sample) / scalar_secs * 60 / 1e6:8.2f} M MRZ/min")
+    print(f"validate_bulk : {args.rows / bulk_secs * 60 / 1e6:8.2f} M MRZ/min "
+          f"({args.rows:,} rows in {bulk_secs:.2f}s, {int((~result['valid']).sum()):,} invalid)")
+    print(f"agreement     : {agree:,}/{len(sample):,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Photo Hash Index Benchmark
+Query latency of the multi-index pHash table vs a brute-force Hamming scan, and journal compaction across restarts
+
+Each restart runs in a fresh interpreter (its own pid, so its own
+journal); every third one snapshots. The journal count must stay bounded
+and every restart must see every hash recorded before it.
+
+Run from the repository root:
+    python -m benchmarks.photo_hash [--hashes 2000000] [--queries 500]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.photo_hash import MATCH_DISTANCE, PhotoHashIndex, load_index, phash, popcount
+
+SNAPSHOT_EVERY = 3
+
+# One process lifetime: load the shared index, record a few photos, exit
+_RESTART_PROBE = """
+import json, sys
+from utils.photo_hash import load_index
+path, run, every = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+index = load_index(path)
+seen = len(index)
+index.record([(run * 1000 + i, f"APP-restart-{run}") for i in range(3)])
+if run % every == every - 1:
+    index.save(path)
+print(json.dumps({'seen': seen}))
+"""
+
+
+def restarts(runs):
+    """(max journals on disk, journals after the last run, runs that missed hashes, final size)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'photo_hashes.npz'
+        most, missed = 0, 0
+        for run in range(runs):
+            out = subprocess.run([sys.executable, '-c', _RESTART_PROBE, str(path), str(run), str(SNAPSHOT_EVERY)],
+                                 check=True, capture_output=True, text=True).stdout
+            missed += json.loads(out.strip().splitlines()[-1])['seen'] != run * 3
+            most = max(most, len(list(path.parent.glob('*.journal'))))
+        return most, len(list(path.parent.glob('*.journal'))), missed, len(load_index(path))
+
+
+def make_queries(hashes, count, rng):
+    """Stored hashes with 0..MATCH_DISTANCE bits flipped, plus unrelated ones"""
+    queries = []
+    for i in range(count):
+        if i % 2:
+            queries.append(int(rng.integers(0, 2**63, dtype=np.uint64)) * 2 + 1)
+            continue
+        value = int(hashes[rng.integers(len(hashes))])
+        for bit in rng.choice(64, rng.integers(0, MATCH_DISTANCE + 1), replace=False):
+            value ^= 1 << int(bit)
+        queries.append(value)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--hashes', type=int, default=2_000_000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--verify', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=9)
+    parser.add_argument('--restarts', type=int, default=3 * SNAPSHOT_EVERY)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    hashes = rng.integers(0, 2**64 - 1, args.hashes, dtype=np.uint64, endpoint=True)
+    refs = [f"APP-{i:08d}" for i in range(args.hashes)]
+
+    start = time.perf_counter()
+    index = PhotoHashIndex(hashes, refs)
+    build_secs = time.perf_counter() - start
+
+    queries = make_queries(hashes, args.queries, rng)
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.query(query))
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    start = time.perf_counter()
+    mismatches = 0
+    for query, found in zip(queries[:args.verify], results):
+        distances = popcount(hashes ^ np.uint64(query))
+        expected = sorted(distances[distances <= MATCH_DISTANCE].tolist())
+        mismatches += expected != sorted(d for _, d in found)
+    brute_ms = (time.perf_counter() - start) / min(args.verify, len(queries)) * 1000
+
+    pixels = rng.integers(0, 256, (384, 512), dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(200):
+        phash(pixels)
+    phash_ms = (time.perf_counter() - start) / 200 * 1000
+
+    print(f"index build   : {args.hashes:,} hashes in {build_secs:.2f}s")
+    print(f"query         : p50 {np.percentile(latencies, 50):.2f} ms, "
+          f"p99 {np.percentile(latencies, 99):.2f} ms (radius {MATCH_DISTANCE})")
+    print(f"brute force   : {brute_ms:.2f} ms/query")
+    print(f"phash         : {phash_ms:.2f} ms/photo (512px analysis copy)")
+    print(f"mismatches    : {mismatches}/{min(args.verify, len(queries))}")
+
+    most, left, missed, size = restarts(args.restarts)
+    print(f"restarts      : {args.restarts} processes, at most {most} journals on disk, {left} left, "
+          f"{missed} missed earlier hashes, {size}/{args.restarts * 3} hashes after")
+    if mismatches or most > SNAPSHOT_EVERY or missed or size != args.restarts * 3:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Decision Policy Benchmark
+Compiled policy rules vs interpreting the policy document per call, scalar and batch, and measured rule selectivity
+
+Run from the repository root:
+    python -m benchmarks.policy [--rows 200000]
+"""
+
+import argparse
+import operator
+import time
+
+import numpy as np
+
+from benchmarks.loan_batch import make_portfolio
+from utils.loan_batch import batch_features, simulate_loan_decision_batch
+from utils.policy import MEASURE_COSTS, compile_policy, current_policy, read_policy
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+             '==': operator.eq, '!=': operator.ne}
+
+
+def interpreted_approve(document, m):
+    """Walk the policy's rules on every call, in file order"""
+    return all(OPERATORS[rule['op']](m[rule['measure']], rule['value'])
+               for rule in document['approval_rules'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    document = read_policy()
+    start = time.perf_counter()
+    for _ in range(100):
+        compile_policy(document)
+    compile_ms = (time.perf_counter() - start) / 100 * 1000
+    policy = current_policy()
+
+    portfolio = make_portfolio(args.rows)
+    book = simulate_loan_decision_batch(portfolio, seed=0)
+    columns = {name: np.asarray(book[name], dtype=float)
+               for name in ('credit_risk', 'asset_risk', 'fraud_risk', 'compliance_risk',
+                            'debt_to_income', 'ltv_ratio')}
+    columns['overall_risk'] = policy.overall_risk(columns)
+    rows = [dict(zip(columns, values)) for values in zip(*(c.tolist() for c in columns.values()))]
+
+    start = time.perf_counter()
+    compiled = [policy.approve(m) for m in rows]
+    compiled_s = time.perf_counter() - start
+    start = time.perf_counter()
+    interpreted = [interpreted_approve(document, m) for m in rows]
+    interpreted_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = policy.approve_batch(columns)
+    batch_s = time.perf_counter() - start
+
+    # From features: score() computes every risk component, approves() stops at a failed ratio rule
+    features = batch_features(portfolio, seed=0)
+    feature_rows = [dict(zip(features, values))
+                    for values in zip(*(np.asarray(column).tolist() for column in features.values()))]
+    start = time.perf_counter()
+    scored = [policy.score(f)[2] for f in feature_rows]
+    score_s = time.perf_counter() - start
+    start = time.perf_counter()
+    short = [policy.approves(f) for f in feature_rows]
+    approves_s = time.perf_counter() - start
+    early = np.ones(args.rows, dtype=bool)
+    for rule in document['approval_rules']:
+        if MEASURE_COSTS[rule['measure']] < 2:
+            early &= OPERATORS[rule['op']](columns[rule['measure']], rule['value'])
+
+    # Share of the book failing each rule, against the selectivity the policy declares
+    selectivity = [(rule.get('id', rule['measure']), rule.get('selectivity', 0.0),
+                    1 - OPERATORS[rule['op']](columns[rule['measure']], rule['value']).mean())
+                   for rule in document['approval_rules']]
+
+    agree = ((np.array(compiled) == np.array(interpreted)).all() and (np.array(compiled) == batch).all()
+             and scored == short and (np.array(scored) == policy.score_batch(features)['approved']).all())
+    print(f"policy        : version {policy.version}, rules checked as {' -> '.join(policy.rule_order)}")
+    print(f"compile       : {compile_ms:.3f} ms")
+    print(f"interpreted   : {interpreted_s / args.rows * 1e9:8.0f} ns per application")
+    print(f"compiled      : {compiled_s / args.rows * 1e9:8.0f} ns per application "
+          f"({interpreted_s / compiled_s:.1f}x)")
+    print(f"batch         : {batch_s / args.rows * 1e9:8.1f} ns per application")
+    print(f"score         : {score_s / args.rows * 1e9:8.0f} ns per application from features")
+    print(f"approves      : {approves_s / args.rows * 1e9:8.0f} ns per application from features "
+          f"({score_s / approves_s:.1f}x, short-circuits on {1 - early.mean():.1%})")
+    for name, declared, measured in selectivity:
+        print(f"selectivity   : {name:<15} declared {declared:.2f}, measured {measured:.3f}")
+    print(f"approved      : {batch.mean():.1%}; compiled, interpreted, batch, score and approves "
+          f"{'agree' if agree else 'DISAGREE'}")
+    if not agree:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
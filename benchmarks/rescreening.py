@@ -0,0 +1,88 @@
+"""
+Incremental Rescreening Benchmark
+Nightly delta rescreen vs a full rescreen of the customer base, with a parity check
+
+Run from the repository root:
+    python -m benchmarks.rescreening [--entries 100000] [--customers 200000]
+"""
+
+import argparse
+import copy
+import random
+import time
+
+from benchmarks.screening import NameModel, make_entries, typo
+from utils.screening import (ScreeningIndex, build_customer_index, diff_lists,
+                             rescreen_delta)
+
+
+def make_delta(entries, rng, names, added=60, changed=25, removed=15):
+    """Next day's list: a few designations, alias updates and delistings"""
+    new_entries = copy.deepcopy(entries)
+    rng.shuffle(new_entries)
+    del new_entries[:removed]
+    for entry in new_entries[:changed]:
+        entry['aliases'].append(typo(rng, names.name()))
+    start = len(entries)
+    new_entries.extend(make_entries(added, rng, names))
+    for i, entry in enumerate(new_entries[-added:]):
+        entry['id'] = f"NEW-{start + i:07d}"
+    return new_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--customers', type=int, default=200_000)
+    parser.add_argument('--full-sample', type=int, default=5_000,
+                        help="customers screened to extrapolate the full-pass time")
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    names = NameModel(rng)
+    old_entries = make_entries(args.entries, rng, names)
+    customers = [(f"CUST-{i:08d}", names.name()) for i in range(args.customers)]
+    # Seed some of today's designations among existing (sampled) customers
+    new_entries = make_delta(old_entries, rng, names)
+    for entry in new_entries[-10:]:
+        customers[rng.randrange(min(args.full_sample, len(customers)))] = (f"CUST-{entry['id']}", entry['name'])
+
+    start = time.perf_counter()
+    customer_index = build_customer_index(customers)
+    customer_secs = time.perf_counter() - start
+
+    old_index = ScreeningIndex(old_entries)
+    # Yesterday's results; only a sample is screened here to keep setup short
+    previous_hits = dict(zip((c for c, _ in customers),
+                             old_index.search_batch(n for _, n in customers[:args.full_sample])))
+
+    start = time.perf_counter()
+    new_index = ScreeningIndex(new_entries)
+    build_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full = new_index.search_batch(n for _, n in customers[:args.full_sample])
+    full_secs = (time.perf_counter() - start) * len(customers) / args.full_sample
+
+    start = time.perf_counter()
+    delta = diff_lists(old_entries, new_entries)
+    result = rescreen_delta(new_index, customer_index, delta, previous_hits)
+    delta_secs = time.perf_counter() - start
+
+    # Yesterday's hits updated with the delta must equal a full rescreen of the sample
+    mismatches = [c for (c, _), hits in zip(customers[:args.full_sample], full)
+                  if result['hits'].get(c, previous_hits[c]) != hits]
+
+    print(f"customer index : {len(customers):,} customers in {customer_secs:.2f}s (built once, reused nightly)")
+    print(f"list index     : {len(new_index):,} aliases rebuilt in {build_secs:.2f}s")
+    print(f"delta          : {result['delta']}")
+    print(f"delta rescreen : {result['rescreened']:,} customers in {delta_secs:.2f}s "
+          f"({len(result['new_matches'])} new matches, {len(result['cleared'])} cleared)")
+    print(f"full rescreen  : ~{full_secs:,.0f}s (extrapolated from {args.full_sample:,} customers)")
+    print(f"parity         : {len(mismatches)} of {args.full_sample:,} sampled customers differ from a full rescreen")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Screening Benchmark
+Index build time, single-query latency and batch throughput of ScreeningIndex
+over a synthetic watch list of production size
+
+Run from the repository root:
+    python -m benchmarks.screening [--entries 100000] [--queries 20000]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from utils.screening import ScreeningIndex
+
+ONSETS = ['', 'b', 'ch', 'd', 'f', 'g', 'h', 'j', 'k', 'kh', 'l', 'm', 'n', 'p', 'r', 's',
+          'sh', 't', 'th', 'v', 'w', 'y', 'z', 'br', 'dr', 'gr', 'kr', 'st', 'tr']
+VOWELS = ['a', 'e', 'i', 'o', 'u', 'ai', 'ei', 'ou', 'ia', 'ee', 'oo', 'y']
+CODAS = ['', '', '', 'n', 'r', 'l', 's', 'm', 'k', 'd', 'v', 'ng', 'sh', 'tz', 'ff']
+LISTS = ['OFAC', 'UN Sanctions', 'EU Sanctions', 'UK Sanctions', 'PEP']
+
+
+def make_word(rng):
+    return ''.join(rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+                   for _ in range(rng.randint(1, 3))).capitalize()
+
+
+def make_vocabulary(rng, size):
+    return list({make_word(rng) for _ in range(size)})
+
+
+class NameModel:
+    """Given names and surnames drawn Zipf-like from finite vocabularies"""
+
+    def __init__(self, rng, given=8000, surnames=60000):
+        self.rng = rng
+        self.given = make_vocabulary(rng, given)
+        self.surnames = make_vocabulary(rng, surnames)
+
+    def _pick(self, words):
+        # Inverse-power sampling: a few very common names, a long tail
+        return words[min(len(words) - 1, int(len(words) * self.rng.random() ** 3))]
+
+    def name(self):
+        parts = [self._pick(self.given) for _ in range(self.rng.randint(1, 2))]
+        return ' '.join(parts + [self._pick(self.surnames)])
+
+
+def typo(rng, name):
+    """One character substitution, as a sloppy data-entry clerk would make"""
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice('aeiouklmnrst') + name[i + 1:]
+
+
+def make_entries(count, rng, names):
+    entries = []
+    for i in range(count):
+        name = names.name()
+        aliases = [typo(rng, name) for _ in range(rng.randint(1, 4))]
+        list_name = rng.choice(LISTS)
+        entries.append({
+            'id': f"SYN-{i:07d}", 'list': list_name,
+            'type': 'pep' if list_name == 'PEP' else 'sanction',
+            'name': name, 'aliases': aliases, 'country': '', 'program': '',
+        })
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    names = NameModel(rng)
+    entries = make_entries(args.entries, rng, names)
+
+    start = time.perf_counter()
+    index = ScreeningIndex(entries)
+    build_secs = time.perf_counter() - start
+
+    # Customer names: mostly unrelated, a few percent near-misses of listed names
+    customers = [typo(rng, rng.choice(entries)['name']) if rng.random() < 0.03
+                 else names.name() for _ in range(args.queries)]
+
+    index._token_cache.clear()
+    start = time.perf_counter()
+    results = index.search_batch(customers)
+    batch_secs = time.perf_counter() - start
+
+    print(f"index build   : {len(index):,} aliases / {len(index.tokens):,} tokens in {build_secs:.2f}s")
+    print(f"batch rescreen: {len(customers) / batch_secs:,.0f} names/s "
+          f"({sum(bool(r) for r in results):,} with hits)")
+
+    # Single queries against fresh names: "cold" clears the token cache
+    # before every query, "steady state" keeps what earlier traffic cached
+    probes = [names.name() for _ in range(2000)]
+    for label, clear in (("cold", True), ("steady state", False)):
+        latencies = []
+        for name in probes:
+            if clear:
+                index._token_cache.clear()
+            start = time.perf_counter()
+            index.search(name)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"single query  : {label:<12} p50 {statistics.median(latencies) * 1000:.3f} ms   "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    main()
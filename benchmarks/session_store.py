@@ -0,0 +1,99 @@
+"""
+Session Store Benchmark
+Per-rerun tracking cost, write amplification and rehydration of the write-behind session store
+
+Run from the repository root:
+    python -m benchmarks.session_store [--sessions 2000] [--reruns 4] [--workers 8]
+
+Headless workflows supply the session state after each stage; every
+session then reruns ``--reruns`` times per stage (the first sees the
+stage's changes, the rest are widget reruns that change nothing), as the
+app calls ``track`` once per rerun. Write amplification is bytes written
+over the bytes a full snapshot on every rerun would have written.
+"""
+
+import argparse
+import copy
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.session_store import PERSISTED_KEYS, SessionPersistence, open_backend
+from utils.workflow import STAGE_NAMES, STAGES, latency_summary, shared_resources, synthetic_applicant
+
+
+def stage_snapshots(applicants, seed=0):
+    """Persisted keys after each stage, for a few synthetic applicants"""
+    resources = shared_resources()
+    runs = []
+    for s in range(seed, seed + applicants):
+        applicant = synthetic_applicant(s, photos=1, photo_size=(320, 240))
+        state, snapshots = {key: {} for key in PERSISTED_KEYS}, []
+        for stage in STAGE_NAMES:
+            STAGES[stage](state, applicant, resources)
+            snapshots.append(copy.deepcopy({key: state[key] for key in PERSISTED_KEYS}))
+        runs.append(snapshots)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--reruns', type=int, default=4, help="reruns per stage")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--applicants', type=int, default=20)
+    parser.add_argument('--flush-seconds', type=float, default=0.25)
+    parser.add_argument('--url', help="store URL (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    runs = stage_snapshots(args.applicants)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{Path(tmp) / 'sessions.sqlite'}"
+        persistence = SessionPersistence(open_backend(url), flush_seconds=args.flush_seconds)
+
+        def session(n):
+            timings = []
+            for snapshot in runs[n % len(runs)]:
+                for _ in range(args.reruns):
+                    start = time.perf_counter()
+                    persistence.track(f"bench-{n}", snapshot)
+                    timings.append(time.perf_counter() - start)
+            return timings
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            track = [t for timings in pool.map(session, range(args.sessions)) for t in timings]
+        tracked_seconds = time.perf_counter() - started
+        persistence.flush()
+        stats = persistence.stats()
+
+        # Rehydrate every session from a cold store, as another replica would
+        replica = SessionPersistence(open_backend(url))
+        load, mismatches = [], 0
+        for n in range(args.sessions):
+            start = time.perf_counter()
+            state = replica.load(f"bench-{n}")
+            load.append(time.perf_counter() - start)
+            final = runs[n % len(runs)][-1]
+            mismatches += state != {key: value for key, value in final.items() if value}
+        persistence.close()
+        replica.close()
+
+    reruns = len(track)
+    print(f"reruns        : {reruns:,} across {args.sessions:,} sessions, {args.workers} threads, "
+          f"{reruns / tracked_seconds:,.0f} reruns/s")
+    for name, samples in (('track', track), ('rehydrate', load)):
+        s = latency_summary(samples)
+        print(f"{name:<14}: p50 {s['p50_ms']:.3f} ms, p95 {s['p95_ms']:.3f} ms, p99 {s['p99_ms']:.3f} ms")
+    print(f"writes        : {stats['rows_written']:,} rows, {stats['rows_deleted']:,} deletes in "
+          f"{stats['flushes']} flushes ({stats['flush_seconds'] / max(stats['flushes'], 1) * 1000:.1f} ms each)")
+    print(f"bytes         : {stats['bytes_written']:,} written vs {stats['snapshot_bytes']:,} "
+          f"for a full snapshot per rerun (write amplification {stats['write_amplification']:.3f})")
+    print(f"rehydration   : {args.sessions - mismatches:,}/{args.sessions:,} sessions match")
+    if mismatches or stats['errors']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Shadow Scoring Benchmark
+Submit-path latency with a challenger policy in shadow, and historical batch shadowing
+
+Run from the repository root:
+    python -m benchmarks.shadow [--calls 5000] [--rows 200000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.instrumentation import per_call_ns, sample_application
+from benchmarks.loan_batch import make_portfolio, to_application
+from utils import shadow
+from utils.ai_simulation import simulate_loan_decision
+from utils.loan_batch import batch_features, simulate_loan_decision_batch
+from utils.policy import DEFAULT_POLICY_PATH, current_policy
+
+ROUNDS = 10
+CHALLENGER_PATH = DEFAULT_POLICY_PATH.with_name('loan_decision_challenger.json')
+
+
+def hook_ns(challenger_path, calls):
+    """Cost of the shadow hook alone: challenger lookup, scoring and the log row"""
+    policy = current_policy()
+    features = {'requested_amount': 20000.0, 'annual_income': 60000.0, 'asset_value': 30000.0,
+                'condition_score': 7.0, 'fraud_score': 0.1, 'debt_to_income': 33.3,
+                'ltv_ratio': 66.7, 'compliance_draw': 0.5}
+    _, measures, approved = policy.score(features)
+    decision = {'application_id': 'APP-BENCH'}
+    start = time.perf_counter()
+    for _ in range(calls):
+        challenger = shadow.challenger_policy()
+        shadow.record_shadow(decision, policy, measures, approved, challenger, features)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--challenger', default=str(CHALLENGER_PATH))
+    args = parser.parse_args()
+
+    application = sample_application()
+    loan_decision = getattr(simulate_loan_decision, '__wrapped__', simulate_loan_decision)
+    previous = os.environ.pop('CHALLENGER_POLICY_PATH', None)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            shadow._log[:] = [shadow.ShadowLog(Path(tmp) / 'decisions.csv')]
+            # Interleaved rounds, best of each, so machine noise hits both alike
+            live_only, shadowed = [], []
+            for _ in range(ROUNDS):
+                os.environ.pop('CHALLENGER_POLICY_PATH', None)
+                live_only.append(per_call_ns(loan_decision, application, args.calls // ROUNDS))
+                os.environ['CHALLENGER_POLICY_PATH'] = args.challenger
+                shadowed.append(per_call_ns(loan_decision, application, args.calls // ROUNDS))
+            live_only, shadowed = min(live_only), min(shadowed)
+            hook = min(hook_ns(args.challenger, args.calls // ROUNDS) for _ in range(ROUNDS))
+
+            # Scalar shadow log vs batch shadow scoring over the same compliance draws
+            frame = make_portfolio(max(args.calls, 1000), seed=3)
+            shadow._log[:] = [shadow.ShadowLog(Path(tmp) / 'parity.csv')]
+            random.seed(5)
+            for row in frame.itertuples(index=False):
+                loan_decision(to_application(row))
+            shadow.shadow_log().flush()
+            logged = pd.read_csv(shadow.shadow_log().path)
+        finally:
+            os.environ.pop('CHALLENGER_POLICY_PATH', None)
+            if previous is not None:
+                os.environ['CHALLENGER_POLICY_PATH'] = previous
+            shadow._log[:] = []
+
+    challenger = current_policy(args.challenger)
+    random.seed(5)
+    features = batch_features(frame)
+    features['compliance_draw'] = np.array([random.random() for _ in range(len(frame))])
+    batch = simulate_loan_decision_batch(frame, policy=challenger, features=features)
+    parity = ((np.asarray(batch['status'] == 'APPROVED') == logged['challenger_approved'].astype(bool)).all()
+              and np.allclose(batch['risk_score'], logged['challenger_risk'])
+              and np.allclose(batch['interest_rate'], logged['challenger_rate']))
+
+    book = make_portfolio(args.rows)
+    start = time.perf_counter()
+    shadowed_book, summary = shadow.shadow_batch(book, challenger, seed=0)
+    shadow_s = time.perf_counter() - start
+    start = time.perf_counter()
+    live = simulate_loan_decision_batch(book, seed=0)
+    separate = simulate_loan_decision_batch(book, seed=0, policy=challenger)
+    separate_s = time.perf_counter() - start
+    parity = (parity and (shadowed_book['challenger_status'] == separate['status'].astype(str)).all()
+              and shadowed_book[live.columns].equals(live))
+
+    print(f"policies      : live {current_policy().version} vs challenger {challenger.version}")
+    print(f"submit path   : {live_only / 1000:8.1f} us live only, {shadowed / 1000:.1f} us with shadow "
+          f"({(shadowed - live_only) / live_only:+.1%}); the hook alone is {hook / 1000:.1f} us "
+          f"({hook / live_only:.1%})")
+    print(f"batch         : {args.rows:,} rows, {shadow_s:.3f}s shadowed vs {separate_s:.3f}s "
+          f"as two full runs")
+    print(f"agreement     : {summary['agreement_rate']:.1%} (live only {summary['live_only']:,}, "
+          f"challenger only {summary['challenger_only']:,}), mean risk delta "
+          f"{summary['mean_risk_delta']:+.3f}")
+    print(f"parity        : scalar shadow log and batch challenger "
+          f"{'agree' if parity else 'DISAGREE'} on {len(frame):,} applications "
+          f"and with two full batch runs")
+    if not parity:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Startup Benchmark
+Cold-start import cost and first-paint latency of app.py, lazy vs eager pages, and per-page import cost
+
+Every measurement runs in a fresh interpreter so module caches are cold.
+"eager" reproduces the old behaviour of importing every view up front.
+First paint executes app.py in Streamlit's bare mode, so the interpreter
+imports only what the app itself does (the AppTest harness would import
+pandas and the testing modules up front and hide the difference).
+
+Run from the repository root:
+    python -m benchmarks.startup [--repeat 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from utils.page_registry import page_names
+
+# Imports streamlit first so only page-import cost is measured
+_IMPORT_PROBE = """
+import json, sys, time
+import streamlit, streamlit_option_menu
+from utils.page_registry import load_page, page_names
+pages = page_names() if sys.argv[1] == 'eager' else page_names()[:1]
+start = time.perf_counter()
+for name in pages:
+    load_page(name)
+print(json.dumps({'seconds': time.perf_counter() - start}))
+"""
+
+# app.py executed from a cold interpreter until the Home page has rendered
+_FIRST_PAINT_PROBE = """
+import json, runpy, sys, time
+start = time.perf_counter()
+if sys.argv[1] == 'eager':
+    from utils.page_registry import load_page, page_names
+    for name in page_names():
+        load_page(name)
+runpy.run_path('app.py', run_name='__main__')
+print(json.dumps({'seconds': time.perf_counter() - start}))
+"""
+
+# First visit to one page after app.py has rendered Home
+_PAGE_PROBE = """
+import json, runpy, sys
+runpy.run_path('app.py', run_name='__main__')
+from utils.page_registry import import_costs, load_page
+load_page(sys.argv[1])
+print(json.dumps({'seconds': import_costs()[sys.argv[1]]}))
+"""
+
+
+def _probe(code, mode):
+    out = subprocess.run([sys.executable, '-c', code, mode], check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])['seconds']
+
+
+def _measure(code, mode, repeat):
+    return statistics.median(_probe(code, mode) for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for label, code in (("page imports", _IMPORT_PROBE), ("first paint", _FIRST_PAINT_PROBE)):
+        eager = _measure(code, 'eager', args.repeat)
+        lazy = _measure(code, 'lazy', args.repeat)
+        print(f"{label:<13} eager {eager * 1000:8.1f} ms   lazy {lazy * 1000:8.1f} ms   "
+              f"saved {(eager - lazy) * 1000:8.1f} ms")
+    for name in page_names()[1:]:
+        print(f"{'page ' + name:<24} first visit imports {_measure(_PAGE_PROBE, name, args.repeat) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Stress Testing Benchmark
+Latency of the inline stress test and loans per second over a synthetic portfolio
+
+Run from the repository root:
+    python -m benchmarks.stress [--loans 1000000] [--verify 500]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from utils.amortization import monthly_payment
+from utils.stress import DEPRECIATION_PATHS, RATE_SHOCKS, _peak_ltv, stress_portfolio, stress_test
+
+
+def make_portfolio(loans, seed=19):
+    """Synthetic approved book, in the simulate_loan_decision_batch columns"""
+    rng = np.random.default_rng(seed)
+    amount = rng.integers(20, 400, loans) * 100.0
+    return {
+        'approved_amount': amount,
+        'interest_rate': rng.uniform(5.5, 7.0, loans).round(2),
+        'term_years': rng.integers(1, 8, loans),
+        'balloon_payment': np.where(rng.random(loans) < 0.25, (amount * rng.uniform(0, 0.5, loans)).round(-2), 0.0),
+        'annual_income': rng.integers(15, 150, loans) * 1000.0,
+        'asset_value': (amount / rng.uniform(0.4, 0.8, loans)).round(-2),
+    }
+
+
+def month_by_month(principal, rate, months, balloon, value, depreciation):
+    """Peak LTV by rolling the balance forward one payment at a time"""
+    payment = monthly_payment(principal, rate, months, balloon)
+    balance, peak = principal, 0.0
+    for t in range(months):
+        peak = max(peak, balance / (value * (1 - depreciation) ** (t / 12)) * 100)
+        balance = balance * (1 + rate / 1200) - payment
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--loans', type=int, default=1_000_000)
+    parser.add_argument('--verify', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    # The closed-form peak LTV against a month-by-month roll-forward
+    book = make_portfolio(args.verify)
+    months = book['term_years'] * 12
+    rates = book['interest_rate'][:, None] + np.asarray(RATE_SHOCKS)[None, :]
+    depreciation = list(DEPRECIATION_PATHS.values())
+    peaks = _peak_ltv(book['approved_amount'], rates, months, book['balloon_payment'],
+                      book['asset_value'], depreciation)
+    worst = 0.0
+    for i in range(args.verify):
+        for j, rate in enumerate(rates[i]):
+            for k, path in enumerate(depreciation):
+                expected = month_by_month(book['approved_amount'][i], rate, int(months[i]),
+                                          book['balloon_payment'][i], book['asset_value'][i], path)
+                worst = max(worst, abs(peaks[i, j, k] - expected))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        stress_test(15000, 6.5, 5, 40000, 21000, 3000)
+    inline_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+    book = make_portfolio(args.loans)
+    start = time.perf_counter()
+    result = stress_portfolio(book)
+    secs = time.perf_counter() - start
+
+    print(f"peak LTV      : max error {worst:.2e} pp vs month-by-month over {args.verify:,} loans")
+    print(f"inline        : {inline_ms:.3f} ms per application")
+    print(f"portfolio     : {args.loans:>10,} loans  {secs:8.3f}s  {args.loans / secs:>12,.0f} loans/s")
+    print(f"pass rates    : {result['passes_base'].mean():.1%} pass the base case, "
+          f"{result['passes_all'].mean():.1%} pass every scenario")
+    if worst > 1e-6:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Threshold Optimisation Benchmark
+Vectorized cutoff x weighting sweep over a synthetic application history, checked against recompiled policies
+
+Run from the repository root:
+    python -m benchmarks.thresholds [--rows 1000000] [--weight-step 0.1] [--cutoffs 4]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.loan_batch import make_portfolio
+from utils.loan_batch import batch_features
+from utils.policy import RISK_COMPONENTS, compile_policy, current_policy
+from utils.thresholds import optimise_thresholds, weight_grid
+
+
+def make_history(rows, seed=7):
+    """Synthetic book with a stored compliance score and defaults that rise with DTI, LTV and fraud score"""
+    frame = make_portfolio(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    frame['compliance_risk'] = np.round(rng.uniform(0.05, 0.15, rows), 2)
+    dti = frame['requested_amount'] / frame['annual_income'] * 100
+    ltv = frame['requested_amount'] / frame['asset_value'] * 100
+    logit = -6.0 + 0.035 * dti + 0.012 * np.minimum(ltv, 200) + 4.0 * frame['fraud_score']
+    frame['defaulted'] = rng.random(rows) < 1 / (1 + np.exp(-logit))
+    return frame
+
+
+def brute_force(history, policy, weights, max_risk, max_ltv, max_dti):
+    """One grid point the slow way: rewrite the policy document, compile it and decide the book"""
+    document = dict(policy.document)
+    document['weights'] = {name: float(weights[RISK_COMPONENTS.index(name)]) for name in document['weights']}
+    limits = {'overall_risk': max_risk, 'ltv_ratio': max_ltv, 'debt_to_income': max_dti}
+    document['approval_rules'] = [{**rule, 'value': float(limits.get(rule['measure'], rule['value']))}
+                                  for rule in document['approval_rules']]
+    features = batch_features(history, history['compliance_risk'])
+    approved = compile_policy(document).score_batch(features)['approved']
+    exposure = np.minimum(features['requested_amount'], features['asset_value'] * features['ltv_cap'])
+    losses = (exposure * history['defaulted'].to_numpy())[approved].sum()
+    return int(approved.sum()), losses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--weight-step', type=float, default=0.1)
+    parser.add_argument('--cutoffs', type=int, default=4, help="values per cutoff axis (the live cutoff is added)")
+    parser.add_argument('--loss-ceiling', type=float, default=0.04)
+    parser.add_argument('--checks', type=int, default=20, help="grid points re-checked by brute force")
+    args = parser.parse_args()
+
+    history = make_history(args.rows)
+    weights = weight_grid(args.weight_step, minimum=args.weight_step)
+    # The live policy's own point is on the grid too, as a check at exact cutoffs
+    policy = current_policy()
+    limits = {rule['measure']: rule['value'] for rule in policy.document['approval_rules']}
+    live_weights = [policy.document['weights'][name] for name in RISK_COMPONENTS]
+    weights = np.vstack([weights, live_weights])
+    max_risk = np.append(np.linspace(0.3, 0.75, args.cutoffs), limits['overall_risk'])
+    max_ltv = np.append(np.linspace(60, 105, args.cutoffs), limits['ltv_ratio'])
+    max_dti = np.append(np.linspace(20, 65, args.cutoffs), limits['debt_to_income'])
+    grid_points = len(weights) * (args.cutoffs + 1) ** 3
+
+    start = time.perf_counter()
+    result = optimise_thresholds(history, max_risk, max_ltv, max_dti, weights, args.loss_ceiling)
+    elapsed = time.perf_counter() - start
+
+    grid = result['grid']
+    rng = np.random.default_rng(0)
+    checked = grid.iloc[rng.choice(len(grid), min(args.checks, len(grid)), replace=False)]
+    subset = history.iloc[:min(args.rows, 200_000)]
+    small = optimise_thresholds(subset, max_risk, max_ltv, max_dti, weights)['grid']
+    agree = True
+    for index, row in checked.iterrows():
+        approvals, losses = brute_force(subset, policy, row[list(RISK_COMPONENTS)].to_numpy(),
+                                        row['max_risk'], row['max_ltv'], row['max_dti'])
+        agree &= approvals == small.loc[index, 'approvals'] and np.isclose(losses, small.loc[index, 'losses'])
+
+    current, best = result['current'], result['best']
+    live_point = grid[(grid[list(RISK_COMPONENTS)] == live_weights).all(axis=1)
+                      & (grid['max_risk'] == limits['overall_risk']) & (grid['max_ltv'] == limits['ltv_ratio'])
+                      & (grid['max_dti'] == limits['debt_to_income'])].iloc[0]
+    agree &= live_point['approvals'] == current['approvals'] and np.isclose(live_point['losses'], current['losses'])
+    print(f"sweep         : {args.rows:,} rows x {grid_points:,} grid points "
+          f"({len(weights)} weightings x {args.cutoffs + 1}^3 cutoffs) in {elapsed:.1f}s")
+    print(f"frontier      : {len(result['frontier'])} Pareto-optimal grid points")
+    print(f"current       : policy {current['policy_version']}, {current['approval_rate']:.1%} approved, "
+          f"loss rate {current['loss_rate']:.2%}")
+    if best is None:
+        print(f"best          : nothing meets a {args.loss_ceiling:.1%} loss-rate ceiling")
+    else:
+        print(f"best          : {best['approval_rate']:.1%} approved at loss rate {best['loss_rate']:.2%} "
+              f"(risk < {best['max_risk']:.3f}, LTV <= {best['max_ltv']:.1f}, DTI <= {best['max_dti']:.1f}, "
+              f"weights {', '.join(f'{best[name]:.2f}' for name in RISK_COMPONENTS)})")
+    print(f"parity        : live policy's grid point and {len(checked)} sampled points "
+          f"{'agree' if agree else 'DISAGREE'} with compiled policies")
+    if not agree:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
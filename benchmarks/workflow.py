@@ -0,0 +1,49 @@
+"""
+Workflow Load Driver
+Runs synthetic applicants through the full onboarding pipeline headlessly and reports per-stage latency
+
+Run from the repository root:
+    python -m benchmarks.workflow [--workflows 200] [--workers 8] [--mode thread|process]
+
+Stage functions live in utils/workflow.py; use run_workflows there for
+the same run from Python.
+"""
+
+import argparse
+import json
+
+from utils.workflow import STAGE_NAMES, run_workflows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--workflows', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--photos', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_workflows(args.workflows, workers=args.workers, mode=args.mode,
+                           seed=args.seed, photos=args.photos)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['workflows']:,} workflows, {report['workers']} {report['mode']} workers: "
+          f"{report['wall_seconds']:.2f}s, {report['throughput_per_second']:.1f} workflows/s "
+          f"(setup {report['setup_seconds']:.2f}s)")
+    print(f"{'stage':<18}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    for stage in STAGE_NAMES + ['total']:
+        s = report['stages'][stage]
+        if not s['count']:
+            print(f"{stage:<18}{0:>7}")
+            continue
+        print(f"{stage:<18}{s['count']:>7}{s['mean_ms']:>10.1f}{s['p50_ms']:>10.1f}"
+              f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+    print("outcomes: " + ", ".join(f"{k} {v}" for k, v in sorted(report['outcomes'].items())))
+
+
+if __name__ == '__main__':
+    main()
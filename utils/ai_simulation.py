@@ -7,29 +7,58 @@ import random
 import uuid
 from datetime import datetime, date
 
+from utils import drift
+from utils.amortization import loan_apr, monthly_payment as level_payment
+from utils.counterfactual import counterfactual
+from utils.instrumentation import instrumented
+from utils.mrz import decode_td3, encode_td3
+from utils.policy import current_policy
+from utils.shadow import challenger_policy, record_shadow
+from utils.stress import stress_test
+from utils.valuation_batch import (BASE_VALUE, CONDITIONS, DEFAULT_CONDITION, DEPRECIATION_PER_10K_MILES,
+                                   DEPRECIATION_PER_YEAR, MIN_VALUE, VALUATION_YEAR)
+
+@instrumented
 def simulate_nfc_reading(customer_data):
     """Simulate NFC passport chip reading"""
     if not customer_data:
         return None
     
     # Simulate reading passport data
+    passport_number = f"{random.randint(100000000, 999999999)}"
+    nationality = customer_data.get('nationality', 'United Kingdom')
+    date_of_birth = str(customer_data.get('date_of_birth', date(1990, 1, 1)))
+    first_name = customer_data.get('first_name', '')
+    last_name = customer_data.get('last_name', '')
+    gender = random.choice(['M', 'F'])
+    expiry_date = str(date.today().replace(year=date.today().year + 5))
+    
+    mrz_line1, mrz_line2 = encode_td3(
+        passport_number, 'GBR', nationality, last_name, first_name,
+        date_of_birth, gender, expiry_date
+    )
+    mrz = decode_td3([mrz_line1, mrz_line2])
+    
     passport_data = {
-        'passport_number': f"GB{random.randint(100000000, 999999999)}",
-        'nationality': customer_data.get('nationality', 'United Kingdom'),
-        'date_of_birth': str(customer_data.get('date_of_birth', date(1990, 1, 1))),
-        'first_name': customer_data.get('first_name', ''),
-        'last_name': customer_data.get('last_name', ''),
-        'gender': random.choice(['M', 'F']),
-        'expiry_date': str(date.today().replace(year=date.today().year + 5)),
+        'passport_number': passport_number,
+        'nationality': nationality,
+        'date_of_birth': date_of_birth,
+        'first_name': first_name,
+        'last_name': last_name,
+        'gender': gender,
+        'expiry_date': expiry_date,
         'issuing_authority': 'UKPA',
-        'mrz_line1': f"P<GBR{customer_data.get('last_name', '').upper()}<{customer_data.get('first_name', '').upper()}",
-        'mrz_line2': f"{passport_data['passport_number']}GBR{random.randint(100000, 999999)}",
+        'mrz_line1': mrz_line1,
+        'mrz_line2': mrz_line2,
+        'mrz_valid': mrz['valid'],
+        'mrz_checks': mrz['checks'],
         'chip_authenticated': True,
         'read_timestamp': datetime.now().isoformat()
     }
     
     return passport_data
 
+@instrumented
 def simulate_kyc_verification(customer_data, doc_type, filename):
     """Simulate document verification with OCR"""
     if not customer_data:
@@ -70,48 +99,63 @@ def simulate_kyc_verification(customer_data, doc_type, filename):
         'processed_at': datetime.now().isoformat()
     }
 
-def simulate_asset_valuation(asset_info, uploaded_photos):
-    """Simulate AI-powered asset valuation"""
-    if not asset_info or not uploaded_photos:
-        return None
-    
+@instrumented
+def simulate_fraud_screening():
+    """Simulate fraud and adverse media checks run alongside sanctions screening"""
+    return {
+        'fraud_check': {
+            'status': 'CLEAR',
+            'fraud_score': 0.12,
+            'risk_level': 'LOW',
+            'checks_performed': [
+                'Identity verification',
+                'Document authenticity',
+                'Device fingerprinting',
+                'Behavioral analysis'
+            ]
+        },
+        'adverse_media': {
+            'status': 'CLEAR',
+            'matches': 0
+        }
+    }
+
+@instrumented
+def update_kyc_status(kyc_status):
+    """Mark KYC complete once NFC, document and screening checks pass
+
+    Returns (nfc_ok, doc_ok, screening_ok). PEP hits are flagged for
+    enhanced due diligence; only a sanctions hit blocks.
+    """
+    nfc_ok = kyc_status.get('nfc_verified', False)
+    doc_ok = kyc_status.get('document_verified', False)
+    screening = kyc_status.get('screening', {})
+    screening_ok = (
+        kyc_status.get('screening_complete', False)
+        and screening.get('sanctions_check', {}).get('status', 'CLEAR') == 'CLEAR'
+    )
+    if nfc_ok and doc_ok and screening_ok:
+        kyc_status['status'] = 'APPROVED'
+        kyc_status['overall_status'] = 'COMPLETE'
+    return nfc_ok, doc_ok, screening_ok
+
+@instrumented
+def simulate_market_data(asset_info):
+    """Simulate market lookup (CAP HPI / DVLA) for an asset"""
     asset_type = asset_info.get('type', 'Vehicle')
     
     # Base market value (simulated)
     if asset_type == 'Vehicle':
-        make = asset_info.get('make', 'BMW')
-        model = asset_info.get('model', '320d')
         year = asset_info.get('year', 2020)
         mileage = asset_info.get('mileage', 50000)
         condition = asset_info.get('condition', 'Good')
         
         # Simulate market value based on inputs
-        base_value = 25000
-        age_depreciation = (2025 - year) * 2000
-        mileage_depreciation = (mileage / 10000) * 500
+        age_depreciation = (VALUATION_YEAR - year) * DEPRECIATION_PER_YEAR
+        mileage_depreciation = (mileage / 10000) * DEPRECIATION_PER_10K_MILES
+        multiplier, _ = CONDITIONS.get(condition, DEFAULT_CONDITION)
         
-        condition_multipliers = {
-            'Excellent': 1.1,
-            'Very Good': 1.0,
-            'Good': 0.9,
-            'Fair': 0.75,
-            'Poor': 0.6
-        }
-        
-        market_value = max(1000, (base_value - age_depreciation - mileage_depreciation) * 
-                          condition_multipliers.get(condition, 0.9))
-        
-        # Simulate condition score from AI analysis
-        condition_scores = {
-            'Excellent': (9, 10),
-            'Very Good': (8, 9),
-            'Good': (6, 8),
-            'Fair': (4, 6),
-            'Poor': (2, 4)
-        }
-        
-        score_range = condition_scores.get(condition, (6, 8))
-        condition_score = round(random.uniform(score_range[0], score_range[1]), 1)
+        market_value = max(MIN_VALUE, (BASE_VALUE - age_depreciation - mileage_depreciation) * multiplier)
         
         # DVLA verification
         dvla_verification = {
@@ -138,7 +182,6 @@ def simulate_asset_valuation(asset_info, uploaded_photos):
     else:
         # Generic asset
         market_value = random.randint(5000, 50000)
-        condition_score = round(random.uniform(6, 9), 1)
         dvla_verification = None
         market_data = {
             'avg_price': market_value,
@@ -149,6 +192,36 @@ def simulate_asset_valuation(asset_info, uploaded_photos):
             'source': 'Market Data'
         }
     
+    return {
+        'market_value': market_value,
+        'market_data': market_data,
+        'dvla_verification': dvla_verification
+    }
+
+@instrumented
+def simulate_asset_valuation(asset_info, uploaded_photos, market=None):
+    """Simulate AI-powered asset valuation
+    
+    ``market`` is a precomputed simulate_market_data result; the staged
+    valuation pipeline fetches it concurrently with image analysis.
+    """
+    if not asset_info or not uploaded_photos:
+        return None
+    
+    asset_type = asset_info.get('type', 'Vehicle')
+    if market is None:
+        market = simulate_market_data(asset_info)
+    market_value = market['market_value']
+    market_data = market['market_data']
+    dvla_verification = market['dvla_verification']
+    
+    # Simulate condition score from AI analysis
+    if asset_type == 'Vehicle':
+        _, score_range = CONDITIONS.get(asset_info.get('condition', 'Good'), DEFAULT_CONDITION)
+        condition_score = round(random.uniform(score_range[0], score_range[1]), 1)
+    else:
+        condition_score = round(random.uniform(6, 9), 1)
+    
     # Condition details from AI analysis
     condition_details = {
         'exterior_condition': round(random.uniform(6, 10), 1),
@@ -186,6 +259,7 @@ def simulate_asset_valuation(asset_info, uploaded_photos):
         'valuation_timestamp': datetime.now().isoformat()
     }
 
+@instrumented
 def simulate_loan_decision(application_data):
     """Simulate AI-powered loan decision"""
     if not application_data:
@@ -204,34 +278,25 @@ def simulate_loan_decision(application_data):
     debt_to_income = (requested_amount / annual_income * 100) if annual_income > 0 else 100
     ltv_ratio = (requested_amount / asset_value * 100) if asset_value > 0 else 100
     
-    # Risk scoring
-    credit_risk = min(1.0, debt_to_income / 50)  # Higher DTI = higher risk
-    asset_risk = max(0.0, (ltv_ratio - 60) / 40) if ltv_ratio > 60 else 0.1  # Higher LTV = higher risk
-    
     fraud_score = kyc.get('screening', {}).get('fraud_check', {}).get('fraud_score', 0.1)
-    fraud_risk = min(1.0, fraud_score * 2)
-    
     condition_score = asset.get('condition_score', 7)
-    condition_risk = max(0.0, (7 - condition_score) / 7)  # Lower condition = higher risk
     
-    # Risk breakdown
-    risk_breakdown = {
-        'credit_risk': round(credit_risk, 2),
-        'asset_risk': round(asset_risk, 2),
-        'fraud_risk': round(fraud_risk, 2),
-        'compliance_risk': round(random.uniform(0.05, 0.15), 2)
+    # Policy-independent features, shared with a shadow challenger
+    features = {
+        'requested_amount': requested_amount,
+        'annual_income': annual_income,
+        'asset_value': asset_value,
+        'condition_score': condition_score,
+        'fraud_score': fraud_score,
+        'debt_to_income': debt_to_income,
+        'ltv_ratio': ltv_ratio,
+        'compliance_draw': random.random(),
     }
     
-    # Overall risk score (weighted average)
-    overall_risk = (
-        risk_breakdown['credit_risk'] * 0.3 +
-        risk_breakdown['asset_risk'] * 0.3 +
-        risk_breakdown['fraud_risk'] * 0.25 +
-        risk_breakdown['compliance_risk'] * 0.15
-    )
-    
-    # Decision logic
-    approved = overall_risk < 0.6 and ltv_ratio <= 80 and debt_to_income <= 45
+    # Risk scoring and decision logic
+    policy = current_policy()
+    risk_breakdown, measures, approved = policy.score(features)
+    overall_risk = measures['overall_risk']
     
     if approved:
         # Calculate approved amount (may be less than requested)
@@ -239,45 +304,40 @@ def simulate_loan_decision(application_data):
         approved_amount = min(requested_amount, max_loan)
         
         # Interest rate based on risk
-        base_rate = 5.5
-        risk_adjustment = overall_risk * 2.5
-        interest_rate = base_rate + risk_adjustment
+        interest_rate = policy.interest_rate(overall_risk)
         
         # Loan terms
         term_years = loan_request.get('term_years', 5)
-        monthly_rate = interest_rate / 100 / 12
-        monthly_payment = approved_amount * (monthly_rate * (1 + monthly_rate)**(term_years*12)) / \
-                         ((1 + monthly_rate)**(term_years*12) - 1) if monthly_rate > 0 else \
-                         approved_amount / (term_years * 12)
+        balloon = min(loan_request.get('balloon', 0), approved_amount)
+        monthly_payment = level_payment(approved_amount, interest_rate, term_years * 12, balloon)
+        fees = loan_request.get('fees', 0)
+        apr = loan_apr(approved_amount, interest_rate, term_years * 12, fees, balloon)
+        stress = stress_test(approved_amount, interest_rate, term_years, annual_income,
+                             asset_value, balloon, policy)
         
         status = 'APPROVED'
         reason = 'Application meets all criteria. Loan approved based on risk assessment.'
-        conditions = []
-        
-        if ltv_ratio > 70:
-            conditions.append('Higher LTV ratio - standard terms apply')
-        if debt_to_income > 35:
-            conditions.append('Moderate debt-to-income ratio - monitoring recommended')
+        conditions = policy.conditions({**measures, 'stress_passes_base': stress['passes_base']})
+        explanation = None
         
     else:
         approved_amount = 0
         interest_rate = 0
         term_years = 0
         monthly_payment = 0
+        balloon = 0
+        fees = 0
+        apr = 0
+        stress = None
         status = 'REJECTED'
         
-        reasons = []
-        if overall_risk >= 0.6:
-            reasons.append('High overall risk score')
-        if ltv_ratio > 80:
-            reasons.append('Loan-to-value ratio exceeds maximum')
-        if debt_to_income > 45:
-            reasons.append('Debt-to-income ratio too high')
-        
+        reasons = policy.rejection_reasons(measures)
         reason = '; '.join(reasons) if reasons else 'Application does not meet approval criteria'
         conditions = []
+        # What would have been approved, for the Results page and adverse-action letters
+        explanation = counterfactual({**features, 'compliance_risk': measures['compliance_risk']}, policy)
     
-    return {
+    decision = {
         'application_id': f"APP-{uuid.uuid4().hex[:8].upper()}",
         'status': status,
         'approved_amount': round(approved_amount, 2),
@@ -285,10 +345,16 @@ def simulate_loan_decision(application_data):
         'interest_rate': round(interest_rate, 2),
         'term_years': term_years,
         'monthly_payment': round(monthly_payment, 2),
+        'balloon_payment': round(balloon, 2),
+        'fees': fees,
+        'apr': round(apr, 1),
         'risk_score': round(overall_risk, 2),
         'risk_breakdown': risk_breakdown,
+        'stress_test': stress,
         'reason': reason,
         'conditions': conditions,
+        'counterfactual': explanation,
+        'policy_version': policy.version,
         'decision_date': datetime.now().isoformat(),
         'risk_analysis': {
             'debt_to_income': round(debt_to_income, 1),
@@ -298,4 +364,14 @@ def simulate_loan_decision(application_data):
             'condition_score': condition_score
         }
     }
+    
+    # Champion/challenger: score the same features under CHALLENGER_POLICY_PATH
+    challenger = challenger_policy()
+    if challenger is not None:
+        record_shadow(decision, policy, measures, approved, challenger, features)
+    
+    if drift.ENABLED:
+        drift.record(decision)
+    
+    return decision
 
@@ -0,0 +1,200 @@
+"""
+Amortization
+Level-payment loan maths and vectorized month-by-month repayment schedules
+with overpayments and balloon (PCP-style) final payments
+"""
+
+import numpy as np
+import pandas as pd
+
+# Balances below half a penny count as repaid
+PAID_OFF_TOLERANCE = 0.005
+
+SCHEDULE_COLUMNS = ['payment', 'overpayment', 'interest', 'principal', 'balance']
+
+
+def monthly_payment(principal, annual_rate, months, balloon=0.0):
+    """Level monthly payment that leaves ``balloon`` owing after ``months``
+
+    ``annual_rate`` is a percentage. Works on scalars (returns a float) or
+    NumPy arrays (returns an array).
+    """
+    principal, annual_rate, months, balloon = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (principal, annual_rate, months, balloon)))
+    monthly_rate = annual_rate / 100 / 12
+    growth = (1 + monthly_rate) ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(
+            monthly_rate > 0,
+            (principal - balloon / growth) * (monthly_rate * growth) / (growth - 1),
+            (principal - balloon) / months,
+        )
+    return float(payment) if payment.ndim == 0 else payment
+
+
+def schedule(principal, annual_rate, months, balloon=0.0, overpayments=None):
+    """Full repayment schedules for a book of loans, without looping over months
+
+    Every argument is a scalar or one value per loan; ``overpayments`` is
+    extra principal paid each month, broadcastable to (loans, months), with
+    column 0 the first payment. Overpayments keep the payment level and
+    shorten the term; the month the balance reaches zero (or the last
+    month, which also settles any balloon) gets the exact settling payment.
+
+    Balances follow the closed form
+        b_t = g^t * (b_0 - pmt * sum_{s<t} g^-(s+1) - sum_{s<t} over_s * g^-(s+1))
+    with g = 1 + monthly rate, so every month is one cumulative sum.
+
+    Returns a dict of (loans, max months) arrays keyed by SCHEDULE_COLUMNS,
+    plus per-loan 'scheduled_payment', 'months' (payments actually made),
+    'total_interest' and 'total_paid'. Months after payoff are zero.
+    """
+    extra = None if overpayments is None else np.asarray(overpayments, dtype=float)
+    principal, annual_rate, months, balloon = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float)) for v in (principal, annual_rate, months, balloon)))
+    # A 2-D overpayment plan can also set the number of loans, e.g. one
+    # loan scheduled under several plans at once
+    loans = max(len(principal), extra.shape[0] if extra is not None and extra.ndim == 2 else 1)
+    principal, annual_rate, months, balloon = (
+        np.broadcast_to(v, (loans,)) for v in (principal, annual_rate, months, balloon))
+    months = months.astype(np.int64)
+    horizon = int(months.max())
+
+    rate = (annual_rate / 100 / 12)[:, None]
+    payment = monthly_payment(principal, annual_rate, months, balloon)[:, None]
+    step = np.arange(1, horizon + 1)[None, :]
+    extra = np.zeros((loans, horizon)) if extra is None else np.broadcast_to(extra, (loans, horizon))
+
+    growth = (1 + rate) ** step                         # g^t
+    discount = 1 / growth                               # g^-t
+    outflow = np.cumsum((payment + extra) * discount, axis=1)
+    balance = growth * (principal[:, None] - outflow)
+
+    # Last month of each loan: payoff by overpayment, or the final term month
+    active = step <= months[:, None]
+    repaid = (balance <= PAID_OFF_TOLERANCE) & active
+    last = np.where(repaid.any(axis=1), repaid.argmax(axis=1), months - 1)
+    live = step <= (last + 1)[:, None]
+
+    opening = np.concatenate([principal[:, None], balance[:, :-1]], axis=1)
+    interest = opening * rate
+
+    rows = np.arange(loans)
+    settle = opening[rows, last] + interest[rows, last]
+    extra = np.array(extra)
+    extra[rows, last] = np.minimum(extra[rows, last], settle)
+    payments = np.broadcast_to(payment, (loans, horizon)).copy()
+    payments[rows, last] = settle - extra[rows, last]
+    balance[rows, last] = 0.0
+
+    result = {
+        'payment': np.where(live, payments, 0.0),
+        'overpayment': np.where(live, extra, 0.0),
+        'interest': np.where(live, interest, 0.0),
+        'balance': np.where(live, balance, 0.0),
+    }
+    result['principal'] = result['payment'] + result['overpayment'] - result['interest']
+    result['scheduled_payment'] = payment[:, 0]
+    result['months'] = last + 1
+    result['total_interest'] = result['interest'].sum(axis=1)
+    result['total_paid'] = (result['payment'] + result['overpayment']).sum(axis=1)
+    return result
+
+
+def schedule_frame(result, loan_ids=None):
+    """Long-format DataFrame (one row per loan-month) for display or export"""
+    loans, horizon = result['payment'].shape
+    months = np.tile(np.arange(1, horizon + 1), loans)
+    loan = np.repeat(np.arange(loans) if loan_ids is None else np.asarray(loan_ids), horizon)
+    keep = months <= np.repeat(result['months'], horizon)
+    frame = pd.DataFrame({'loan': loan, 'month': months,
+                          **{column: result[column].reshape(-1) for column in SCHEDULE_COLUMNS}})
+    return frame[keep].round(2).reset_index(drop=True)
+
+
+APR_CHUNK_ROWS = 65536
+APR_TOLERANCE = 1e-12
+APR_MAX_ITERATIONS = 100
+
+
+def _solve_monthly_rate(advance, cashflows, tol, max_iter):
+    """Monthly rate m with sum_k C_k (1+m)^-k == advance, per row
+
+    Safeguarded Newton: f is decreasing in m for non-negative cashflows, so
+    each evaluation narrows a [lo, hi] bracket, and any step that leaves it
+    falls back to bisection. Converged rows are frozen, so a row's result
+    does not depend on which other rows share the call.
+    """
+    rows, horizon = cashflows.shape
+    k = np.arange(1, horizon + 1, dtype=float)
+    total = cashflows.sum(axis=1)
+    weighted = cashflows @ k
+    # First-order guess from f(m) ~ total - advance - m * weighted
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(weighted > 0, (total - advance) / weighted, 0.0)
+    lo = np.full(rows, -0.9)
+    hi = np.full(rows, 10.0)
+    rate = np.clip(rate, lo / 2, hi / 2)
+
+    active = np.flatnonzero(weighted > 0)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        m = rate[active]
+        flows = cashflows[active]
+        v = 1 / (1 + m)
+        discounted = flows * v[:, None] ** k
+        f = discounted.sum(axis=1) - advance[active]
+        df = -(discounted @ k) * v
+
+        lo[active] = np.where(f > 0, m, lo[active])
+        hi[active] = np.where(f < 0, m, hi[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new = m - f / df
+        outside = ~((new > lo[active]) & (new < hi[active]))
+        new = np.where(outside, (lo[active] + hi[active]) / 2, new)
+
+        rate[active] = new
+        done = (np.abs(new - m) <= tol * (1 + np.abs(m))) | (f == 0)
+        active = active[~done]
+    return rate
+
+
+def apr(advance, cashflows, tol=APR_TOLERANCE, max_iter=APR_MAX_ITERATIONS):
+    """Annual percentage rate (%) for each row of monthly cashflows
+
+    ``advance`` is the credit actually advanced at month 0 (after any
+    upfront fees) and ``cashflows`` the borrower's payments at months
+    1, 2, ..., one row per loan. Returns the annual effective rate
+    ((1 + m)^12 - 1, as a percentage) equating the two, unrounded.
+    """
+    advance = np.atleast_1d(np.asarray(advance, dtype=float))
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    monthly = np.empty(len(advance))
+    for start in range(0, len(advance), APR_CHUNK_ROWS):
+        rows = slice(start, start + APR_CHUNK_ROWS)
+        monthly[rows] = _solve_monthly_rate(advance[rows], cashflows[rows], tol, max_iter)
+    return ((1 + monthly) ** 12 - 1) * 100
+
+
+def loan_apr(principal, annual_rate, months, fees=0.0, balloon=0.0, final_fee=0.0):
+    """APR of level-payment loans, including fees
+
+    ``fees`` are paid upfront and reduce the credit advanced; ``final_fee``
+    (e.g. an option-to-purchase fee) is added to the last payment along
+    with any balloon. Scalars return a float, arrays an array.
+    """
+    scalar = all(np.ndim(v) == 0 for v in (principal, annual_rate, months, fees, balloon, final_fee))
+    principal, annual_rate, months, fees, balloon, final_fee = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float))
+          for v in (principal, annual_rate, months, fees, balloon, final_fee)))
+    months = months.astype(np.int64)
+    horizon = int(months.max())
+
+    payment = monthly_payment(principal, annual_rate, months, balloon)
+    step = np.arange(1, horizon + 1)[None, :]
+    cashflows = np.where(step <= months[:, None], payment[:, None], 0.0)
+    cashflows[np.arange(len(months)), months - 1] += balloon + final_fee
+
+    result = apr(principal - fees, cashflows)
+    return float(result[0]) if scalar else result
@@ -0,0 +1,187 @@
+"""
+Comparable Listings
+Nearest-neighbour search over a local vehicle listings dataset for
+market prices and comparables in asset valuation
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.valuation_batch import CONDITIONS, DEFAULT_CONDITION, MIN_VALUE
+
+DEFAULT_LISTINGS_PATH = Path(__file__).resolve().parent.parent / 'data' / 'listings' / 'vehicles.csv'
+LISTING_COLUMNS = ['make', 'model', 'year', 'mileage', 'price']
+
+# One model year is treated as as far away as this many miles
+MILES_PER_YEAR = 10000
+DEFAULT_NEIGHBOURS = 25
+MIN_COMPARABLES = 5
+
+
+def _key(make, model):
+    return f"{str(make).strip().upper()}|{str(model).strip().upper()}"
+
+
+def listings_path(path=None):
+    return Path(path or os.environ.get('LISTINGS_PATH', DEFAULT_LISTINGS_PATH))
+
+
+def load_listings(path=None):
+    """Read a CSV or Parquet listings file (LISTINGS_PATH by default)"""
+    path = listings_path(path)
+    if path.suffix.lower() in ('.parquet', '.pq'):
+        try:
+            frame = pd.read_parquet(path, columns=LISTING_COLUMNS)
+        except ImportError as exc:
+            raise ImportError("Reading Parquet listings requires pyarrow: pip install pyarrow") from exc
+    else:
+        frame = pd.read_csv(path, usecols=LISTING_COLUMNS)
+    missing = set(LISTING_COLUMNS) - set(frame.columns)
+    if missing:
+        raise ValueError(f"Listings file {path} is missing columns: {sorted(missing)}")
+    return frame.dropna(subset=LISTING_COLUMNS)
+
+
+def listings_fingerprint(path=None):
+    """Cheap version stamp of the listings file, changes whenever it is replaced"""
+    path = listings_path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+class ComparablesIndex:
+    """Listings sorted by (make/model, year, mileage)
+
+    Each make/model is a contiguous slice split into one block per model
+    year, and each block is sorted by mileage. Within a block the year term
+    of the distance is constant, so the k nearest rows of a block are among
+    the k either side of the query mileage. A search visits years outward
+    from the query year and stops once no remaining year can beat the
+    current k-th distance, so it only touches a few small slices however
+    large the dataset is.
+    """
+
+    def __init__(self, listings):
+        # Normalise keys per distinct make/model, not per row
+        make_codes, makes = pd.factorize(listings['make'])
+        model_codes, models = pd.factorize(listings['model'])
+        pairs, pair_of_row = np.unique(make_codes.astype(np.int64) * len(models) + model_codes,
+                                      return_inverse=True)
+        group_ids = {}
+        pair_group = np.array([group_ids.setdefault(_key(makes[p // len(models)],
+                                                         models[p % len(models)]), len(group_ids))
+                               for p in pairs.tolist()], dtype=np.int64)
+        group = pair_group[pair_of_row]
+
+        year = np.asarray(listings['year'], dtype=np.int32)
+        mileage = np.asarray(listings['mileage'], dtype=np.float64)
+        order = np.lexsort((mileage, year, group))
+        group = group[order]
+        self.year = year[order]
+        self.mileage = mileage[order]
+        self.price = np.asarray(listings['price'], dtype=np.float64)[order]
+
+        # Block boundaries wherever the make/model or the year changes
+        change = np.flatnonzero((group[1:] != group[:-1]) | (self.year[1:] != self.year[:-1])) + 1
+        starts = np.concatenate([[0], change]).astype(np.int64)
+        ends = np.concatenate([change, [len(group)]]).astype(np.int64)
+
+        blocks_by_group = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            years, blocks = blocks_by_group.setdefault(int(group[start]), ([], []))
+            years.append(int(self.year[start]))
+            blocks.append((start, end))
+        self.groups = {key: (np.array(blocks_by_group[gid][0]), blocks_by_group[gid][1])
+                       for key, gid in group_ids.items() if gid in blocks_by_group}
+
+    def __len__(self):
+        return len(self.price)
+
+    def search(self, make, model, year, mileage, k=DEFAULT_NEIGHBOURS):
+        """Row positions and distances of the k nearest listings, closest first"""
+        group = self.groups.get(_key(make, model))
+        if group is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        years, blocks = group
+
+        order = np.argsort(np.abs(years - year), kind='stable')
+        positions, distances = [], []
+        kth = np.inf
+        found = 0
+        for i in order:
+            year_term = float(years[i] - year) ** 2
+            if found >= k and year_term > kth:
+                break
+            start, end = blocks[i]
+            at = start + int(np.searchsorted(self.mileage[start:end], mileage))
+            lo, hi = max(start, at - k), min(end, at + k)
+            dist = year_term + ((self.mileage[lo:hi] - mileage) / MILES_PER_YEAR) ** 2
+            positions.append(np.arange(lo, hi))
+            distances.append(dist)
+            found += hi - lo
+            if found >= k:
+                kth = np.partition(np.concatenate(distances), k - 1)[k - 1]
+
+        positions = np.concatenate(positions)
+        distances = np.concatenate(distances)
+        if len(distances) > k:
+            keep = np.argpartition(distances, k - 1)[:k]
+            positions, distances = positions[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return positions[order], np.sqrt(distances[order])
+
+    def comparables(self, make, model, year, mileage, k=DEFAULT_NEIGHBOURS):
+        """The k nearest listings as a list of dicts"""
+        positions, distances = self.search(make, model, year, mileage, k)
+        return [{'year': int(self.year[p]), 'mileage': int(self.mileage[p]),
+                 'price': float(self.price[p]), 'distance': round(float(d), 3)}
+                for p, d in zip(positions, distances)]
+
+
+def build_index(path=None):
+    """Load the listings file and index it, or None when there is no file"""
+    if listings_fingerprint(path) is None:
+        return None
+    return ComparablesIndex(load_listings(path))
+
+
+def market_from_comparables(index, asset_info, k=DEFAULT_NEIGHBOURS):
+    """Market value and price band from the nearest listings
+
+    Returns 'market_value' and 'market_data' to overlay on a
+    simulate_market_data result, or None when the make/model has fewer
+    than MIN_COMPARABLES listings so the caller keeps the simulated figures.
+    """
+    if index is None or asset_info.get('type', 'Vehicle') != 'Vehicle':
+        return None
+    positions, distances = index.search(asset_info.get('make', ''), asset_info.get('model', ''),
+                                        asset_info.get('year', 2020),
+                                        asset_info.get('mileage', 50000), k)
+    if len(positions) < MIN_COMPARABLES:
+        return None
+
+    prices = index.price[positions]
+    # Listings are mostly retail-ready stock, so prices are scaled from
+    # 'Very Good' (multiplier 1.0) by the simulated valuation's multipliers
+    multiplier, _ = CONDITIONS.get(asset_info.get('condition', 'Good'), DEFAULT_CONDITION)
+    median = float(np.median(prices))
+    return {
+        'market_value': max(MIN_VALUE, median * multiplier),
+        'market_data': {
+            'avg_price': float(prices.mean()),
+            'median_price': median,
+            'min_price': float(np.percentile(prices, 10)),
+            'max_price': float(np.percentile(prices, 90)),
+            'trend': 'N/A',
+            'comparables': int(len(prices)),
+            'max_distance': round(float(distances[-1]), 3),
+            'source': 'Comparable listings',
+            'nearest': [{'year': int(index.year[p]), 'mileage': int(index.mileage[p]),
+                         'price': float(index.price[p])} for p in positions[:10]],
+        },
+    }
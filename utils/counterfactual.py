@@ -0,0 +1,243 @@
+"""
+Counterfactual Explanations
+The largest loan amount (equivalently, the smallest extra deposit) that the
+decision policy would approve, for one rejected application or a whole book
+"""
+
+import math
+import operator
+
+import numpy as np
+import pandas as pd
+
+from utils.loan_batch import batch_features, ratio_pct
+from utils.numeric import round_like_python
+from utils.policy import current_policy
+
+# Amount-driven measures with a closed-form bound: measure -> denominator
+# (None for the amount itself); ratios are amount / denominator * 100
+AMOUNT_MEASURES = {'requested_amount': None, 'debt_to_income': 'annual_income', 'ltv_ratio': 'asset_value'}
+COMPARE = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+           '==': operator.eq, '!=': operator.ne}
+# Amounts are searched in whole pennies; pennies / 100 is the float nearest the
+# decimal amount, as a typed-in amount would be (pennies * 0.01 need not be)
+PENNIES = 100
+# Slack for bounds like 80% of £x.y5 that land a hair below a whole penny;
+# an overshoot is caught by re-scoring and the search
+PENNY_SLACK = 1e-6
+
+
+def _ratio(amount, denominator):
+    # Same expression as simulate_loan_decision, so bounds agree to the last bit
+    return (amount / denominator * 100) if denominator > 0 else 100
+
+
+def _bounds(policy, requested, denominators):
+    """Closed-form (lowest, highest) amount in pennies allowed by the rules on amount-driven measures
+
+    Returns None when one of them fails whatever the amount (a ratio over a
+    non-positive denominator is fixed at 100).
+    """
+    low, high = 0, math.floor(requested * PENNIES + PENNY_SLACK)
+    for rule in policy.document['approval_rules']:
+        measure, op, value = rule['measure'], rule['op'], rule['value']
+        if measure not in AMOUNT_MEASURES:
+            continue
+        denominator = AMOUNT_MEASURES[measure]
+        if denominator is None:
+            bound = value
+        elif denominators[denominator] > 0:
+            bound = value * denominators[denominator] / 100
+        elif COMPARE[op](100, value):
+            continue
+        else:
+            return None
+        if op in ('<', '<='):
+            high = min(high, math.floor(bound * PENNIES + PENNY_SLACK))
+        elif op in ('>', '>='):
+            low = max(low, math.ceil(bound * PENNIES - PENNY_SLACK))
+    return (low, high) if low <= high else None
+
+
+def _at(features, pennies):
+    amount = pennies / PENNIES
+    return {**features, 'requested_amount': amount,
+            'debt_to_income': _ratio(amount, features['annual_income']),
+            'ltv_ratio': _ratio(amount, features['asset_value'])}
+
+
+def _rescore(policy, features, pennies):
+    _, measures, approved = policy.score(_at(features, pennies))
+    return measures, approved
+
+
+def _approves(policy, features, pennies):
+    return policy.approves(_at(features, pennies))
+
+
+def _ltv_edge(policy, asset_value):
+    """Last penny at or below the asset-risk LTV floor, where asset risk steps down"""
+    floor = policy.asset_ltv_floor
+    edge = math.floor(floor * asset_value / 100 * PENNIES + PENNY_SLACK)
+    while edge >= 0 and _ratio(edge / PENNIES, asset_value) > floor:
+        edge -= 1
+    while _ratio((edge + 1) / PENNIES, asset_value) <= floor:
+        edge += 1
+    return edge
+
+
+def _largest_passing(policy, features, low, high):
+    """Largest approved penny in [low, high], over which approval only falls; None if low fails"""
+    if _approves(policy, features, high):
+        return high
+    if not _approves(policy, features, low):
+        return None
+    passing, failing = low, high
+    while failing - passing > 1:
+        middle = (passing + failing) // 2
+        if _approves(policy, features, middle):
+            passing = middle
+        else:
+            failing = middle
+    return passing
+
+
+def counterfactual(features, policy=None):
+    """Largest approvable amount for one application
+
+    ``features`` are the scoring features simulate_loan_decision builds,
+    with the decision's 'compliance_risk'. The rules on the amount, DTI and
+    LTV are solved in closed form; if a risk-score rule still fails at that
+    amount, a bisection over whole pennies below it finds the largest amount
+    that passes. Risk only rises with the amount except where LTV crosses
+    the asset-risk floor, so the search is split there, upper part first.
+    The loan term is not an input to any approval rule, so only the amount
+    (or the deposit, which lowers it) can change the decision.
+    """
+    policy = policy or current_policy()
+    requested = features['requested_amount']
+    bounds = _bounds(policy, requested, features)
+    result = {'approvable': False, 'max_amount': 0.0, 'reduction': float(requested),
+              'method': 'none', 'blocking_reasons': []}
+    if bounds is None:
+        result['blocking_reasons'] = policy.rejection_reasons(_rescore(policy, features, requested * PENNIES)[0])
+        return result
+
+    low, high = bounds
+    found = high if _approves(policy, features, high) else None
+    result['method'] = 'closed_form' if found is not None else 'search'
+    if found is None:
+        segments = [(low, high)]
+        if features['asset_value'] > 0:
+            edge = _ltv_edge(policy, features['asset_value'])
+            if low <= edge < high:
+                segments = [(edge + 1, high), (low, edge)]
+        for start, end in segments:
+            found = _largest_passing(policy, features, start, end)
+            if found is not None:
+                break
+
+    if not found:
+        result['blocking_reasons'] = policy.rejection_reasons(_rescore(policy, features, max(low, 1))[0])
+        return result
+    max_amount = round(found / PENNIES, 2)
+    result.update(approvable=True, max_amount=max_amount, reduction=round(requested - max_amount, 2))
+    if max_amount < requested:
+        result['blocking_reasons'] = policy.rejection_reasons(_rescore(policy, features, found + 1)[0])
+    return result
+
+
+def counterfactual_batch(data, compliance_risk, policy=None):
+    """counterfactual over a book: loan_batch inputs plus each decision's compliance_risk
+
+    Closed-form bounds for every row at once, then a vectorized bisection
+    over the rows a risk-score rule still rejects. Returns a DataFrame
+    (indexed like ``data`` when it is one) with approvable, max_amount,
+    reduction and method ('closed_form', 'search' or 'none').
+    """
+    policy = policy or current_policy()
+    features = batch_features(data, compliance_risk)
+    requested = features['requested_amount']
+    n = len(requested)
+
+    low, high = np.zeros(n), np.floor(requested * PENNIES + PENNY_SLACK)
+    feasible = np.ones(n, dtype=bool)
+    for rule in policy.document['approval_rules']:
+        measure, op, value = rule['measure'], rule['op'], rule['value']
+        if measure not in AMOUNT_MEASURES:
+            continue
+        denominator = AMOUNT_MEASURES[measure]
+        if denominator is None:
+            bound = np.full(n, float(value))
+        else:
+            positive = features[denominator] > 0
+            bound = np.where(positive, value * features[denominator] / 100, np.inf if op in ('<', '<=') else 0)
+            if not COMPARE[op](100, value):
+                feasible &= positive
+        if op in ('<', '<='):
+            high = np.minimum(high, np.floor(bound * PENNIES + PENNY_SLACK))
+        elif op in ('>', '>='):
+            low = np.maximum(low, np.ceil(bound * PENNIES - PENNY_SLACK))
+    feasible &= low <= high
+
+    def approves(pennies, rows):
+        subset = {name: column[rows] for name, column in features.items()}
+        subset['requested_amount'] = amount = pennies / PENNIES
+        subset['debt_to_income'] = ratio_pct(amount, subset['annual_income'])
+        subset['ltv_ratio'] = ratio_pct(amount, subset['asset_value'])
+        return np.asarray(policy.score_batch(subset)['approved'], dtype=bool)
+
+    def largest_passing(start, end, rows):
+        """_largest_passing for many rows at once; -1 where start fails"""
+        found = np.where(approves(end, rows), end, -1.0)
+        todo = np.flatnonzero(found < 0)
+        todo = todo[approves(start[todo], rows[todo])]
+        passing, failing = start[todo], end[todo]
+        while todo.size:
+            active = np.flatnonzero(failing - passing > 1)
+            if not active.size:
+                break
+            middle = (passing[active] + failing[active]) // 2
+            ok = approves(middle, rows[todo[active]])
+            passing[active[ok]] = middle[ok]
+            failing[active[~ok]] = middle[~ok]
+        found[todo] = passing
+        return found
+
+    found = np.full(n, -1.0)
+    method = np.where(feasible, 'closed_form', 'none').astype(object)
+    rows = np.flatnonzero(feasible)
+    ok = approves(high[rows], rows)
+    found[rows[ok]] = high[rows[ok]]
+    search = rows[~ok]
+    method[search] = 'search'
+
+    # Split at the asset-risk LTV floor like _ltv_edge: upper segment first
+    value = features['asset_value'][search]
+    floor = policy.asset_ltv_floor
+    edge = np.floor(floor * value / 100 * PENNIES + PENNY_SLACK)
+    while True:
+        over = (edge >= 0) & (ratio_pct(edge / PENNIES, value) > floor)
+        if not over.any():
+            break
+        edge[over] -= 1
+    while True:
+        under = (value > 0) & (ratio_pct((edge + 1) / PENNIES, value) <= floor)
+        if not under.any():
+            break
+        edge[under] += 1
+    split = (value > 0) & (low[search] <= edge) & (edge < high[search])
+    upper_start = np.where(split, edge + 1, low[search])
+    found[search] = largest_passing(upper_start, high[search], search)
+    again = split & (found[search] < 0)
+    found[search[again]] = largest_passing(low[search][again], edge[again], search[again])
+
+    approvable = found > 0
+    max_amount = np.where(approvable, round_like_python(found / PENNIES, 2), 0.0)
+    result = {
+        'approvable': approvable,
+        'max_amount': max_amount,
+        'reduction': np.where(approvable, round_like_python(requested - max_amount, 2), requested),
+        'method': method,
+    }
+    return pd.DataFrame(result, index=data.index if isinstance(data, pd.DataFrame) else None)
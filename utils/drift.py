@@ -0,0 +1,371 @@
+"""
+Risk Score Drift Monitor
+Streaming KLL quantile sketches and histograms of risk_score and its
+components, with PSI and KS drift against a reference window (DRIFT_MONITOR=1)
+"""
+
+import json
+import math
+import os
+import random
+import socket
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.runtime import ThrottledWriter, env_flag
+
+ENABLED = env_flag('DRIFT_MONITOR')
+REFERENCE_SIZE = int(os.environ.get('DRIFT_REFERENCE_SIZE', 1000))
+WINDOW_SIZE = int(os.environ.get('DRIFT_WINDOW_SIZE', 1000))
+WRITE_SECONDS = float(os.environ.get('DRIFT_WRITE_SECONDS', 60))
+
+METRICS = ('risk_score', 'credit_risk', 'asset_risk', 'fraud_risk', 'compliance_risk')
+# Scores are rounded to 2 dp: one histogram bin per hundredth up to HISTOGRAM_MAX,
+# plus an overflow bin (asset risk, and so the score, is not capped)
+HISTOGRAM_MAX = 2.0
+BINS = int(round(HISTOGRAM_MAX * 100)) + 2
+PSI_BINS = 10
+# PSI >= 0.1 is worth watching, >= 0.25 a material shift
+PSI_WATCH, PSI_SHIFT = 0.1, 0.25
+SKETCH_K = 200
+
+
+class KLLSketch:
+    """KLL quantile sketch: mergeable, about 3 * k items whatever the stream length
+
+    Level h holds items standing for 2**h inputs each; a full level is
+    sorted and every other item (random offset) is promoted, so rank error
+    stays around 1.7 / k.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self._rng = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    keep = items[:len(items) % 2]
+                    self.levels[level + 1].extend(items[len(keep) + (self._rng.random() < 0.5)::2])
+                    self.levels[level] = keep
+                    break
+            self._size = sum(len(items) for items in self.levels)
+            self._max_size = sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values):
+        """Add an array: sorted once and halved level by level, then merged"""
+        values = np.sort(np.asarray(values, dtype=float).ravel())
+        batch = KLLSketch(self.k)
+        batch.n = len(values)
+        batch.levels = []
+        while len(values) > 2 * self.k:
+            keep = len(values) % 2
+            batch.levels.append(values[:keep].tolist())
+            values = values[keep + (self._rng.random() < 0.5)::2]
+        batch.levels.append(values.tolist())
+        self.merge(batch)
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(items) for items in self.levels)
+        self._max_size = sum(self._capacity(level) for level in range(len(self.levels)))
+        self._compress()
+        return self
+
+    def _weighted(self):
+        values = np.concatenate([np.asarray(items, dtype=float) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Approximate quantiles for each q in ``qs`` (NaN while empty)"""
+        qs = np.asarray(qs, dtype=float)
+        if not self.n:
+            return np.full(qs.shape, np.nan)
+        values, cumulative = self._weighted()
+        index = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        return values[np.minimum(index, len(values) - 1)]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'levels': [list(items) for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['k'])
+        sketch.n = state['n']
+        sketch.levels = [list(items) for items in state['levels']] or [[]]
+        sketch._size = sum(len(items) for items in sketch.levels)
+        sketch._max_size = sum(sketch._capacity(level) for level in range(len(sketch.levels)))
+        return sketch
+
+
+def _bins(values):
+    """Histogram bin per value: one per hundredth from 0, the last for overflow"""
+    index = np.floor(np.asarray(values, dtype=float) * 100 + 0.5).astype(np.int64)
+    return np.clip(index, 0, BINS - 1)
+
+
+class Window:
+    """Sketch and histogram per metric over one span of decisions; mergeable"""
+
+    def __init__(self):
+        self.count = 0
+        self.sketches = {metric: KLLSketch() for metric in METRICS}
+        self.histograms = {metric: np.zeros(BINS, dtype=np.int64) for metric in METRICS}
+
+    def update(self, values):
+        self.count += 1
+        for metric in METRICS:
+            value = values[metric]
+            self.sketches[metric].update(value)
+            self.histograms[metric][min(max(int(math.floor(value * 100 + 0.5)), 0), BINS - 1)] += 1
+
+    def update_many(self, columns):
+        self.count += len(columns[METRICS[0]])
+        for metric in METRICS:
+            self.sketches[metric].update_many(columns[metric])
+            self.histograms[metric] += np.bincount(_bins(columns[metric]), minlength=BINS)
+
+    def merge(self, other):
+        self.count += other.count
+        for metric in METRICS:
+            self.sketches[metric].merge(other.sketches[metric])
+            self.histograms[metric] += other.histograms[metric]
+        return self
+
+    def to_dict(self):
+        return {'count': self.count,
+                'sketches': {metric: sketch.to_dict() for metric, sketch in self.sketches.items()},
+                'histograms': {metric: hist.tolist() for metric, hist in self.histograms.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        window = cls()
+        window.count = state['count']
+        window.sketches = {metric: KLLSketch.from_dict(state['sketches'][metric]) for metric in METRICS}
+        window.histograms = {metric: np.asarray(state['histograms'][metric], dtype=np.int64)
+                             for metric in METRICS}
+        return window
+
+
+def psi(reference, current):
+    """Population stability index over PSI_BINS reference-quantile bins of two histograms"""
+    ref_total, cur_total = reference.sum(), current.sum()
+    if not ref_total or not cur_total:
+        return float('nan')
+    # Each hundredth joins the decile group its reference cumulative share starts in
+    before = np.concatenate([[0], np.cumsum(reference)[:-1]]) / ref_total
+    group = np.minimum((before * PSI_BINS).astype(np.int64), PSI_BINS - 1)
+    ref_share = np.bincount(group, reference, minlength=PSI_BINS) / ref_total
+    cur_share = np.bincount(group, current, minlength=PSI_BINS) / cur_total
+    ref_share, cur_share = np.maximum(ref_share, 1e-4), np.maximum(cur_share, 1e-4)
+    return float(np.sum((cur_share - ref_share) * np.log(cur_share / ref_share)))
+
+
+def ks(reference, current):
+    """Two-sample Kolmogorov-Smirnov statistic and asymptotic p-value from two histograms"""
+    n, m = reference.sum(), current.sum()
+    if not n or not m:
+        return float('nan'), float('nan')
+    statistic = float(np.max(np.abs(np.cumsum(reference) / n - np.cumsum(current) / m)))
+    effective = math.sqrt(n * m / (n + m))
+    lam = (effective + 0.12 + 0.11 / effective) * statistic
+    if lam < 1e-3:
+        return statistic, 1.0
+    p_value = 2 * sum((-1) ** (i - 1) * math.exp(-2 * i * i * lam * lam) for i in range(1, 101))
+    return statistic, float(min(max(p_value, 0.0), 1.0))
+
+
+def _status(value):
+    if not value >= PSI_WATCH:
+        return 'stable'
+    return 'watch' if value < PSI_SHIFT else 'shift'
+
+
+class DriftMonitor:
+    """Reference window, tumbling windows of WINDOW_SIZE decisions and lifetime totals
+
+    The reference is the first ``reference_size`` decisions unless one is
+    given (e.g. a saved state), which is then fixed and not summed when
+    monitors merge. Memory is fixed by the sketch size and bin count;
+    ``state``/``from_state``/``merge`` let several pods combine their
+    monitors.
+    """
+
+    def __init__(self, reference=None, reference_size=REFERENCE_SIZE, window_size=WINDOW_SIZE):
+        self.reference_size = reference_size
+        self.window_size = window_size
+        self.reference = reference
+        self.reference_fixed = reference is not None
+        self._building = None if reference is not None else Window()
+        self.current = Window()
+        self.last = None
+        self.lifetime = Window()
+        self._lock = threading.Lock()
+
+    def _add(self, update, values):
+        if self._building is not None:
+            update(self._building, values)
+            if self._building.count >= self.reference_size:
+                self.reference, self._building = self._building, None
+        update(self.current, values)
+        update(self.lifetime, values)
+        if self.current.count >= self.window_size:
+            self.last, self.current = self.current, Window()
+
+    def observe(self, decision):
+        """Add one decision's risk_score and risk_breakdown"""
+        values = {'risk_score': decision['risk_score'], **decision['risk_breakdown']}
+        with self._lock:
+            self._add(Window.update, values)
+
+    def observe_batch(self, result):
+        """Add a loan_batch result (DataFrame or dict of arrays), window by window"""
+        columns = {metric: np.asarray(result[metric], dtype=float) for metric in METRICS}
+        n = len(columns[METRICS[0]])
+        start = 0
+        with self._lock:
+            while start < n:
+                room = self.window_size - self.current.count
+                if self._building is not None:
+                    room = min(room, self.reference_size - self._building.count)
+                chunk = {metric: column[start:start + room] for metric, column in columns.items()}
+                self._add(Window.update_many, chunk)
+                start += room
+
+    def report(self):
+        """Drift per metric of the last full window (or the one filling) against the reference"""
+        with self._lock:
+            window = self.last if self.last is not None else self.current
+            reference = self.reference or self._building
+            rows = []
+            for metric in METRICS:
+                ref_hist, cur_hist = reference.histograms[metric], window.histograms[metric]
+                statistic, p_value = ks(ref_hist, cur_hist)
+                ref_q = reference.sketches[metric].quantiles([0.5, 0.9, 0.99]).tolist()
+                cur_q = window.sketches[metric].quantiles([0.5, 0.9, 0.99]).tolist()
+                index = psi(ref_hist, cur_hist)
+                rows.append({
+                    'metric': metric, 'reference_n': reference.count, 'window_n': window.count,
+                    'psi': index, 'ks': statistic, 'ks_p_value': p_value,
+                    'p50_reference': ref_q[0], 'p50_window': cur_q[0],
+                    'p90_reference': ref_q[1], 'p90_window': cur_q[1],
+                    'p99_reference': ref_q[2], 'p99_window': cur_q[2],
+                    'status': _status(index),
+                })
+            return rows
+
+    def state(self):
+        """JSON-ready state, for saving a reference or merging pods"""
+        with self._lock:
+            return {
+                'reference_size': self.reference_size, 'window_size': self.window_size,
+                'reference': (self.reference or self._building).to_dict(),
+                'reference_complete': self.reference is not None,
+                'reference_fixed': self.reference_fixed,
+                'current': self.current.to_dict(),
+                'last': self.last.to_dict() if self.last is not None else None,
+                'lifetime': self.lifetime.to_dict(),
+            }
+
+    @classmethod
+    def from_state(cls, state):
+        monitor = cls(reference_size=state['reference_size'], window_size=state['window_size'])
+        reference = Window.from_dict(state['reference'])
+        if state['reference_complete']:
+            monitor.reference, monitor._building = reference, None
+        else:
+            monitor._building = reference
+        monitor.reference_fixed = state.get('reference_fixed', False)
+        monitor.current = Window.from_dict(state['current'])
+        monitor.last = Window.from_dict(state['last']) if state['last'] else None
+        monitor.lifetime = Window.from_dict(state['lifetime'])
+        return monitor
+
+    def merge(self, other):
+        """Fold another pod's monitor into this one, window by window"""
+        with self._lock:
+            if not self.reference_fixed:
+                mine = self.reference if self.reference is not None else self._building
+                mine.merge(other.reference if other.reference is not None else other._building)
+                if self.reference is None and (other.reference is not None
+                                               or mine.count >= self.reference_size):
+                    self.reference, self._building = mine, None
+            self.current.merge(other.current)
+            if other.last is not None:
+                self.last = (self.last or Window()).merge(other.last)
+            self.lifetime.merge(other.lifetime)
+        return self
+
+
+def merge_state_files(paths):
+    """One monitor from the state files several pods wrote"""
+    monitors = [DriftMonitor.from_state(json.loads(Path(path).read_text(encoding='utf-8'))) for path in paths]
+    if not monitors:
+        raise ValueError("no drift state files to merge")
+    merged = monitors[0]
+    for monitor in monitors[1:]:
+        merged.merge(monitor)
+    return merged
+
+
+_monitor = []
+_monitor_lock = threading.Lock()
+_writer = ThrottledWriter(WRITE_SECONDS)
+
+
+def monitor():
+    """The process-wide monitor; DRIFT_REFERENCE_PATH seeds its reference from a saved state"""
+    if not _monitor:
+        with _monitor_lock:
+            if not _monitor:
+                path = os.environ.get('DRIFT_REFERENCE_PATH')
+                reference = None
+                if path:
+                    state = json.loads(Path(path).read_text(encoding='utf-8'))
+                    reference = Window.from_dict(state['reference'])
+                _monitor.append(DriftMonitor(reference))
+    return _monitor[0]
+
+
+def write_state(path, force=False):
+    """Write this process's monitor state to ``path`` atomically, at most every WRITE_SECONDS"""
+    _writer.write(path, lambda: json.dumps(monitor().state()), force)
+
+
+def record(decision):
+    """Feed one decision to the monitor and write DRIFT_STATE_PATH when it is due
+
+    DRIFT_STATE_PATH may contain {host} and {pid}, so each pod writes its own
+    file for merge_state_files.
+    """
+    monitor().observe(decision)
+    path = os.environ.get('DRIFT_STATE_PATH')
+    if path:
+        write_state(path.format(host=socket.gethostname(), pid=os.getpid()))
@@ -0,0 +1,156 @@
+"""
+Image Ingestion
+Thread-pool decoding of uploaded photos into EXIF-rotated previews and
+analysis-resolution copies, cached by content hash within a memory budget
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image, ImageOps
+
+PREVIEW_SIZE = 640
+PREVIEW_QUALITY = 80
+ANALYSIS_SIZE = 512
+MAX_WORKERS = 4
+DEFAULT_BUDGET_BYTES = int(float(os.environ.get('PHOTO_CACHE_BUDGET_MB', 64)) * 1024 * 1024)
+
+
+def photo_bytes(photo):
+    """Raw bytes of an upload (Streamlit UploadedFile, file object or bytes)"""
+    if isinstance(photo, (bytes, bytearray)):
+        return bytes(photo)
+    if hasattr(photo, 'getvalue'):
+        return photo.getvalue()
+    photo.seek(0)
+    return photo.read()
+
+
+def process_photo(data):
+    """Decode, EXIF-rotate and downsize one photo
+
+    Returns the preview as JPEG bytes and the analysis copy as a greyscale
+    uint8 array no larger than ANALYSIS_SIZE on either side.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        image_format = image.format
+        # JPEG draft mode decodes at a reduced scale, far cheaper than full size
+        image.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=PREVIEW_QUALITY)
+
+    analysis = image.convert('L')
+    analysis.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    return {
+        'preview': buffer.getvalue(),
+        'pixels': np.asarray(analysis, dtype=np.uint8),
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'bytes': len(data),
+    }
+
+
+def _record_size(record):
+    return len(record.get('preview', b'')) + getattr(record.get('pixels'), 'nbytes', 0)
+
+
+class PhotoStore:
+    """Per-session LRU of processed photos, bounded by ``budget_bytes``
+
+    Only the preview and analysis copies count against the budget; the
+    original upload is never retained. Records for the current call are
+    always returned, even when the budget is too small to keep them.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, max_workers=MAX_WORKERS):
+        self.budget_bytes = budget_bytes
+        self.max_workers = max_workers
+        self._records = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _get(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+            return record
+
+    def _put(self, key, record):
+        size = _record_size(record)
+        with self._lock:
+            if key in self._records or size > self.budget_bytes:
+                return
+            self._records[key] = record
+            self._used += size
+            while self._used > self.budget_bytes:
+                _, old = self._records.popitem(last=False)
+                self._used -= _record_size(old)
+                self._stats['evictions'] += 1
+
+    def ingest(self, photos, on_progress=None):
+        """Processed records for ``photos``, in upload order
+
+        Cache misses are decoded in a thread pool (Pillow releases the GIL
+        while decoding). ``on_progress(done, total)`` is called on the
+        calling thread as photos complete. Undecodable uploads get a record
+        with an 'error' key instead of image data.
+        """
+        photos = list(photos)
+        total = len(photos)
+        records = [None] * total
+        pending = {}
+        for i, photo in enumerate(photos):
+            data = photo_bytes(photo)
+            key = hashlib.sha256(data).hexdigest()
+            cached = self._get(key)
+            if cached is not None:
+                records[i] = cached
+            else:
+                pending.setdefault(key, (data, []))[1].append(i)
+
+        done = total - sum(len(indexes) for _, indexes in pending.values())
+        if on_progress:
+            on_progress(done, total)
+
+        if pending:
+            workers = max(1, min(self.max_workers, len(pending)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as pool:
+                futures = {pool.submit(process_photo, data): key
+                           for key, (data, _) in pending.items()}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        record = dict(future.result(), key=key)
+                        self._put(key, record)
+                    except Exception as exc:  # unreadable upload: report, don't abort
+                        record = {'key': key, 'error': str(exc)}
+                    indexes = pending[key][1]
+                    for i in indexes:
+                        records[i] = record
+                    done += len(indexes)
+                    if on_progress:
+                        on_progress(done, total)
+
+        return [dict(record, name=getattr(photo, 'name', f"photo_{i + 1}"))
+                for i, (photo, record) in enumerate(zip(photos, records))]
+
+    def stats(self):
+        """Counters plus bytes used against the budget"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._records),
+                        used_bytes=self._used, budget_bytes=self.budget_bytes)
@@ -0,0 +1,299 @@
+"""
+Instrumentation
+Rerun, section and simulate_* call timings with payload sizes, exported in
+the Prometheus text format; a no-op unless INSTRUMENTATION is set
+"""
+
+import bisect
+import functools
+import itertools
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.runtime import ThrottledWriter, env_flag
+
+ENABLED = env_flag('INSTRUMENTATION')
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS_WRITE_SECONDS = float(os.environ.get('METRICS_WRITE_SECONDS', 5))
+PAYLOAD_SAMPLE_EVERY = max(int(os.environ.get('PAYLOAD_SAMPLE_EVERY', 10)), 1)
+
+# name -> (type, help); histograms carry their buckets
+METRICS = {
+    'app_reruns_total': ('counter', "Script reruns by page"),
+    'app_rerun_seconds': ('histogram', "Wall time of a whole rerun by page", SECONDS_BUCKETS),
+    'app_section_seconds': ('histogram', "Wall time of a section of a rerun", SECONDS_BUCKETS),
+    'simulate_calls_total': ('counter', "Calls by function"),
+    'simulate_errors_total': ('counter', "Calls that raised, by function"),
+    'simulate_call_seconds': ('histogram', "Wall time of a call by function", SECONDS_BUCKETS),
+    'simulate_payload_bytes': ('histogram', "Approximate size of sampled call arguments (in) and results (out)",
+                               BYTES_BUCKETS),
+}
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by (metric, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        """``labels`` is a dict, or a label_key() to skip sorting it per call"""
+        key = (name, labels if isinstance(labels, tuple) else label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, labels if isinstance(labels, tuple) else label_key(labels))
+        buckets = METRICS[name][2]
+        i = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0,
+                                                  'count': 0, 'max': 0.0}
+            if i < len(buckets):
+                series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+            series['max'] = max(series['max'], value)
+
+    def snapshot(self):
+        """{metric: {labels: value or histogram dict}}, copied under the lock"""
+        out = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                out.setdefault(name, {})[labels] = value
+            for (name, labels), series in self._histograms.items():
+                out.setdefault(name, {})[labels] = {**series, 'buckets': list(series['buckets'])}
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (kind, help_text, *rest) in METRICS.items():
+            if name not in snapshot:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(snapshot[name].items()):
+                if kind == 'counter':
+                    lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(rest[0], value['buckets']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value['count']}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+REGISTRY = Registry()
+
+
+def histogram_rows(snapshot, name, scale=1000):
+    """One dict per series of a histogram: labels, count, mean, p95, max
+
+    p95 is the upper bound of the bucket it falls in (the max past the
+    last bucket). ``scale`` converts the values, e.g. seconds to ms.
+    """
+    buckets = METRICS[name][2]
+    rows = []
+    for labels, series in sorted(snapshot.get(name, {}).items()):
+        target, seen, p95 = 0.95 * series['count'], 0, series['max']
+        for bound, count in zip(buckets, series['buckets']):
+            seen += count
+            if seen >= target:
+                p95 = min(bound, series['max'])
+                break
+        rows.append({**dict(labels), 'count': series['count'],
+                     'mean': series['sum'] / series['count'] * scale if series['count'] else 0.0,
+                     'p95': p95 * scale, 'max': series['max'] * scale})
+    return rows
+
+
+_SCALAR_BYTES = {type(None): 1, bool: 1, int: 8, float: 8}
+
+
+def payload_bytes(value, _depth=0):
+    """Rough in-memory size of a call payload without serialising it
+
+    Strings and bytes count their length, numbers 8, uploads their
+    ``size``; containers are summed, to a depth of 6.
+    """
+    kind = type(value)
+    if kind in _SCALAR_BYTES:
+        return _SCALAR_BYTES[kind]
+    if kind is str or kind is bytes or kind is bytearray:
+        return len(value)
+    if _depth > 6:
+        return 0
+    if isinstance(value, dict):
+        total = 0
+        for key, item in value.items():
+            total += len(key) if type(key) is str else 8
+            kind = type(item)
+            if kind in _SCALAR_BYTES:
+                total += _SCALAR_BYTES[kind]
+            elif kind is str:
+                total += len(item)
+            else:
+                total += payload_bytes(item, _depth + 1)
+        return total
+    if isinstance(value, (list, tuple, set)):
+        return sum(payload_bytes(v, _depth + 1) for v in value)
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    size = getattr(value, 'size', None)
+    if isinstance(size, int):
+        return size
+    nbytes = getattr(value, 'nbytes', None)
+    return nbytes if isinstance(nbytes, int) else 8
+
+
+def instrumented(fn):
+    """Count and time every call to ``fn``, and size the payloads of one
+    call in PAYLOAD_SAMPLE_EVERY (walking an application dict costs about
+    as much as pricing it)
+
+    Returns ``fn`` itself when instrumentation is disabled, so the
+    disabled cost is nothing at all.
+    """
+    if not ENABLED:
+        return fn
+    labels = label_key({'function': fn.__name__})
+    payload_in = label_key({'function': fn.__name__, 'direction': 'in'})
+    payload_out = label_key({'function': fn.__name__, 'direction': 'out'})
+    calls = itertools.count()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        REGISTRY.inc('simulate_calls_total', labels)
+        sampled = next(calls) % PAYLOAD_SAMPLE_EVERY == 0
+        if sampled:
+            REGISTRY.observe('simulate_payload_bytes', payload_in,
+                             payload_bytes(args) + (payload_bytes(kwargs) if kwargs else 0))
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            REGISTRY.inc('simulate_errors_total', labels)
+            raise
+        finally:
+            REGISTRY.observe('simulate_call_seconds', labels, time.perf_counter() - start)
+        if sampled:
+            REGISTRY.observe('simulate_payload_bytes', payload_out, payload_bytes(result))
+        return result
+
+    return wrapper
+
+
+class _Section:
+    __slots__ = ('labels', 'start')
+
+    def __init__(self, name):
+        self.labels = (('section', name),)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        REGISTRY.observe('app_section_seconds', self.labels, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_SECTION = nullcontext()
+
+
+def section(name):
+    """Context manager timing one section of a rerun"""
+    return _Section(name) if ENABLED else _NULL_SECTION
+
+
+def record_rerun(page, seconds):
+    """Record a finished rerun and refresh the exported metrics"""
+    if not ENABLED:
+        return
+    labels = {'page': page}
+    REGISTRY.inc('app_reruns_total', labels)
+    REGISTRY.observe('app_rerun_seconds', labels, seconds)
+    path = os.environ.get('METRICS_PATH')
+    if path:
+        write_metrics(path)
+
+
+_writer = ThrottledWriter(METRICS_WRITE_SECONDS)
+
+
+def write_metrics(path, force=False):
+    """Write the metrics to ``path`` atomically, at most every METRICS_WRITE_SECONDS
+
+    Suits node_exporter's textfile collector or any scraper reading a file.
+    """
+    _writer.write(path, REGISTRY.render, force)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = []
+
+
+def serve_metrics(port, host='0.0.0.0'):
+    """Serve /metrics on ``port`` from a daemon thread; once per process"""
+    if _server:
+        return _server[0]
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    _server.append(server)
+    return server
+
+
+def start_from_env():
+    """Start the /metrics endpoint when METRICS_PORT is set"""
+    port = os.environ.get('METRICS_PORT')
+    if ENABLED and port:
+        serve_metrics(int(port))
@@ -0,0 +1,297 @@
+"""
+MRZ Codec
+ICAO 9303 machine readable zone encoding, decoding and check digits for
+TD1 (ID card, 3 x 30) and TD3 (passport, 2 x 44) documents
+"""
+
+import re
+from datetime import date
+
+import numpy as np
+
+FILLER = '<'
+WEIGHTS = (7, 3, 1)
+
+TD1_LINE_LENGTH = 30
+TD3_LINE_LENGTH = 44
+
+# Nationality labels used by the onboarding form -> ICAO 9303 codes
+COUNTRY_CODES = {
+    'United Kingdom': 'GBR',
+    'United States': 'USA',
+    'Canada': 'CAN',
+    'Australia': 'AUS',
+    'Germany': 'D',
+    'France': 'FRA',
+}
+UNSPECIFIED_NATIONALITY = 'XXX'
+
+# (start, end) of each check-digit-protected field and the position of its
+# check digit, in the concatenated MRZ (lines joined without newlines)
+TD3_CHECKS = {
+    'document_number': ((44, 53), 53),
+    'date_of_birth': ((57, 63), 63),
+    'expiry_date': ((65, 71), 71),
+    'personal_number': ((72, 86), 86),
+}
+TD3_COMPOSITE = (((44, 54), (57, 64), (65, 87)), 87)
+
+TD1_CHECKS = {
+    'document_number': ((5, 14), 14),
+    'date_of_birth': ((30, 36), 36),
+    'expiry_date': ((38, 44), 44),
+}
+TD1_COMPOSITE = (((5, 30), (30, 37), (38, 45), (48, 59)), 59)
+
+# Character -> value lookup; -1 marks characters not allowed in an MRZ
+_VALUES = np.full(256, -1, dtype=np.int64)
+_VALUES[ord('0'):ord('9') + 1] = np.arange(10)
+_VALUES[ord('A'):ord('Z') + 1] = np.arange(10, 36)
+_VALUES[ord(FILLER)] = 0
+
+
+def char_value(char):
+    """Numeric value of an MRZ character for check digit computation"""
+    code = ord(char)
+    value = _VALUES[code] if code < 256 else -1
+    if value < 0:
+        raise ValueError(f"Invalid MRZ character: {char!r}")
+    return int(value)
+
+
+def check_digit(data):
+    """ICAO 9303 check digit (weights 7-3-1, modulo 10) of a field"""
+    total = sum(char_value(c) * WEIGHTS[i % 3] for i, c in enumerate(data))
+    return str(total % 10)
+
+
+def _field(value, length):
+    """Upper-case, replace anything outside A-Z/0-9 with filler and pad/truncate"""
+    text = re.sub(r'[^A-Z0-9]', FILLER, str(value or '').upper())
+    return text[:length].ljust(length, FILLER)
+
+
+def _name_field(last_name, first_name, length):
+    """SURNAME<<GIVEN<NAMES, truncated and padded to the field length"""
+    def clean(part):
+        part = re.sub(r"[’']", '', str(part or '').upper())
+        return re.sub(r'[^A-Z]+', FILLER, part).strip(FILLER)
+    return _field(f"{clean(last_name)}{FILLER * 2}{clean(first_name)}", length)
+
+
+def _date_field(value):
+    """YYMMDD from a date or ISO date string"""
+    if not value:
+        return FILLER * 6
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.strftime('%y%m%d')
+
+
+def country_code(country):
+    """ICAO code for a nationality label, passing through 3-letter codes"""
+    if country in COUNTRY_CODES:
+        return COUNTRY_CODES[country]
+    if isinstance(country, str) and re.fullmatch(r'[A-Z]{1,3}', country):
+        return country
+    return UNSPECIFIED_NATIONALITY
+
+
+def encode_td3(document_number, issuing_state, nationality, last_name, first_name,
+               date_of_birth, sex, expiry_date, personal_number='', document_type='P'):
+    """Build the two 44-character lines of a passport MRZ"""
+    line1 = (_field(document_type, 2) + _field(country_code(issuing_state), 3) +
+             _name_field(last_name, first_name, 39))
+
+    doc = _field(document_number, 9)
+    dob = _date_field(date_of_birth)
+    exp = _date_field(expiry_date)
+    personal = _field(personal_number, 14)
+    personal_check = check_digit(personal) if personal.strip(FILLER) else FILLER
+
+    line2 = (doc + check_digit(doc) + _field(country_code(nationality), 3) +
+             dob + check_digit(dob) + _field(sex or FILLER, 1) +
+             exp + check_digit(exp) + personal + personal_check)
+    composite_data = line2[0:10] + line2[13:20] + line2[21:43]
+    return line1, line2 + check_digit(composite_data)
+
+
+def encode_td1(document_number, issuing_state, nationality, last_name, first_name,
+               date_of_birth, sex, expiry_date, optional_data='', optional_data2='',
+               document_type='I'):
+    """Build the three 30-character lines of an ID card MRZ"""
+    doc = _field(document_number, 9)
+    line1 = (_field(document_type, 2) + _field(country_code(issuing_state), 3) +
+             doc + check_digit(doc) + _field(optional_data, 15))
+
+    dob = _date_field(date_of_birth)
+    exp = _date_field(expiry_date)
+    line2 = (dob + check_digit(dob) + _field(sex or FILLER, 1) +
+             exp + check_digit(exp) + _field(country_code(nationality), 3) +
+             _field(optional_data2, 11))
+    composite_data = line1[5:30] + line2[0:7] + line2[8:15] + line2[18:29]
+    line2 += check_digit(composite_data)
+
+    return line1, line2, _name_field(last_name, first_name, 30)
+
+
+def _parse_date(yymmdd, future):
+    """YYMMDD -> ISO date; expiry dates roll forward, birth dates backward"""
+    if not yymmdd.isdigit():
+        return None
+    yy, mm, dd = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:])
+    this_year = date.today().year % 100
+    century = 2000 if (future or yy <= this_year) else 1900
+    try:
+        return date(century + yy, mm, dd).isoformat()
+    except ValueError:
+        return None
+
+
+def _text(field):
+    return field.replace(FILLER, ' ').strip()
+
+
+def _split_names(field):
+    last, _, first = field.partition(FILLER * 2)
+    return _text(last), _text(first)
+
+
+def _verify(mrz, checks, composite):
+    results = {}
+    for name, ((start, end), pos) in checks.items():
+        data, digit = mrz[start:end], mrz[pos]
+        # An all-filler optional field may carry a filler check digit
+        if digit == FILLER and not data.strip(FILLER):
+            results[name] = True
+        else:
+            results[name] = check_digit(data) == digit
+    spans, pos = composite
+    results['composite'] = check_digit(''.join(mrz[s:e] for s, e in spans)) == mrz[pos]
+    return results
+
+
+def _join(lines, count, length):
+    if isinstance(lines, str):
+        lines = lines.split()
+    lines = [line.strip() for line in lines]
+    if len(lines) != count or any(len(line) != length for line in lines):
+        raise ValueError(f"Expected {count} MRZ lines of {length} characters")
+    mrz = ''.join(lines)
+    for char in mrz:
+        char_value(char)
+    return mrz
+
+
+def decode_td3(lines):
+    """Parse a passport MRZ (two lines or newline-separated string)"""
+    mrz = _join(lines, 2, TD3_LINE_LENGTH)
+    last_name, first_name = _split_names(mrz[5:44])
+    checks = _verify(mrz, TD3_CHECKS, TD3_COMPOSITE)
+    return {
+        'format': 'TD3',
+        'document_type': _text(mrz[0:2]),
+        'issuing_state': _text(mrz[2:5]),
+        'last_name': last_name,
+        'first_name': first_name,
+        'document_number': _text(mrz[44:53]),
+        'nationality': _text(mrz[54:57]),
+        'date_of_birth': _parse_date(mrz[57:63], future=False),
+        'sex': _text(mrz[64]),
+        'expiry_date': _parse_date(mrz[65:71], future=True),
+        'personal_number': _text(mrz[72:86]),
+        'checks': checks,
+        'valid': all(checks.values()),
+    }
+
+
+def decode_td1(lines):
+    """Parse an ID card MRZ (three lines or newline-separated string)"""
+    mrz = _join(lines, 3, TD1_LINE_LENGTH)
+    last_name, first_name = _split_names(mrz[60:90])
+    checks = _verify(mrz, TD1_CHECKS, TD1_COMPOSITE)
+    return {
+        'format': 'TD1',
+        'document_type': _text(mrz[0:2]),
+        'issuing_state': _text(mrz[2:5]),
+        'document_number': _text(mrz[5:14]),
+        'optional_data': _text(mrz[15:30]),
+        'date_of_birth': _parse_date(mrz[30:36], future=False),
+        'sex': _text(mrz[37]),
+        'expiry_date': _parse_date(mrz[38:44], future=True),
+        'nationality': _text(mrz[45:48]),
+        'optional_data2': _text(mrz[48:59]),
+        'last_name': last_name,
+        'first_name': first_name,
+        'checks': checks,
+        'valid': all(checks.values()),
+    }
+
+
+BULK_CHUNK_ROWS = 65536
+
+
+def _bulk_matrix(mrz_strings, length):
+    """Encode MRZ strings into an (n, length) matrix of character values"""
+    raw = np.array([s.replace('\n', '').encode('ascii', 'replace') for s in mrz_strings],
+                   dtype=f'S{length + 1}')
+    codes = raw.view(np.uint8).reshape(len(raw), length + 1)
+    values = _VALUES[codes[:, :length]]
+    # Short strings leave NUL bytes (value -1) inside the window, long ones
+    # leave a non-NUL byte just past it
+    well_formed = (values >= 0).all(axis=1) & (codes[:, length] == 0)
+    return values, codes[:, :length], well_formed
+
+
+def _bulk_digit(values, spans):
+    """Vectorized check digit over the concatenation of column spans"""
+    cols = np.concatenate([np.arange(s, e) for s, e in spans])
+    weights = np.resize(np.array(WEIGHTS, dtype=np.int64), cols.size)
+    return (values[:, cols] @ weights) % 10
+
+
+def _validate_chunk(mrz_strings, length, checks, composite):
+    values, codes, well_formed = _bulk_matrix(mrz_strings, length)
+    digits = codes.astype(np.int64) - ord('0')
+    filler = codes == ord(FILLER)
+
+    results = {}
+    for name, ((start, end), pos) in checks.items():
+        ok = _bulk_digit(values, [(start, end)]) == digits[:, pos]
+        empty = filler[:, pos] & filler[:, start:end].all(axis=1)
+        results[name] = (ok | empty) & well_formed
+    spans, pos = composite
+    results['composite'] = (_bulk_digit(values, spans) == digits[:, pos]) & well_formed
+    results['well_formed'] = well_formed
+    return results
+
+
+def validate_bulk(mrz_strings, doc_format='TD3'):
+    """Validate check digits of many MRZs at once
+
+    ``mrz_strings`` holds one full MRZ per entry, lines concatenated (a
+    newline between lines is tolerated). Work is done in fixed-size chunks
+    so memory stays flat for back-book sized inputs. Returns a dict of
+    boolean arrays: one per protected field, 'composite', 'well_formed'
+    and 'valid'.
+    """
+    if doc_format == 'TD3':
+        length, checks, composite = 2 * TD3_LINE_LENGTH, TD3_CHECKS, TD3_COMPOSITE
+    elif doc_format == 'TD1':
+        length, checks, composite = 3 * TD1_LINE_LENGTH, TD1_CHECKS, TD1_COMPOSITE
+    else:
+        raise ValueError(f"Unsupported MRZ format: {doc_format}")
+
+    mrz_strings = list(mrz_strings)
+    keys = list(checks) + ['composite', 'well_formed']
+    parts = {key: [] for key in keys}
+    for start in range(0, len(mrz_strings), BULK_CHUNK_ROWS):
+        chunk = _validate_chunk(mrz_strings[start:start + BULK_CHUNK_ROWS],
+                                length, checks, composite)
+        for key in keys:
+            parts[key].append(chunk[key])
+
+    results = {key: np.concatenate(parts[key]) if parts[key] else np.zeros(0, dtype=bool)
+               for key in keys}
+    results['valid'] = np.logical_and.reduce([results[key] for key in keys])
+    return results
@@ -0,0 +1,56 @@
+"""
+Numeric Helpers
+Shared NumPy utilities for the vectorized (batch) code paths
+"""
+
+import numpy as np
+
+_SPLITTER = 134217729.0  # 2**27 + 1, Veltkamp split for float64
+
+
+def as_column(values, length, dtype=float):
+    """Broadcast a scalar or sequence to a 1-D array of the given length"""
+    arr = np.asarray(values, dtype=dtype)
+    if arr.ndim == 0:
+        return np.full(length, arr, dtype=dtype)
+    return arr.reshape(-1)
+
+
+def _split(a):
+    t = _SPLITTER * a
+    hi = t - (t - a)
+    return hi, a - hi
+
+
+def _two_product(a, b):
+    """Return (p, err) with p = fl(a*b) and a*b == p + err exactly"""
+    p = a * b
+    a_hi, a_lo = _split(a)
+    b_hi, b_lo = _split(b)
+    err = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+    return p, err
+
+
+def round_like_python(values, ndigits=0):
+    """Round an array exactly like the builtin round() does for floats
+
+    np.round multiplies by 10**ndigits first, and that product can round
+    onto an exact .5 tie the true value does not sit on. The rounding error
+    of the product is recovered exactly and used to break those ties, so
+    batch results agree with the scalar functions to the last digit.
+    """
+    if ndigits < 0:
+        raise ValueError("ndigits must be non-negative")
+    arr = np.asarray(values, dtype=float)
+    scale = 10.0 ** ndigits
+    scaled = arr * scale
+    rounded = np.round(scaled)
+
+    tie = np.flatnonzero((scaled - np.floor(scaled)) == 0.5)
+    if tie.size:
+        src = arr.reshape(-1)[tie]
+        _, err = _two_product(src, scale)
+        flat = rounded.reshape(-1)
+        flat[tie] = np.where(err > 0, np.ceil(src * scale),
+                             np.where(err < 0, np.floor(src * scale), flat[tie]))
+    return rounded / scale
@@ -0,0 +1,64 @@
+"""
+Page Registry
+Maps navigation entries to view modules and imports each one on first use
+"""
+
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Navigation label -> (menu icon, view module). Order is the sidebar order.
+PAGES = {
+    "Home": ("house", "views.home"),
+    "Onboarding": ("person-plus", "views.onboarding"),
+    "eKYC": ("shield-check", "views.ekyc"),
+    "Asset Valuation": ("image", "views.asset_valuation"),
+    "Loan Application": ("file-earmark-text", "views.loan_application"),
+    "Results": ("graph-up", "views.results"),
+    "Wireframes": ("palette", "views.wireframes"),
+    "Investor Pitch": ("briefcase", "views.investor_pitch"),
+    "Investor Targeting": ("search", "views.investor_targeting"),
+    "Crowdfunding": ("piggy-bank", "views.crowdfunding"),
+    "Architecture": ("diagram-3", "views.architecture"),
+}
+
+# Module-level so it survives Streamlit reruns (app.py is re-executed,
+# this module is not)
+_loaded = {}
+_import_costs = {}
+
+
+def page_names():
+    """Navigation labels in menu order"""
+    return list(PAGES)
+
+
+def page_icons():
+    """Menu icons aligned with page_names()"""
+    return [icon for icon, _ in PAGES.values()]
+
+
+def load_page(name):
+    """Import the view module for a page on first navigation and cache it"""
+    module = _loaded.get(name)
+    if module is None:
+        _, module_path = PAGES[name]
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        _import_costs[name] = time.perf_counter() - start
+        _loaded[name] = module
+        logger.info("Loaded page %s (%s) in %.1f ms", name, module_path,
+                    _import_costs[name] * 1000)
+    return module
+
+
+def render_page(name):
+    """Load (if needed) and show a page"""
+    load_page(name).show()
+
+
+def import_costs():
+    """Seconds spent importing each page loaded so far in this process"""
+    return dict(_import_costs)
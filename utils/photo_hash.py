@@ -0,0 +1,424 @@
+"""
+Photo Hash Index
+Perceptual hashes (pHash) of asset photos and a multi-index hash table for
+finding reused photos by Hamming distance, persisted as a snapshot plus
+per-process append-only journals shared by replicas
+"""
+
+import itertools
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+MATCH_DISTANCE = 10
+MERGE_THRESHOLD = 4096
+# How often an index re-reads the other processes' journals, and how many
+# journaled hashes trigger a new snapshot
+SYNC_SECONDS = float(os.environ.get('PHOTO_HASH_SYNC_SECONDS', 5))
+COMPACT_ENTRIES = int(os.environ.get('PHOTO_HASH_COMPACT_ENTRIES', 100000))
+# A journal from another host untouched this long is taken to belong to a
+# process that has gone, and is deleted once a snapshot holds all of it
+JOURNAL_STALE_SECONDS = float(os.environ.get('PHOTO_HASH_JOURNAL_STALE_SECONDS', 86400))
+
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _pack(bits):
+    return int(np.packbits(bits.ravel()).view('>u8')[0])
+
+
+def _resized(pixels, size):
+    image = Image.fromarray(np.asarray(pixels, dtype=np.uint8))
+    return np.asarray(image.resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def phash(pixels):
+    """64-bit DCT perceptual hash of a greyscale image array"""
+    small = _resized(pixels, (32, 32))
+    low = (_DCT32 @ small @ _DCT32.T)[:8, :8]
+    return _pack(low > np.median(low))
+
+
+def popcount(values):
+    """Set bits per element of a uint64 array"""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    as_bytes = values.reshape(-1, 1).view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=1, dtype=np.int64).reshape(values.shape)
+
+
+def _flip_masks(max_flips):
+    """All BAND_BITS-bit masks with at most ``max_flips`` bits set"""
+    masks = [0]
+    for flips in range(1, max_flips + 1):
+        for bits in itertools.combinations(range(BAND_BITS), flips):
+            masks.append(sum(1 << b for b in bits))
+    return np.array(masks, dtype=np.uint64)
+
+
+class HashJournal:
+    """Append-only logs of recorded hashes beside an index snapshot, one per process
+
+    Each process appends what it records to its own
+    ``<stem>.<host>-<pid>.journal`` and reads every journal in the
+    directory from where it last stopped, so replicas sharing the directory
+    see each other's photos and a restart loses nothing. ``offsets`` says
+    how far into each journal the index has read; a snapshot stores them,
+    so loading it resumes every journal where the snapshot left off. A
+    snapshot leaves out, and is followed by deleting, the journals it holds
+    in full that no live process still appends to (``compactable``).
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = Path(snapshot)
+        self.path = self.snapshot.with_name(
+            f"{self.snapshot.stem}.{socket.gethostname()}-{os.getpid()}.journal")
+        self.offsets = {}
+        self.unsaved = 0
+        self._inodes = {}
+        # The snapshot file last loaded or written; a different one on disk
+        # means another process has snapshotted and compacted
+        self.loaded = None
+
+    def _journals(self):
+        return sorted(self.snapshot.parent.glob(f"{self.snapshot.stem}.*.journal"))
+
+    def read_new(self):
+        """(hashes, refs) appended to any journal since the last read"""
+        hashes, refs = [], []
+        present = set()
+        for journal in self._journals():
+            try:
+                stat = journal.stat()
+            except FileNotFoundError:
+                continue  # compacted by another process since the glob
+            present.add(journal.name)
+            offset = self.offsets.get(journal.name, 0)
+            if stat.st_size < offset or self._inodes.get(journal.name, stat.st_ino) != stat.st_ino:
+                offset = 0  # deleted after a snapshot and started again by its process
+            self._inodes[journal.name] = stat.st_ino
+            if stat.st_size == offset:
+                self.offsets[journal.name] = offset
+                continue
+            with open(journal, 'rb') as handle:
+                handle.seek(offset)
+                data = handle.read()
+            # A line still being written is picked up on the next read
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].decode('utf-8', errors='replace').splitlines():
+                value, _, ref = line.partition(' ')
+                try:
+                    hashes.append(int(value, 16))
+                except ValueError:
+                    continue  # the unfinished line of a process that died mid-write
+                refs.append(ref)
+            self.offsets[journal.name] = offset + end
+        for name in set(self.offsets) - present:
+            del self.offsets[name]
+            self._inodes.pop(name, None)
+        self.unsaved += len(hashes)
+        return hashes, refs
+
+    def append(self, entries):
+        """Write (hash, ref) pairs to this process's journal in one write"""
+        data = ''.join(f"{value:016x} {' '.join(str(ref).split())}\n" for value, ref in entries).encode('utf-8')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab') as handle:
+            if handle.tell() > self.offsets.get(self.path.name, 0):
+                data = b'\n' + data  # end a line left unfinished by an earlier run
+            handle.write(data)
+            self.offsets[self.path.name] = handle.tell()
+            self._inodes[self.path.name] = os.fstat(handle.fileno()).st_ino
+        self.unsaved += len(entries)
+
+    def _owner_gone(self, journal, stat):
+        owner = journal.name[len(self.snapshot.stem) + 1:-len('.journal')]
+        host, _, pid = owner.rpartition('-')
+        if host == socket.gethostname() and pid.isdigit() and os.name == 'posix':
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+            return False
+        return time.time() - stat.st_mtime > JOURNAL_STALE_SECONDS
+
+    def compactable(self):
+        """Journals read to the end that no live process appends to: this process's and dead ones'"""
+        names = []
+        for journal in self._journals():
+            try:
+                stat = journal.stat()
+            except FileNotFoundError:
+                continue
+            if self.offsets.get(journal.name) == stat.st_size and (
+                    journal == self.path or self._owner_gone(journal, stat)):
+                names.append(journal.name)
+        return names
+
+    def delete(self, names):
+        for name in names:
+            try:
+                (self.snapshot.parent / name).unlink()
+            except FileNotFoundError:
+                pass  # another replica compacted it first
+            self.offsets.pop(name, None)
+            self._inodes.pop(name, None)
+
+
+def _identity(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class PhotoHashIndex:
+    """Multi-index hash table over 64-bit photo hashes
+
+    Each hash is split into BANDS bands of BAND_BITS bits, and every band
+    is kept as a sorted array. Two hashes within distance r must agree to
+    within r // BANDS bits on at least one band, so a query only probes the
+    band values that close to its own, then verifies those candidates with
+    a vectorized popcount. New hashes go to a small unsorted tail that is
+    scanned directly and merged into the sorted bands once it grows past
+    MERGE_THRESHOLD. With a ``journal`` (see load_index), ``record`` also
+    persists new hashes and ``sync`` picks up other processes' hashes.
+    """
+
+    def __init__(self, hashes=(), refs=(), journal=None):
+        self._lock = threading.Lock()
+        self.journal = journal
+        self._synced_at = 0.0
+        self._hashes = np.asarray(hashes, dtype=np.uint64).reshape(-1)
+        self._refs = list(refs)
+        if len(self._refs) != len(self._hashes):
+            raise ValueError("hashes and refs must have the same length")
+        self._tail_hashes = []
+        self._tail_refs = []
+        self._masks = {}
+        self._build_bands()
+
+    def _build_bands(self):
+        self._band_order = []
+        self._band_values = []
+        for band in range(BANDS):
+            values = (self._hashes >> np.uint64(band * BAND_BITS)) & np.uint64((1 << BAND_BITS) - 1)
+            order = np.argsort(values, kind='stable')
+            self._band_order.append(order)
+            self._band_values.append(values[order])
+
+    def __len__(self):
+        return len(self._hashes) + len(self._tail_hashes)
+
+    def add(self, hash_value, ref):
+        with self._lock:
+            self._tail_hashes.append(hash_value)
+            self._tail_refs.append(ref)
+            if len(self._tail_hashes) >= MERGE_THRESHOLD:
+                self._merge()
+
+    def record(self, entries):
+        """add() each (hash, ref) and append them to the journal; snapshot every COMPACT_ENTRIES"""
+        with self._lock:
+            for value, ref in entries:
+                self._tail_hashes.append(value)
+                self._tail_refs.append(ref)
+            if self.journal is not None and entries:
+                self.journal.append(entries)
+            if len(self._tail_hashes) >= MERGE_THRESHOLD:
+                self._merge()
+            compact = self.journal is not None and self.journal.unsaved >= COMPACT_ENTRIES
+        if compact:
+            self.save(self.journal.snapshot)
+
+    def sync(self, force=False):
+        """Read hashes other processes have journaled; at most every SYNC_SECONDS unless forced"""
+        now = time.monotonic()
+        if self.journal is None or not (force or now - self._synced_at >= SYNC_SECONDS):
+            return
+        with self._lock:
+            self._synced_at = now
+            self._catch_up()
+
+    def _catch_up(self):
+        # A new snapshot may hold journals its writer has since deleted, so reload it first
+        if _identity(self.journal.snapshot) != self.journal.loaded:
+            self._load_snapshot()
+        hashes, refs = self.journal.read_new()
+        self._tail_hashes.extend(hashes)
+        self._tail_refs.extend(refs)
+        if len(self._tail_hashes) >= MERGE_THRESHOLD:
+            self._merge()
+
+    def _load_snapshot(self):
+        snapshot = self.journal.snapshot
+        identity = _identity(snapshot)
+        hashes, refs, offsets = np.zeros(0, dtype=np.uint64), [], {}
+        if identity is not None:
+            with np.load(snapshot) as data:
+                hashes, refs = data['hashes'], data['refs'].tolist()
+                if 'journals' in data:
+                    offsets = dict(zip(data['journals'].tolist(), data['offsets'].tolist()))
+        self._hashes = np.asarray(hashes, dtype=np.uint64).reshape(-1)
+        self._refs = refs
+        self._tail_hashes, self._tail_refs = [], []
+        self._build_bands()
+        self.journal.offsets = offsets
+        self.journal.loaded = identity
+
+    def _merge(self):
+        self._hashes = np.concatenate([self._hashes, np.array(self._tail_hashes, dtype=np.uint64)])
+        self._refs.extend(self._tail_refs)
+        self._tail_hashes, self._tail_refs = [], []
+        self._build_bands()
+
+    def _candidates(self, hash_value, max_distance):
+        flips = max_distance // BANDS
+        if flips not in self._masks:
+            self._masks[flips] = _flip_masks(flips)
+        masks = self._masks[flips]
+
+        query = np.uint64(hash_value)
+        ranges = []
+        for band in range(BANDS):
+            chunk = (query >> np.uint64(band * BAND_BITS)) & np.uint64((1 << BAND_BITS) - 1)
+            probes = chunk ^ masks
+            values = self._band_values[band]
+            lo = np.searchsorted(values, probes, side='left')
+            hi = np.searchsorted(values, probes, side='right')
+            hit = hi > lo
+            if hit.any():
+                lo, hi = lo[hit], hi[hit]
+                # Expand the [lo, hi) runs into positions without a Python loop
+                lengths = hi - lo
+                starts = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+                positions = starts + np.arange(lengths.sum())
+                ranges.append(self._band_order[band][positions])
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        # May repeat a position found through several bands; query() dedupes
+        # after the distance filter, when few positions are left
+        return np.concatenate(ranges)
+
+    def query(self, hash_value, max_distance=MATCH_DISTANCE):
+        """[(ref, distance)] of stored hashes within ``max_distance``, closest first"""
+        query = np.uint64(hash_value)
+        with self._lock:
+            matches = []
+            if len(self._hashes):
+                candidates = self._candidates(hash_value, max_distance)
+                distances = popcount(self._hashes[candidates] ^ query)
+                keep = distances <= max_distance
+                found = dict(zip(candidates[keep].tolist(), distances[keep].tolist()))
+                matches.extend((self._refs[i], d) for i, d in found.items())
+            if self._tail_hashes:
+                distances = popcount(np.array(self._tail_hashes, dtype=np.uint64) ^ query)
+                matches.extend((self._tail_refs[i], int(d))
+                               for i, d in enumerate(distances.tolist()) if d <= max_distance)
+        return sorted(matches, key=lambda match: match[1])
+
+    def save(self, path):
+        """Snapshot to an .npz, with how far it has read each journal, then compact the journals
+
+        Reads every journal first, so the snapshot holds all hashes recorded
+        so far. Journals it holds in full that no live process appends to
+        (this process's own, and dead processes') are left out of its
+        offsets and deleted once it is in place.
+        """
+        path = Path(path)
+        compacting = self.journal is not None and path == self.journal.snapshot
+        with self._lock:
+            if compacting:
+                self._catch_up()
+            if self._tail_hashes:
+                self._merge()
+            deleted = self.journal.compactable() if compacting else []
+            offsets = {name: offset for name, offset in self.journal.offsets.items()
+                       if name not in deleted} if self.journal is not None else {}
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique per process: replicas may snapshot at once, and each
+            # snapshot is complete up to its own offsets
+            tmp = path.with_name(f"{path.stem}.{socket.gethostname()}-{os.getpid()}.tmp.npz")
+            np.savez(tmp, hashes=self._hashes, refs=np.array(self._refs, dtype=str),
+                     journals=np.array(list(offsets), dtype=str),
+                     offsets=np.array(list(offsets.values()), dtype=np.int64))
+            identity = _identity(tmp)
+            tmp.replace(path)
+            if compacting:
+                self.journal.delete(deleted)
+                self.journal.loaded = identity
+                self.journal.unsaved = 0
+
+
+def load_index(path=None):
+    """PhotoHashIndex from a snapshot and its journals, or an in-memory one without ``path``
+
+    Every process using the same path appends to its own journal beside
+    the snapshot and reads the others', so all of them check against every
+    photo recorded so far.
+    """
+    if not path:
+        return PhotoHashIndex()
+    index = PhotoHashIndex(journal=HashJournal(path))
+    index.sync(force=True)
+    return index
+
+
+def check_photos(index, photos, reference, max_distance=MATCH_DISTANCE):
+    """Look up each photo's pHash, then record the photos under ``reference``
+
+    ``photos`` are ingested records with 'name' and 'pixels'. Matches whose
+    reference equals ``reference`` are the same applicant re-running the
+    valuation and are not reported. New hashes are recorded in one batch
+    (journaled when the index has a path). Returns the 'photo_reuse'
+    result block.
+    """
+    index.sync()
+    matches = []
+    hashes = []
+    new = {}
+    for photo in photos:
+        if 'pixels' not in photo:
+            continue
+        value = phash(photo['pixels'])
+        hashes.append((photo['name'], value))
+        already_recorded = False
+        for ref, distance in index.query(value, max_distance):
+            if ref != reference:
+                matches.append({'photo': photo['name'], 'reference': ref, 'distance': distance})
+            elif distance == 0:
+                already_recorded = True
+        if not already_recorded:
+            new[value] = reference
+    index.record(list(new.items()))
+
+    return {
+        'status': 'REUSED' if matches else 'CLEAR',
+        'photos_checked': len(hashes),
+        'matches': matches,
+        'hashes': {name: f"{value:016x}" for name, value in hashes},
+        'index_size': len(index),
+    }
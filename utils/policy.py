@@ -0,0 +1,332 @@
+"""
+Decision Policy
+Loads the versioned loan decision policy (JSON, or YAML with PyYAML) and
+compiles its rules into plain Python functions for scalar and batch use
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.numeric import round_like_python
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY_PATH = Path(__file__).resolve().parent.parent / 'data' / 'policy' / 'loan_decision.json'
+
+# Measure -> evaluation cost tier: inputs, ratios, risk components, the
+# weighted score, then what is only known after pricing (conditions only)
+MEASURE_COSTS = {
+    'requested_amount': 0, 'annual_income': 0, 'asset_value': 0,
+    'condition_score': 0, 'fraud_score': 0,
+    'debt_to_income': 1, 'ltv_ratio': 1,
+    'credit_risk': 2, 'asset_risk': 2, 'fraud_risk': 2, 'compliance_risk': 2,
+    'overall_risk': 3,
+    'stress_passes_base': 4,
+}
+APPROVAL_MEASURES = {m for m, cost in MEASURE_COSTS.items() if cost < 4}
+# Policy-independent inputs to CompiledPolicy.score, computed once per application
+FEATURES = ('requested_amount', 'annual_income', 'asset_value', 'condition_score', 'fraud_score',
+            'debt_to_income', 'ltv_ratio', 'compliance_draw')
+RISK_COMPONENTS = ('credit_risk', 'asset_risk', 'fraud_risk', 'compliance_risk')
+OPERATORS = ('<', '<=', '>', '>=', '==', '!=')
+
+
+def _literal(value, where):
+    """Source text for a rule's value; only numbers and booleans are allowed"""
+    if isinstance(value, bool):
+        return repr(value)
+    if isinstance(value, (int, float)) and np.isfinite(value):
+        return repr(float(value))
+    raise ValueError(f"{where}: value must be a finite number or a boolean, got {value!r}")
+
+
+def _number(section, key, where):
+    value = section.get(key) if isinstance(section, dict) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+        raise ValueError(f"{where}.{key} must be a finite number")
+    return float(value)
+
+
+def _comparison(rule, where, measures):
+    measure, op = rule.get('measure'), rule.get('op')
+    if measure not in measures:
+        raise ValueError(f"{where}: unknown measure {measure!r}; expected one of {sorted(measures)}")
+    if op not in OPERATORS:
+        raise ValueError(f"{where}: unknown operator {op!r}; expected one of {OPERATORS}")
+    return f"(m[{measure!r}] {op} {_literal(rule.get('value'), where)})"
+
+
+def _approve_source(name, ordered):
+    return (f"def {name}(m):\n" +
+            ''.join(f"    if not {test}:\n        return False\n" for *_, test, _ in ordered) +
+            "    return True\n")
+
+
+def _define(source, name):
+    namespace = {}
+    exec(compile(source, f"<policy:{name}>", 'exec'), namespace)
+    return namespace[name]
+
+
+class CompiledPolicy:
+    """A policy turned into functions once, so a decision interprets nothing
+
+    ``approve(m)`` checks the approval rules in cost order, then by their
+    declared ``selectivity`` (the share of a reference book failing them;
+    see the policy's 'selectivity_source'), and ``approve_batch(m)`` is the
+    same test over arrays. Both take measures that are already computed.
+    ``approves(features)`` is the short-circuiting form: rules on inputs
+    and ratios run first, and the risk components and weighted score are
+    only computed for applications that pass them. ``rejection_reasons``
+    and ``conditions`` list messages in the order the policy declares
+    them. ``stress_affordable(m)`` is the affordability test of a stress
+    scenario, over 'debt_to_income' and 'payment_to_income' arrays. ``m``
+    maps measure names to values.
+    """
+
+    def __init__(self, document, source=None):
+        self.document = document
+        self.source = source
+        self.version = str(document.get('version') or '')
+        if not self.version:
+            raise ValueError("policy: 'version' is required")
+
+        risk = document.get('risk', {})
+        self.credit_dti_scale = _number(risk.get('credit'), 'dti_scale', 'risk.credit')
+        self.credit_cap = _number(risk.get('credit'), 'cap', 'risk.credit')
+        self.asset_ltv_floor = _number(risk.get('asset'), 'ltv_floor', 'risk.asset')
+        self.asset_ltv_span = _number(risk.get('asset'), 'ltv_span', 'risk.asset')
+        self.asset_low_ltv_risk = _number(risk.get('asset'), 'low_ltv_risk', 'risk.asset')
+        self.fraud_multiplier = _number(risk.get('fraud'), 'multiplier', 'risk.fraud')
+        self.fraud_cap = _number(risk.get('fraud'), 'cap', 'risk.fraud')
+        self.compliance_range = (_number(risk.get('compliance'), 'low', 'risk.compliance'),
+                                 _number(risk.get('compliance'), 'high', 'risk.compliance'))
+        if self.credit_dti_scale <= 0 or self.asset_ltv_span <= 0:
+            raise ValueError("policy: risk.credit.dti_scale and risk.asset.ltv_span must be positive")
+
+        pricing = document.get('pricing', {})
+        self.base_rate = _number(pricing, 'base_rate', 'pricing')
+        self.risk_loading = _number(pricing, 'risk_loading', 'pricing')
+        # Upfront fee counted in the APR; none unless the policy sets one
+        self.arrangement_fee = _number(pricing, 'arrangement_fee', 'pricing') if 'arrangement_fee' in pricing else 0.0
+        if self.arrangement_fee < 0:
+            raise ValueError("policy: pricing.arrangement_fee must not be negative")
+
+        # Weighted score, summed in the declared order (float addition is
+        # order-sensitive, and the scalar and batch paths must agree)
+        weights = document.get('weights', {})
+        if set(weights) != set(RISK_COMPONENTS):
+            raise ValueError(f"policy: weights must cover exactly {RISK_COMPONENTS}")
+        terms = [f"m[{name!r}] * {_literal(weight, f'weights.{name}')}" for name, weight in weights.items()]
+        self.overall_risk = _define(f"def overall_risk(m):\n    return {' + '.join(terms)}\n",
+                                    'overall_risk')
+
+        rules = document.get('approval_rules', [])
+        if not rules:
+            raise ValueError("policy: at least one approval rule is required")
+        compiled = []
+        for i, rule in enumerate(rules):
+            where = f"approval_rules[{i}]"
+            test = _comparison(rule, where, APPROVAL_MEASURES)
+            if not rule.get('reason'):
+                raise ValueError(f"{where}: 'reason' is required")
+            selectivity = float(rule.get('selectivity', 0.0))
+            compiled.append((MEASURE_COSTS[rule['measure']], -selectivity, i, test, rule['reason']))
+        self.rule_order = [rules[i].get('id', f"rule_{i}") for _, _, i, _, _ in sorted(compiled)]
+
+        # Stress scenarios re-apply the debt-to-income rules to shocked
+        # incomes, plus the policy's payment-to-income cap
+        stress = document.get('stress', {})
+        self.max_payment_to_income = _number(stress, 'max_payment_to_income', 'stress')
+        if self.max_payment_to_income <= 0:
+            raise ValueError("policy: stress.max_payment_to_income must be positive")
+        affordability = [test for cost, _, i, test, _ in compiled if rules[i]['measure'] == 'debt_to_income']
+        affordability.append(f"(m['payment_to_income'] <= {_literal(self.max_payment_to_income, 'stress')})")
+        self.stress_affordable = _define(
+            "def stress_affordable(m):\n    return " + ' & '.join(affordability) + "\n", 'stress_affordable')
+        self.reasons = [reason for *_, reason in compiled]
+
+        ordered = sorted(compiled)
+        self.approve = _define(_approve_source('approve', ordered), 'approve')
+        self.approve_batch = _define(
+            "def approve_batch(m):\n    return " + ' & '.join(test for *_, test, _ in ordered) + "\n",
+            'approve_batch')
+        # Split at the risk components for approves(): inputs and ratios, then the rest
+        self._approve_inputs = _define(
+            _approve_source('approve_inputs', [rule for rule in ordered if rule[0] < 2]), 'approve_inputs')
+        self._approve_risk = _define(
+            _approve_source('approve_risk', [rule for rule in ordered if rule[0] >= 2]), 'approve_risk')
+        self.rejection_reasons = _define(
+            "def rejection_reasons(m):\n    out = []\n" +
+            ''.join(f"    if not {test}:\n        out.append(REASONS[{i}])\n"
+                    for _, _, i, test, _ in compiled) +
+            "    return out\n", 'rejection_reasons')
+        self.rejection_reasons.__globals__['REASONS'] = self.reasons
+
+        conditions = document.get('conditions', [])
+        tests = []
+        for i, condition in enumerate(conditions):
+            where = f"conditions[{i}]"
+            tests.append(_comparison(condition, where, MEASURE_COSTS))
+            if not condition.get('message'):
+                raise ValueError(f"{where}: 'message' is required")
+        self.messages = [condition['message'] for condition in conditions]
+        self.conditions = _define(
+            "def conditions(m):\n    out = []\n" +
+            ''.join(f"    if {test}:\n        out.append(MESSAGES[{i}])\n" for i, test in enumerate(tests)) +
+            "    return out\n", 'conditions')
+        self.conditions.__globals__['MESSAGES'] = self.messages
+
+    def risk_factors(self, debt_to_income, ltv_ratio, fraud_score):
+        """(credit, asset, fraud) risk for one application, unrounded"""
+        credit = min(self.credit_cap, debt_to_income / self.credit_dti_scale)
+        if ltv_ratio > self.asset_ltv_floor:
+            asset = max(0.0, (ltv_ratio - self.asset_ltv_floor) / self.asset_ltv_span)
+        else:
+            asset = self.asset_low_ltv_risk
+        fraud = min(self.fraud_cap, fraud_score * self.fraud_multiplier)
+        return credit, asset, fraud
+
+    def risk_factors_batch(self, debt_to_income, ltv_ratio, fraud_score):
+        """risk_factors over arrays"""
+        credit = np.minimum(self.credit_cap, debt_to_income / self.credit_dti_scale)
+        asset = np.where(ltv_ratio > self.asset_ltv_floor,
+                         np.maximum(0.0, (ltv_ratio - self.asset_ltv_floor) / self.asset_ltv_span),
+                         self.asset_low_ltv_risk)
+        fraud = np.minimum(self.fraud_cap, fraud_score * self.fraud_multiplier)
+        return credit, asset, fraud
+
+    def interest_rate(self, overall_risk):
+        """Decision rate (%) for a risk score; scalars or arrays"""
+        return self.base_rate + overall_risk * self.risk_loading
+
+    def compliance_risk(self, draw):
+        """Compliance risk from a uniform [0, 1) draw; random.uniform's own formula"""
+        low, high = self.compliance_range
+        return low + (high - low) * draw
+
+    def _measures(self, features):
+        credit, asset, fraud = self.risk_factors(features['debt_to_income'], features['ltv_ratio'],
+                                                 features['fraud_score'])
+        compliance = features.get('compliance_risk')
+        breakdown = {
+            'credit_risk': round(credit, 2),
+            'asset_risk': round(asset, 2),
+            'fraud_risk': round(fraud, 2),
+            'compliance_risk': (round(self.compliance_risk(features['compliance_draw']), 2)
+                                if compliance is None else compliance),
+        }
+        measures = {**features, **breakdown}
+        measures['overall_risk'] = self.overall_risk(measures)
+        return breakdown, measures
+
+    def score(self, features):
+        """Risk breakdown, measures and approval for one application
+
+        ``features`` holds the policy-independent inputs (see FEATURES), so
+        several policies can score one application from a single feature
+        computation and compliance draw. A 'compliance_risk' entry is used
+        as is instead of the draw. The decision records the breakdown either
+        way, so every component is computed; use ``approves`` when only the
+        outcome is needed.
+        """
+        breakdown, measures = self._measures(features)
+        return breakdown, measures, self.approve(measures)
+
+    def approves(self, features):
+        """Approval alone; a failing input or ratio rule returns before any risk is computed"""
+        if not self._approve_inputs(features):
+            return False
+        return self._approve_risk(self._measures(features)[1])
+
+    def score_batch(self, features):
+        """score over arrays; returns measures with an 'approved' mask
+
+        Uses ``features['compliance_risk']`` when given, else maps the
+        'compliance_draw' array through this policy's range.
+        """
+        credit, asset, fraud = self.risk_factors_batch(features['debt_to_income'], features['ltv_ratio'],
+                                                       features['fraud_score'])
+        compliance = features.get('compliance_risk')
+        if compliance is None:
+            compliance = round_like_python(self.compliance_risk(features['compliance_draw']), 2)
+        measures = {**features,
+                    'credit_risk': round_like_python(credit, 2),
+                    'asset_risk': round_like_python(asset, 2),
+                    'fraud_risk': round_like_python(fraud, 2),
+                    'compliance_risk': compliance}
+        measures['overall_risk'] = self.overall_risk(measures)
+        measures['approved'] = self.approve_batch(measures)
+        return measures
+
+
+def policy_path(path=None):
+    return Path(path or os.environ.get('LOAN_POLICY_PATH', DEFAULT_POLICY_PATH))
+
+
+def read_policy(path=None):
+    """The policy document at ``path`` (LOAN_POLICY_PATH by default)"""
+    path = policy_path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ImportError("Reading a YAML policy requires PyYAML: pip install pyyaml") from exc
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def compile_policy(document, source=None):
+    return CompiledPolicy(document, source)
+
+
+# How often current_policy() looks for a changed file
+POLICY_CHECK_SECONDS = float(os.environ.get('LOAN_POLICY_CHECK_SECONDS', 1))
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def current_policy(path=None):
+    """The compiled policy, recompiled whenever the file is replaced
+
+    The file is stat()ed at most every POLICY_CHECK_SECONDS, so a new
+    policy takes effect within that time without a deploy and a decision
+    pays only a dict lookup. A replacement that cannot be read or compiled
+    is logged once and the last good policy keeps serving until the file
+    changes again; only a first load with no good policy raises. Replace
+    the file atomically (write a temporary file, then rename it over the
+    policy) so a half-written file is never read.
+    """
+    cached = _cache.get(path)
+    now = time.monotonic()
+    if cached is not None and now < cached['check_after']:
+        return cached['policy']
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and now < cached['check_after']:
+            return cached['policy']
+        resolved = policy_path(path)
+        stamp = (str(resolved), None, None)
+        try:
+            stat = resolved.stat()
+            stamp = (str(resolved), stat.st_mtime_ns, stat.st_size)
+            if cached is None or stamp not in (cached['stamp'], cached.get('failed')):
+                cached = {'stamp': stamp, 'policy': compile_policy(read_policy(resolved), str(resolved))}
+        except Exception as exc:
+            if cached is None:
+                raise
+            if cached.get('failed') != stamp:
+                logger.error("Policy %s not loaded, still serving version %s: %s",
+                             resolved, cached['policy'].version, exc)
+                cached['failed'] = stamp
+        cached['check_after'] = now + POLICY_CHECK_SECONDS
+        _cache[path] = cached
+    return cached['policy']
@@ -0,0 +1,75 @@
+"""
+Loan Pricing
+Indicative rates and a precomputed term x amount pricing grid for the
+Loan Application page
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.amortization import loan_apr, monthly_payment
+
+BASE_RATE = 5.5
+HIGH_DTI = 40
+HIGH_DTI_LOADING = 1.5
+HIGH_LTV = 80
+HIGH_LTV_LOADING = 1.0
+
+TERMS = range(1, 8)
+AMOUNT_STEPS = (0.5, 0.75, 1.0, 1.25, 1.5)
+
+GRID_COLUMNS = [
+    'amount', 'term_years', 'interest_rate', 'apr', 'monthly_payment', 'total_interest',
+    'total_payable', 'ltv', 'debt_to_income', 'within_max_loan',
+]
+
+
+def indicative_rate(debt_to_income, ltv):
+    """Quoted rate (%) before decisioning; scalars or arrays"""
+    rate = (BASE_RATE + np.where(np.asarray(debt_to_income) > HIGH_DTI, HIGH_DTI_LOADING, 0.0) +
+            np.where(np.asarray(ltv) > HIGH_LTV, HIGH_LTV_LOADING, 0.0))
+    return float(rate) if np.ndim(rate) == 0 else rate
+
+
+def grid_amounts(requested_amount, max_loan):
+    """Requested amount scaled by AMOUNT_STEPS, plus the maximum loan"""
+    amounts = {round(requested_amount * step / 100) * 100 for step in AMOUNT_STEPS}
+    if max_loan > 0:
+        amounts.add(round(max_loan, 2))
+    return sorted({a for a in amounts if a > 0} | {requested_amount})
+
+
+def pricing_grid(annual_income, asset_value, max_loan, amounts, terms=TERMS, balloon=0.0, fees=0.0):
+    """Rate, payment, interest and LTV for every amount x term in one pass
+
+    ``fees`` are paid upfront, so they count towards the APR.
+    """
+    amount, term = np.meshgrid(np.asarray(amounts, dtype=float), np.asarray(terms), indexing='ij')
+    amount, term = amount.ravel(), term.ravel()
+    months = term * 12
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dti = np.where(annual_income > 0, amount / annual_income * 100, 0.0)
+        ltv = np.where(asset_value > 0, amount / asset_value * 100, 0.0)
+    rate = indicative_rate(dti, ltv)
+    final = np.minimum(balloon, amount)
+    payment = monthly_payment(amount, rate, months, final)
+    total_payable = payment * months + final
+
+    return pd.DataFrame({
+        'amount': amount,
+        'term_years': term,
+        'interest_rate': rate,
+        'apr': loan_apr(amount, rate, months, fees, final),
+        'monthly_payment': payment,
+        'total_interest': total_payable - amount,
+        'total_payable': total_payable,
+        'ltv': ltv,
+        'debt_to_income': dti,
+        'within_max_loan': amount <= max_loan,
+    })
+
+
+def quote_for(grid, amount, term_years):
+    """The grid row for one amount and term"""
+    return grid[(grid['amount'] == amount) & (grid['term_years'] == term_years)].iloc[0]
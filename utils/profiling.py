@@ -0,0 +1,197 @@
+"""
+Rerun Profiling
+Opt-in cProfile (plus sampled stacks and optional tracemalloc) capture of
+single reruns, written as pstats and collapsed-stack files
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from utils.runtime import env_flag
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', 'profiles'))
+SAMPLE_SECONDS = float(os.environ.get('PROFILE_SAMPLE_MS', 2)) / 1000
+TRACEMALLOC_FRAMES = 16
+
+# Session-state key holding {'reruns': left to profile, 'memory': bool}
+STATE_KEY = '_profile_request'
+
+# Reruns to profile process-wide from PROFILE_RERUNS, whichever sessions run them
+_budget = {'reruns': int(os.environ.get('PROFILE_RERUNS', 0) or 0),
+           'memory': env_flag('PROFILE_MEMORY')}
+_budget_lock = threading.Lock()
+
+# cProfile and tracemalloc are not made for overlapping captures, so one
+# rerun is profiled at a time; a busy profiler leaves the request armed
+_capture_lock = threading.Lock()
+
+# Most recent captures, newest last
+RECENT = deque(maxlen=20)
+
+
+def arm(state, reruns=1, memory=False):
+    """Profile the next ``reruns`` reruns of the session owning ``state``
+
+    ``reruns`` may come straight from a query parameter; anything that is
+    not a whole number arms a single rerun.
+    """
+    reruns = int(reruns) if str(reruns).strip().isdigit() else 1
+    if reruns:
+        state[STATE_KEY] = {'reruns': reruns, 'memory': bool(memory)}
+    else:
+        state.pop(STATE_KEY, None)
+
+
+def _take(state):
+    """Options for this rerun if it should be profiled, consuming one request"""
+    request = state.get(STATE_KEY)
+    if request:
+        if request['reruns'] <= 1:
+            del state[STATE_KEY]
+        else:
+            state[STATE_KEY] = {**request, 'reruns': request['reruns'] - 1}
+        return {'memory': request['memory']}
+    if _budget['reruns'] > 0:
+        with _budget_lock:
+            if _budget['reruns'] > 0:
+                _budget['reruns'] -= 1
+                return {'memory': _budget['memory']}
+    return None
+
+
+def _give_back(state, options):
+    request = state.get(STATE_KEY)
+    state[STATE_KEY] = {'reruns': (request['reruns'] if request else 0) + 1,
+                        'memory': options['memory']}
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__') or Path(code.co_filename).stem
+    return f"{module}:{code.co_name}"
+
+
+def _sample_stacks(thread_id, stop, counts):
+    """Count the target thread's stacks, root first, every SAMPLE_SECONDS"""
+    while not stop.wait(SAMPLE_SECONDS):
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        if stack:
+            counts[';'.join(reversed(stack))] += 1
+
+
+def _slug(label):
+    return re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-').lower() or 'rerun'
+
+
+@contextmanager
+def capture(label, state, directory=None):
+    """Profile the enclosed block if this session (or PROFILE_RERUNS) asked for it
+
+    Writes <time>-<label>.pstats (cProfile), .collapsed (sampled stacks in
+    flamegraph.pl / speedscope format) and, with memory profiling,
+    .tracemalloc.txt (top allocation sites and the block's net growth).
+    """
+    options = _take(state)
+    if options is None:
+        yield None
+        return
+    if not _capture_lock.acquire(blocking=False):
+        _give_back(state, options)
+        yield None
+        return
+
+    directory = Path(directory or PROFILE_DIR)
+    record = {'label': label, 'started_at': datetime.now().isoformat(timespec='seconds'),
+              'memory': options['memory']}
+    profiler = cProfile.Profile()
+    stop, counts = threading.Event(), Counter()
+    sampler = threading.Thread(target=_sample_stacks, name='profile-sampler', daemon=True,
+                               args=(threading.get_ident(), stop, counts))
+    tracing = options['memory'] and not tracemalloc.is_tracing()
+    try:
+        if tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            before = tracemalloc.take_snapshot()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError as exc:  # another profiler is active in this thread
+            logger.warning("Profiling %s skipped: %s", label, exc)
+            profiler = None
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record['seconds'] = time.perf_counter() - start
+            stop.set()
+            sampler.join()
+            after = tracemalloc.take_snapshot() if tracing else None
+            if tracing:
+                record['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            _write(record, directory, profiler, counts, before if tracing else None, after)
+    finally:
+        _capture_lock.release()
+
+
+def _write(record, directory, profiler, counts, before, after):
+    directory.mkdir(parents=True, exist_ok=True)
+    base = directory / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{_slug(record['label'])}"
+    if profiler is not None:
+        record['pstats'] = f"{base}.pstats"
+        profiler.dump_stats(record['pstats'])
+    record['collapsed'] = f"{base}.collapsed"
+    with open(record['collapsed'], 'w', encoding='utf-8') as handle:
+        for stack, count in counts.most_common():
+            handle.write(f"{stack} {count}\n")
+    if after is not None:
+        # Leave out the sampler's own allocations
+        own = [tracemalloc.Filter(False, __file__)]
+        before, after = before.filter_traces(own), after.filter_traces(own)
+        record['tracemalloc'] = f"{base}.tracemalloc.txt"
+        with open(record['tracemalloc'], 'w', encoding='utf-8') as handle:
+            handle.write(f"peak traced: {record['peak_traced_bytes']:,} bytes\n\n")
+            handle.write("net growth during the rerun, by line:\n")
+            for stat in after.compare_to(before, 'lineno')[:25]:
+                handle.write(f"  {stat}\n")
+            handle.write("\nlargest live allocations at the end, by line:\n")
+            for stat in after.statistics('lineno')[:25]:
+                handle.write(f"  {stat}\n")
+    RECENT.append(record)
+    logger.info("Profiled %s in %.1f ms -> %s", record['label'], record['seconds'] * 1000, base)
+
+
+def top_functions(path, limit=25, sort='cumulative'):
+    """Rows of function, calls, tottime and cumtime (seconds) from a pstats file"""
+    stats = pstats.Stats(str(path))
+    column = {'cumulative': 3, 'tottime': 2, 'calls': 1}[sort]
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][column], reverse=True)[:limit]
+    return [{'function': pstats.func_std_string(func), 'calls': nc, 'tottime': tt, 'cumtime': ct}
+            for func, (cc, nc, tt, ct, callers) in rows]
+
+
+def list_profiles(directory=None):
+    """pstats files in the profile directory, newest first"""
+    directory = Path(directory or PROFILE_DIR)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob('*.pstats'), reverse=True)
@@ -0,0 +1,181 @@
+"""
+Result Cache
+Content-addressed, bounded LRU cache with TTL and an optional bounded
+on-disk tier, for expensive per-document results that must survive
+Streamlit reruns
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# How often the disk tier is swept for expired files when it is not full
+DISK_SWEEP_SECONDS = 300
+
+
+def content_key(data, *parts):
+    """SHA-256 over raw bytes plus any distinguishing parts (doc type, etc.)"""
+    digest = hashlib.sha256(data)
+    for part in parts:
+        digest.update(b'\0')
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU + TTL cache of JSON-serialisable results
+
+    The memory tier holds at most ``max_entries`` results. When ``disk_dir``
+    is set, results are also written there as plain JSON, so other
+    processes and restarts can reuse them; disk hits are promoted back
+    into memory and touched. The disk tier holds at most
+    ``max_disk_entries`` files and ``max_disk_bytes``: past either, a sweep
+    deletes expired files, then the least recently used, down to 90% of
+    the limits. Expired files are also swept every DISK_SWEEP_SECONDS.
+    Callers get copies, so one session mutating its result cannot leak
+    into another's.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, disk_dir=None,
+                 max_disk_entries=4096, max_disk_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0,
+                       'disk_evictions': 0, 'disk_expired': 0}
+        self._disk_files = self._disk_bytes = 0
+        self._swept_at = 0.0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self.sweep_disk()
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def _read_disk(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as handle:
+                record = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if now - record['stored_at'] > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._stats['disk_expired'] += 1
+            return None
+        try:
+            os.utime(path)  # recency for the LRU sweep
+        except OSError:
+            pass
+        return record
+
+    def _write_disk(self, key, record):
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as handle:
+            json.dump(record, handle, default=str)
+        size = tmp.stat().st_size
+        os.replace(tmp, path)
+        with self._disk_lock:
+            self._disk_files += 1
+            self._disk_bytes += size
+            full = self._disk_files > self.max_disk_entries or self._disk_bytes > self.max_disk_bytes
+        if full or time.time() - self._swept_at >= DISK_SWEEP_SECONDS:
+            self.sweep_disk()
+
+    def sweep_disk(self):
+        """Delete expired files, then the least recently used until under 90% of the bounds"""
+        if not self.disk_dir:
+            return
+        with self._disk_lock:
+            now = time.time()
+            self._swept_at = now
+            files, expired, evicted = [], 0, 0
+            for path in self.disk_dir.glob('*.json'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue  # removed by another process
+                # mtime is the write or the last disk hit, never before stored_at
+                if now - stat.st_mtime > self.ttl_seconds:
+                    path.unlink(missing_ok=True)
+                    expired += 1
+                else:
+                    files.append((stat.st_mtime, stat.st_size, path))
+            files.sort()
+            count, size = len(files), sum(file_size for _, file_size, _ in files)
+            if count > self.max_disk_entries or size > self.max_disk_bytes:
+                for _, file_size, path in files:
+                    if count <= 0.9 * self.max_disk_entries and size <= 0.9 * self.max_disk_bytes:
+                        break
+                    path.unlink(missing_ok=True)
+                    count, size, evicted = count - 1, size - file_size, evicted + 1
+            self._disk_files, self._disk_bytes = count, size
+        with self._lock:
+            self._stats['disk_expired'] += expired
+            self._stats['disk_evictions'] += evicted
+
+    def get(self, key):
+        """Cached value or None"""
+        now = time.time()
+        with self._lock:
+            record = self._entries.get(key)
+            if record is not None:
+                if now - record['stored_at'] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return copy.deepcopy(record['value'])
+                del self._entries[key]
+                self._stats['expired'] += 1
+
+        record = self._read_disk(key, now) if self.disk_dir else None
+        with self._lock:
+            if record is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._store(key, record)
+        return copy.deepcopy(record['value'])
+
+    def _store(self, key, record):
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def put(self, key, value):
+        record = {'stored_at': time.time(), 'value': copy.deepcopy(value)}
+        with self._lock:
+            self._store(key, record)
+        if self.disk_dir:
+            self._write_disk(key, record)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value, or compute, store and return it"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def stats(self):
+        """Counters plus current size and hit rate"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        stats.update(disk_files=self._disk_files, disk_bytes=self._disk_bytes)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,49 @@
+"""
+Runtime Helpers
+Environment flags and throttled atomic file writes shared by the
+instrumentation, drift, profiling and session-store modules
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def env_flag(name):
+    """True when the environment variable is set to 1, true or yes (any case)"""
+    return os.environ.get(name, '').lower() in TRUE_VALUES
+
+
+class ThrottledWriter:
+    """Replaces a file atomically, at most once every ``seconds``
+
+    A call made while another is writing is skipped rather than queued, so
+    callers on a hot path never wait; ``force`` waits and always writes.
+    The content is only rendered when a write happens.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def write(self, path, render, force=False):
+        """Write ``render()`` to ``path`` through a per-process temporary file; True if written"""
+        now = time.monotonic()
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            if not force and now - self._last_write < self.seconds:
+                return False
+            self._last_write = now
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(render(), encoding='utf-8')
+            os.replace(tmp, path)
+            return True
+        finally:
+            self._lock.release()
@@ -0,0 +1,525 @@
+"""
+Sanctions & PEP Screening
+Loads watch lists from local CSV files into an inverted index and scores
+applicant names against every alias with fuzzy token matching
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / 'data' / 'screening'
+# Last ingested list snapshot and the customer hits it produced
+DEFAULT_STATE_DIR = Path(__file__).resolve().parent.parent / 'data' / 'screening_state'
+
+# Columns of a list file. `aliases` is ';'-separated, `type` is
+# 'sanction' or 'pep'. `list` falls back to the file name.
+LIST_COLUMNS = ['id', 'list', 'type', 'name', 'aliases', 'country', 'program']
+
+MATCH_THRESHOLD = 0.85
+TOKEN_CACHE_SIZE = 50000
+SCALAR_DISTANCE_LIMIT = 32   # below this many candidates, plain ints beat NumPy lanes
+
+
+MAX_EDITS = 2
+
+
+def max_edits(token):
+    """Edits tolerated between a query token and a list token of similar length"""
+    return 1 if len(token) <= 7 else MAX_EDITS
+
+
+def normalize_name(name):
+    """Upper-case, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(name or ''))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"['’]", '', text.upper())
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', text).split())
+
+
+def tokenize(name):
+    return normalize_name(name).split()
+
+
+def trigrams(token):
+    """Boundary-padded character trigrams, so short tokens still index"""
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(pattern, text):
+    """Myers' bit-parallel Levenshtein distance for one ASCII byte string"""
+    m = len(pattern)
+    peq = {}
+    for i, char in enumerate(pattern.encode('ascii')):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    last = 1 << (m - 1)
+    vp, vn, score = (1 << m) - 1, 0, m
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | ~(xh | vp)
+        hn = vp & xh
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        hp = (hp << 1) | 1
+        hn <<= 1
+        vp = hn | ~(xv | hp)
+        vn = hp & xv
+    return score
+
+
+def edit_distances(pattern, candidates, lengths):
+    """Levenshtein distance from `pattern` to many candidates at once
+
+    ``candidates`` is an (n, width) uint8 matrix of zero-padded ASCII
+    tokens and ``lengths`` their lengths. Uses Myers' bit-parallel
+    algorithm with one uint64 lane per candidate, so the Python loop runs
+    over candidate columns only, not over candidates. Small batches use
+    the same recurrence on Python ints, which avoids NumPy call overhead.
+    """
+    m = len(pattern)
+    n = candidates.shape[0]
+    if m == 0:
+        return lengths.astype(np.int64)
+    if m > 63:
+        raise ValueError("pattern longer than 63 characters")
+
+    if n <= SCALAR_DISTANCE_LIMIT:
+        return np.array([_edit_distance(pattern, candidates[row, :lengths[row]].tobytes())
+                         for row in range(n)], dtype=np.int64)
+
+    peq = np.zeros(256, dtype=np.uint64)
+    for i, char in enumerate(pattern.encode('ascii')):
+        peq[char] |= np.uint64(1 << i)
+
+    # Bits above m - 1 accumulate garbage, but additions carry and shifts
+    # move upwards only, so they never disturb the bits that are read
+    shift = np.uint64(m - 1)
+    one = np.uint64(1)
+    vp = np.full(n, (1 << m) - 1, dtype=np.uint64)
+    vn = np.zeros(n, dtype=np.uint64)
+    score = np.full(n, m, dtype=np.int64)
+    distance = np.full(n, m, dtype=np.int64)
+
+    for col in range(int(lengths.max(initial=0))):
+        eq = peq[candidates[:, col]]
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | ~(xh | vp)
+        hn = vp & xh
+        score += ((hp >> shift) & one).astype(np.int64)
+        score -= ((hn >> shift) & one).astype(np.int64)
+        hp = (hp << one) | one
+        hn = hn << one
+        vp = hn | ~(xv | hp)
+        vn = hp & xv
+        ended = lengths == col + 1
+        distance[ended] = score[ended]
+    return distance
+
+
+def load_list(path):
+    """Read one list file into entry dicts"""
+    path = Path(path)
+    entries = []
+    with open(path, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            aliases = [a.strip() for a in (row.get('aliases') or '').split(';') if a.strip()]
+            entries.append({
+                'id': row['id'],
+                'list': row.get('list') or path.stem.upper(),
+                'type': (row.get('type') or 'sanction').lower(),
+                'name': row['name'],
+                'aliases': aliases,
+                'country': row.get('country', ''),
+                'program': row.get('program', ''),
+            })
+    return entries
+
+
+def _data_dir(data_dir=None):
+    return Path(data_dir or os.environ.get('SCREENING_DATA_DIR', DEFAULT_DATA_DIR))
+
+
+def load_lists(data_dir=None):
+    """Read every *.csv list in a directory (SCREENING_DATA_DIR by default)"""
+    entries = []
+    for path in sorted(_data_dir(data_dir).glob('*.csv')):
+        entries.extend(load_list(path))
+    return entries
+
+
+def lists_fingerprint(data_dir=None):
+    """Cheap version stamp of the list files, changes whenever a list is replaced"""
+    return tuple((path.name, path.stat().st_mtime_ns, path.stat().st_size)
+                 for path in sorted(_data_dir(data_dir).glob('*.csv')))
+
+
+class ScreeningIndex:
+    """Inverted index over watch-list aliases
+
+    Two levels: character trigrams -> distinct name tokens (for fuzzy token
+    lookup) and name tokens -> aliases. A query resolves each of its tokens
+    to similar list tokens once, then scores all aliases sharing any of them
+    in a few vectorized passes.
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.lists = sorted({e['list'] for e in self.entries})
+
+        token_ids = {}
+        alias_entry, alias_text, alias_len = [], [], []
+        token_aliases = []
+        for entry_idx, entry in enumerate(self.entries):
+            for alias in [entry['name'], *entry['aliases']]:
+                tokens = set(tokenize(alias))
+                if not tokens:
+                    continue
+                alias_idx = len(alias_entry)
+                alias_entry.append(entry_idx)
+                alias_text.append(alias)
+                alias_len.append(len(tokens))
+                for token in tokens:
+                    tid = token_ids.setdefault(token, len(token_ids))
+                    if tid == len(token_aliases):
+                        token_aliases.append([])
+                    token_aliases[tid].append(alias_idx)
+
+        # Postings keyed by (trigram, token length): a query only reads the
+        # lengths its edit budget can reach
+        gram_tokens = {}
+        for token, tid in token_ids.items():
+            for gram in trigrams(token):
+                gram_tokens.setdefault((gram, len(token)), []).append(tid)
+
+        self.token_ids = token_ids
+        self.tokens = list(token_ids)
+        self.token_aliases = [np.array(a, dtype=np.int32) for a in token_aliases]
+        self.gram_tokens = {g: np.array(t, dtype=np.int32) for g, t in gram_tokens.items()}
+        self.token_len = np.array([len(t) for t in token_ids], dtype=np.int32)
+        width = int(self.token_len.max(initial=0))
+        self.token_chars = np.zeros((len(token_ids), width), dtype=np.uint8)
+        for tid, token in enumerate(token_ids):
+            self.token_chars[tid, :len(token)] = np.frombuffer(token.encode('ascii'), dtype=np.uint8)
+        self.alias_entry = np.array(alias_entry, dtype=np.int32)
+        self.alias_text = alias_text
+        self.alias_len = np.array(alias_len, dtype=np.int32)
+        self._token_cache = {}
+
+    def __len__(self):
+        return len(self.alias_entry)
+
+    def similar_tokens(self, token, edits=None):
+        """(token ids, similarities) of list tokens within max_edits of `token`
+
+        Similarity is 1 - edit distance / longer token length. ``edits``
+        overrides the per-length edit budget.
+        """
+        if edits is None:
+            edits = max_edits(token)
+        key = (token, edits)
+        cached = self._token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        grams = trigrams(token)
+        lengths = range(max(1, len(token) - edits), len(token) + edits + 1)
+        postings = [self.gram_tokens[key] for key in
+                    ((g, length) for g in grams for length in lengths)
+                    if key in self.gram_tokens]
+        # q-gram count filter: each edit destroys at most three padded
+        # trigrams, so a token within `edits` edits shares at least
+        # len(grams) - 3 * edits of them. Survivors get an exact distance.
+        min_shared = max(1, len(grams) - 3 * edits)
+        if len(postings) >= min_shared and len(token) <= 63:
+            ids, shared = np.unique(np.concatenate(postings), return_counts=True)
+            ids = ids[shared >= min_shared]
+            lengths = self.token_len[ids]
+            distance = edit_distances(token, self.token_chars[ids], lengths)
+            keep = distance <= edits
+            sims = 1.0 - distance[keep] / np.maximum(lengths[keep], len(token))
+            result = (ids[keep], sims)
+        elif token in self.token_ids:
+            result = (np.array([self.token_ids[token]], dtype=np.int32), np.ones(1))
+        else:
+            result = (np.zeros(0, dtype=np.int32), np.zeros(0))
+
+        if len(self._token_cache) >= TOKEN_CACHE_SIZE:
+            self._token_cache.clear()
+        self._token_cache[key] = result
+        return result
+
+    def search(self, name, threshold=MATCH_THRESHOLD, limit=10):
+        """Best-scoring list entries for a name, highest score first"""
+        tokens = list(dict.fromkeys(tokenize(name)))
+        if not tokens:
+            return []
+
+        alias_parts, sim_parts = [], []
+        for token in tokens:
+            tids, sims = self.similar_tokens(token)
+            if not tids.size:
+                continue
+            sizes = [self.token_aliases[t].size for t in tids]
+            aliases = np.concatenate([self.token_aliases[t] for t in tids])
+            alias_sims = np.repeat(sims, sizes)
+            # Best match per alias for this query token: sort by similarity
+            # and keep each alias's last (largest) occurrence
+            order = np.argsort(alias_sims, kind='stable')[::-1]
+            uniq, first = np.unique(aliases[order], return_index=True)
+            alias_parts.append(uniq)
+            sim_parts.append(alias_sims[order][first])
+        if not alias_parts:
+            return []
+
+        aliases, inverse = np.unique(np.concatenate(alias_parts), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(sim_parts))
+        scores = totals / np.maximum(len(tokens), self.alias_len[aliases])
+        hit = scores >= threshold
+        aliases, scores = aliases[hit], scores[hit]
+
+        # Best alias per entry; ties broken by entry id so the top `limit`
+        # only changes when the lists themselves change
+        best = {}
+        for alias, score in zip(aliases.tolist(), scores.tolist()):
+            entry_idx = int(self.alias_entry[alias])
+            if entry_idx not in best or score > best[entry_idx][1]:
+                best[entry_idx] = (alias, score)
+        ranked = sorted(best.items(), key=lambda item: (-item[1][1], self.entries[item[0]]['id']))
+
+        hits = []
+        for entry_idx, (alias, score) in ranked[:limit]:
+            entry = self.entries[entry_idx]
+            hits.append({
+                'entry_id': entry['id'],
+                'list': entry['list'],
+                'type': entry['type'],
+                'name': entry['name'],
+                'matched_alias': self.alias_text[alias],
+                'score': round(score, 3),
+                'country': entry['country'],
+                'program': entry['program'],
+            })
+        return hits
+
+    def search_batch(self, names, threshold=MATCH_THRESHOLD, limit=10):
+        """Screen many names; identical normalized names are scored once"""
+        memo = {}
+        results = []
+        for name in names:
+            key = normalize_name(name)
+            if key not in memo:
+                memo[key] = self.search(key, threshold, limit)
+            results.append(memo[key])
+        return results
+
+
+def build_index(data_dir=None):
+    """Load the lists in a directory and index them"""
+    return ScreeningIndex(load_lists(data_dir))
+
+
+def screening_checks(index, full_name, hits=None):
+    """sanctions_check / pep_check dicts for a screened name
+
+    ``hits`` lets batch callers pass a precomputed search result.
+    """
+    if hits is None:
+        hits = index.search(full_name)
+    sanction_hits = [h for h in hits if h['type'] != 'pep']
+    pep_hits = [h for h in hits if h['type'] == 'pep']
+
+    return {
+        'sanctions_check': {
+            'status': 'POTENTIAL_MATCH' if sanction_hits else 'CLEAR',
+            'matches': len(sanction_hits),
+            'checked_databases': list(index.lists),
+            'hits': sanction_hits,
+            'screened_name': full_name,
+            'screened_at': datetime.now().isoformat(),
+        },
+        'pep_check': {
+            'status': 'POTENTIAL_MATCH' if pep_hits else 'CLEAR',
+            'is_pep': bool(pep_hits),
+            'risk_level': 'HIGH' if pep_hits else 'LOW',
+            'hits': pep_hits,
+        },
+    }
+
+
+def _entry_changed(old, new):
+    """True if an edit to an entry can alter screening results"""
+    if (old['list'], old['type'], old['name'], old['aliases']) == \
+            (new['list'], new['type'], new['name'], new['aliases']):
+        return False
+    # Only normalize when the raw fields differ (case, accents, punctuation)
+    def signature(entry):
+        return (entry['list'], entry['type'], normalize_name(entry['name']),
+                sorted(normalize_name(a) for a in entry['aliases']))
+    return signature(old) != signature(new)
+
+
+def diff_lists(old_entries, new_entries):
+    """Entries added, removed and changed between two list snapshots (by id)"""
+    old = {e['id']: e for e in old_entries}
+    new = {e['id']: e for e in new_entries}
+    return {
+        'added': [new[i] for i in sorted(new.keys() - old.keys())],
+        'removed': [old[i] for i in sorted(old.keys() - new.keys())],
+        'changed': [new[i] for i in sorted(new.keys() & old.keys())
+                    if _entry_changed(old[i], new[i])],
+    }
+
+
+def build_customer_index(customers):
+    """Index stored applicants' names, from (customer_id, full_name) pairs
+
+    The same structure as a list index, used in reverse: list tokens are
+    looked up to find the customers whose names they could match.
+    """
+    return ScreeningIndex({'id': customer_id, 'list': 'CUSTOMERS', 'type': 'customer',
+                           'name': name, 'aliases': [], 'country': '', 'program': ''}
+                          for customer_id, name in customers)
+
+
+def affected_customers(customer_index, entries, threshold=MATCH_THRESHOLD):
+    """Ids of customers who could match any alias of the given entries
+
+    A search score is the summed token similarity over the longer of the
+    two names, each similarity at most 1, so reaching `threshold` needs at
+    least threshold * max(customer tokens, alias tokens) customer tokens
+    within edit range of the alias. Counting those collisions per alias,
+    with the widest edit budget, gives a superset of the customers a full
+    search would match, without scoring anyone else.
+    """
+    customer_ids = set()
+    for entry in entries:
+        for alias in [entry['name'], *entry['aliases']]:
+            tokens = set(tokenize(alias))
+            if not tokens:
+                continue
+            near = [customer_index.similar_tokens(token, edits=MAX_EDITS)[0] for token in tokens]
+            near = np.unique(np.concatenate(near))
+            if not near.size:
+                continue
+            rows = np.concatenate([customer_index.token_aliases[tid] for tid in near.tolist()])
+            rows, collisions = np.unique(rows, return_counts=True)
+            needed = threshold * np.maximum(customer_index.alias_len[rows], len(tokens)) - 1e-9
+            for row in customer_index.alias_entry[rows[collisions >= needed]].tolist():
+                customer_ids.add(customer_index.entries[row]['id'])
+    return customer_ids
+
+
+def rescreen_delta(index, customer_index, delta, previous_hits):
+    """Rescreen only the customers a list delta can affect
+
+    ``index`` is built from the new lists, ``delta`` comes from diff_lists
+    and ``previous_hits`` maps customer id -> hits from the last run.
+    Customers whose names collide with added or changed entries, or whose
+    previous hits point at removed or changed entries, are searched again.
+    Returns the refreshed hits for those customers plus what changed.
+    """
+    targets = affected_customers(customer_index, delta['added'] + delta['changed'])
+    stale = {e['id'] for e in delta['removed'] + delta['changed']}
+    targets |= {customer_id for customer_id, hits in previous_hits.items()
+                if any(h['entry_id'] in stale for h in hits)}
+
+    names = {e['id']: e['name'] for e in customer_index.entries}
+    ordered = sorted(targets, key=str)
+    results = index.search_batch([names[c] for c in ordered if c in names])
+    hits = dict(zip([c for c in ordered if c in names], results))
+
+    def entry_ids(customer_id, source):
+        return {h['entry_id'] for h in source.get(customer_id, [])}
+
+    return {
+        'rescreened': len(hits),
+        'hits': hits,
+        'new_matches': [c for c in hits if entry_ids(c, hits) - entry_ids(c, previous_hits)],
+        'cleared': [c for c in hits if previous_hits.get(c) and not hits[c]],
+        'delta': {kind: len(entries) for kind, entries in delta.items()},
+    }
+
+
+def load_customers(path):
+    """(customer_id, full_name) pairs from a CSV with those two columns"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        return [(row['customer_id'], row['full_name']) for row in csv.DictReader(handle)]
+
+
+def _write_json(path, value):
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(value), encoding='utf-8')
+    tmp.replace(path)
+
+
+def ingest_lists(customers, data_dir=None, state_dir=None):
+    """Nightly job: diff today's lists against the last ingested snapshot and rescreen
+
+    ``customers`` are (customer_id, full_name) pairs. The snapshot and every
+    customer's name and hits live in ``state_dir`` (SCREENING_STATE_DIR by
+    default). Customers the delta can affect are rescreened with
+    rescreen_delta; customers without stored results under the same name
+    (everyone on the first run) get a full search. The new snapshot and
+    hits replace the stored ones. Returns the rescreen_delta summary with
+    the fully searched customers counted under 'screened_new'.
+    """
+    state_dir = Path(state_dir or os.environ.get('SCREENING_STATE_DIR', DEFAULT_STATE_DIR))
+    state_dir.mkdir(parents=True, exist_ok=True)
+    lists_path, hits_path = state_dir / 'lists.json', state_dir / 'hits.json'
+    previous_entries = json.loads(lists_path.read_text(encoding='utf-8')) if lists_path.exists() else None
+    stored = json.loads(hits_path.read_text(encoding='utf-8')) if hits_path.exists() and previous_entries else {}
+
+    entries = load_lists(data_dir)
+    index = ScreeningIndex(entries)
+    current = dict(customers)
+    known = {customer_id: name for customer_id, name in current.items()
+             if stored.get(customer_id, {}).get('name') == name}
+    previous_hits = {customer_id: stored[customer_id]['hits'] for customer_id in known}
+    if known:
+        result = rescreen_delta(index, build_customer_index(known.items()),
+                                diff_lists(previous_entries, entries), previous_hits)
+    else:
+        result = {'rescreened': 0, 'hits': {}, 'new_matches': [], 'cleared': [],
+                  'delta': {'added': len(entries), 'removed': 0, 'changed': 0}}
+
+    new = [customer_id for customer_id in current if customer_id not in known]
+    result['hits'].update(zip(new, index.search_batch(current[customer_id] for customer_id in new)))
+    result['new_matches'].extend(customer_id for customer_id in new if result['hits'][customer_id])
+    result['screened_new'] = len(new)
+
+    hits = {**previous_hits, **result['hits']}
+    _write_json(hits_path, {customer_id: {'name': current[customer_id], 'hits': hits[customer_id]}
+                            for customer_id in current})
+    _write_json(lists_path, entries)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest today's watch lists and rescreen the customers they affect")
+    parser.add_argument('customers', help="CSV with customer_id and full_name columns")
+    parser.add_argument('--data-dir', help="list directory (default SCREENING_DATA_DIR or data/screening)")
+    parser.add_argument('--state-dir', help="snapshot and hits (default SCREENING_STATE_DIR or data/screening_state)")
+    args = parser.parse_args()
+
+    result = ingest_lists(load_customers(args.customers), args.data_dir, args.state_dir)
+    print(f"delta          : {result['delta']}")
+    print(f"rescreened     : {result['rescreened']:,} affected customers, {result['screened_new']:,} new")
+    print(f"new matches    : {len(result['new_matches']):,} {sorted(result['new_matches'])[:20]}")
+    print(f"cleared        : {len(result['cleared']):,} {sorted(result['cleared'])[:20]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""
+Session Store
+Durable copies of the application's session state with batched write-behind,
+so in-flight applications survive restarts and can move between replicas
+(opt-in: the stored state holds applicants' PII)
+"""
+
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from utils.runtime import env_flag
+
+logger = logging.getLogger(__name__)
+
+# The session-state dicts that make up an application
+PERSISTED_KEYS = ('customer_data', 'kyc_status', 'asset_data', 'loan_decision')
+
+# Persistence is off unless SESSION_STORE_URL names a store
+DEFAULT_STORE_URL = ''
+FLUSH_SECONDS = 1.0
+MAX_TRACKED_SESSIONS = 10000
+# Rows kept queued while the backend is failing; beyond this the failed
+# batch is dropped and its sessions are written in full on their next rerun
+MAX_PENDING_ROWS = 100000
+TTL_DAYS = 7
+PURGE_SECONDS = 3600
+LINK_HOURS = 12
+
+# Field name a non-dict value is stored under
+WHOLE_VALUE = ''
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def _object_hook(value):
+    if len(value) == 1:
+        if '__datetime__' in value:
+            return datetime.fromisoformat(value['__datetime__'])
+        if '__date__' in value:
+            return date.fromisoformat(value['__date__'])
+    return value
+
+
+def encode(value):
+    """Canonical JSON of a field; dates and NumPy values round-trip"""
+    return json.dumps(value, default=_default, sort_keys=True, separators=(',', ':'))
+
+
+def decode(text):
+    return json.loads(text, object_hook=_object_hook)
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def _fields(value):
+    """Split a session-state value into the fields it is diffed by"""
+    if isinstance(value, dict) and all(isinstance(field, str) and field for field in value):
+        return value
+    return {WHOLE_VALUE: value}
+
+
+class SQLiteBackend:
+    """Rows of (session, key, field) -> JSON in one SQLite file
+
+    A backend needs only ``load(session_id)`` returning {(key, field): json},
+    ``write(upserts, deletes)`` applying one batch atomically and
+    ``purge(before)``; any store with those can replace this one.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS session_state ('
+                ' session_id TEXT NOT NULL, key TEXT NOT NULL, field TEXT NOT NULL,'
+                ' value TEXT NOT NULL, updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (session_id, key, field)) WITHOUT ROWID')
+
+    def load(self, session_id):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, field, value FROM session_state WHERE session_id = ?',
+                (session_id,)).fetchall()
+        return {(key, field): value for key, field, value in rows}
+
+    def write(self, upserts, deletes):
+        """upserts: [(session, key, field, json, time)], deletes: [(session, key, field)]"""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT INTO session_state VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (session_id, key, field) DO UPDATE '
+                    'SET value = excluded.value, updated_at = excluded.updated_at', upserts)
+                self._conn.executemany(
+                    'DELETE FROM session_state WHERE session_id = ? AND key = ? AND field = ?',
+                    deletes)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def purge(self, before):
+        """Drop sessions not written since ``before`` (epoch seconds)"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM session_state WHERE session_id IN (SELECT session_id '
+                'FROM session_state GROUP BY session_id HAVING MAX(updated_at) < ?)', (before,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryBackend:
+    """In-process backend for tests and benchmarks"""
+
+    def __init__(self):
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            return {(key, field): value for (sid, key, field), (value, _) in self.rows.items()
+                    if sid == session_id}
+
+    def write(self, upserts, deletes):
+        with self._lock:
+            for session_id, key, field, value, updated_at in upserts:
+                self.rows[session_id, key, field] = (value, updated_at)
+            for row in deletes:
+                self.rows.pop(row, None)
+
+    def purge(self, before):
+        with self._lock:
+            latest = {}
+            for (sid, _, _), (_, updated_at) in self.rows.items():
+                latest[sid] = max(latest.get(sid, 0), updated_at)
+            self.rows = {row: value for row, value in self.rows.items() if latest[row[0]] >= before}
+
+    def close(self):
+        pass
+
+
+BACKENDS = {'sqlite': SQLiteBackend, 'memory': MemoryBackend}
+
+
+def open_backend(url):
+    """Backend for a 'scheme://location' URL, e.g. sqlite:///data/sessions.sqlite"""
+    scheme, _, location = url.partition('://')
+    if scheme not in BACKENDS:
+        raise ValueError(f"unknown session store {scheme!r}; expected one of {sorted(BACKENDS)}")
+    if scheme == 'sqlite':
+        return SQLiteBackend(location[1:] if location.startswith('/') else location)
+    return BACKENDS[scheme]()
+
+
+class SessionPersistence:
+    """Write-behind persistence of PERSISTED_KEYS, diffed field by field
+
+    ``track`` is called at the end of every rerun. Each top-level field of
+    the four dicts is hashed and compared with what was last queued for the
+    session, so only changed fields are queued; a background thread writes
+    the queue every ``flush_seconds`` in one transaction, and a field that
+    changes several times between flushes is written once. Fingerprints are
+    kept for the ``max_sessions`` most recently active sessions; an evicted
+    session that comes back is written in full once. With ``ttl_seconds``
+    the writer also purges sessions idle that long, every PURGE_SECONDS.
+    A failed batch is re-queued up to ``max_pending`` rows and logged.
+    """
+
+    def __init__(self, backend, flush_seconds=FLUSH_SECONDS, max_sessions=MAX_TRACKED_SESSIONS,
+                 keys=PERSISTED_KEYS, ttl_seconds=None, max_pending=MAX_PENDING_ROWS):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.flush_seconds = flush_seconds
+        self.ttl_seconds = ttl_seconds
+        self._purged_at = 0.0
+        self.max_sessions = max_sessions
+        self.keys = keys
+        self._digests = OrderedDict()  # session -> {(key, field): digest}
+        self._pending = {}             # (session, key, field) -> json, or None to delete
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = None
+        self._stats = {'tracked': 0, 'fields_seen': 0, 'fields_queued': 0, 'rows_written': 0,
+                       'rows_deleted': 0, 'bytes_written': 0, 'snapshot_bytes': 0,
+                       'flushes': 0, 'flush_seconds': 0.0, 'errors': 0, 'rows_dropped': 0}
+        self._failures = 0  # consecutive failed write-behind passes
+
+    def load(self, session_id):
+        """Persisted state of a session, {key: value}, for rehydrating it"""
+        with self._flush_lock:
+            rows = self.backend.load(session_id)
+            # Writes still queued for this session win over the stored rows
+            with self._lock:
+                for (sid, key, field), text in self._pending.items():
+                    if sid == session_id:
+                        rows[key, field] = text
+        rows = {row: text for row, text in rows.items() if text is not None}
+        state, digests = {}, {}
+        for (key, field), text in rows.items():
+            if key not in self.keys:
+                continue
+            digests[key, field] = _digest(text)
+            if field == WHOLE_VALUE:
+                state[key] = decode(text)
+            else:
+                state.setdefault(key, {})[field] = decode(text)
+        with self._lock:
+            self._remember(session_id, digests)
+        return state
+
+    def _remember(self, session_id, digests):
+        self._digests[session_id] = digests
+        self._digests.move_to_end(session_id)
+        while len(self._digests) > self.max_sessions:
+            self._digests.popitem(last=False)
+
+    def track(self, session_id, state):
+        """Queue the fields of ``state`` that changed since the last call"""
+        encoded, snapshot_bytes = {}, 0
+        for key in self.keys:
+            if key not in state:
+                continue
+            for field, value in _fields(state[key]).items():
+                try:
+                    text = encode(value)
+                except (TypeError, ValueError):
+                    continue  # not persistable; the session keeps it in memory only
+                encoded[key, field] = text
+                snapshot_bytes += len(text)
+
+        with self._lock:
+            previous = self._digests.get(session_id, {})
+            digests = {}
+            for row, text in encoded.items():
+                digests[row] = _digest(text)
+                if previous.get(row) != digests[row]:
+                    self._pending[(session_id,) + row] = text
+            for row in previous.keys() - digests.keys():
+                self._pending[(session_id,) + row] = None
+            self._remember(session_id, digests)
+            self._stats['tracked'] += 1
+            self._stats['fields_seen'] += len(encoded)
+            self._stats['snapshot_bytes'] += snapshot_bytes
+            self._stats['fields_queued'] += sum(previous.get(row) != digest for row, digest in digests.items())
+            self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is None and not self._closed:
+            self._writer = threading.Thread(target=self._write_behind, name='session-store', daemon=True)
+            self._writer.start()
+
+    def _write_behind(self):
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+                self.purge_expired()
+            except Exception:
+                with self._lock:
+                    self._stats['errors'] += 1
+                # Once per outage; the queued rows are retried every interval
+                if not self._failures:
+                    logger.exception("session store: write-behind failed; retrying every %.1fs",
+                                     self.flush_seconds)
+                self._failures += 1
+            else:
+                if self._failures:
+                    logger.warning("session store: write-behind recovered after %d failed attempts",
+                                   self._failures)
+                self._failures = 0
+
+    def purge_expired(self, force=False):
+        """Drop sessions idle for ttl_seconds; at most every PURGE_SECONDS unless forced"""
+        now = time.time()
+        if self.ttl_seconds and (force or now - self._purged_at >= PURGE_SECONDS):
+            self._purged_at = now
+            self.backend.purge(now - self.ttl_seconds)
+
+    def flush(self):
+        """Write everything queued so far in one batch"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            now = time.time()
+            upserts = [(*row, text, now) for row, text in pending.items() if text is not None]
+            deletes = [row for row, text in pending.items() if text is None]
+            start = time.perf_counter()
+            try:
+                self.backend.write(upserts, deletes)
+            except Exception:
+                self._requeue(pending)
+                raise
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['flush_seconds'] += time.perf_counter() - start
+                self._stats['rows_written'] += len(upserts)
+                self._stats['rows_deleted'] += len(deletes)
+                self._stats['bytes_written'] += sum(len(row[3]) for row in upserts)
+
+    def _requeue(self, pending):
+        with self._lock:
+            room = self.max_pending - len(self._pending)
+            dropped = set()
+            for row, text in pending.items():
+                if row in self._pending:
+                    continue  # changed again since; the newer value wins
+                if room > 0:
+                    self._pending[row] = text
+                    room -= 1
+                else:
+                    dropped.add(row[0])
+                    self._stats['rows_dropped'] += 1
+            # Forgetting their fingerprints makes the next rerun write these sessions in full
+            for session_id in dropped:
+                self._digests.pop(session_id, None)
+
+    def forget(self, session_id):
+        """Drop a session's tracked state, e.g. once its application is archived"""
+        with self._lock:
+            self._digests.pop(session_id, None)
+
+    def close(self):
+        """Flush what is queued and stop the writer"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        self.backend.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        # Bytes written per byte of state a full snapshot per rerun would write
+        stats['write_amplification'] = (stats['bytes_written'] / stats['snapshot_bytes']
+                                        if stats['snapshot_bytes'] else 0.0)
+        return stats
+
+
+class SessionIds:
+    """Session ids bound to SESSION_STORE_SECRET rather than carried bare in the URL
+
+    A user signed in with st.login, whose identity Streamlit keeps in a
+    signed HttpOnly cookie, gets an id derived from their subject and the
+    secret, so nothing goes in the URL. Anonymous sessions are persisted
+    only with ``links``: the URL then carries the id with an expiry and an
+    HMAC over both, and a tampered or expired link starts a new session.
+    """
+
+    def __init__(self, secret, links=False, link_hours=LINK_HOURS):
+        if not secret:
+            raise ValueError("SESSION_STORE_SECRET must be set when SESSION_STORE_URL is")
+        self._secret = secret.encode('utf-8')
+        self.links = links
+        self.link_seconds = link_hours * 3600
+
+    def _mac(self, message):
+        return hmac.new(self._secret, message.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    def for_user(self, subject):
+        return self._mac(f"user:{subject}")
+
+    def link(self, session_id, now=None):
+        """Resume token for ?session=: id.expiry.mac"""
+        expires = int((now or time.time()) + self.link_seconds)
+        return f"{session_id}.{expires}.{self._mac(f'link:{session_id}.{expires}')}"
+
+    def open_link(self, token, now=None):
+        """Session id of a valid, unexpired link, else None"""
+        session_id, _, rest = (token or '').partition('.')
+        expires, _, mac = rest.partition('.')
+        if not (session_id and expires.isdigit() and mac):
+            return None
+        if not hmac.compare_digest(mac, self._mac(f'link:{session_id}.{expires}')):
+            return None
+        return session_id if int(expires) > (now or time.time()) else None
+
+
+def persistence_from_env():
+    """(SessionPersistence, SessionIds) on SESSION_STORE_URL, or (None, None) when it is unset"""
+    url = os.environ.get('SESSION_STORE_URL', DEFAULT_STORE_URL)
+    if not url:
+        return None, None
+    ids = SessionIds(os.environ.get('SESSION_STORE_SECRET', ''),
+                     links=env_flag('SESSION_STORE_LINKS'),
+                     link_hours=float(os.environ.get('SESSION_STORE_LINK_HOURS', LINK_HOURS)))
+    ttl_days = float(os.environ.get('SESSION_STORE_TTL_DAYS', TTL_DAYS))
+    persistence = SessionPersistence(
+        open_backend(url),
+        flush_seconds=float(os.environ.get('SESSION_STORE_FLUSH_SECONDS', FLUSH_SECONDS)),
+        ttl_seconds=ttl_days * 86400 if ttl_days > 0 else None,
+        max_pending=int(os.environ.get('SESSION_STORE_MAX_PENDING', MAX_PENDING_ROWS)))
+    persistence.purge_expired(force=True)
+    atexit.register(persistence.close)
+    return persistence, ids
@@ -0,0 +1,167 @@
+"""
+Shadow Scoring
+Champion/challenger evaluation: a challenger policy scores every decision
+(and historical batches) from the live decision's features, and only the
+agreement is recorded
+"""
+
+import atexit
+import csv
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.loan_batch import batch_features, simulate_loan_decision_batch
+from utils.numeric import round_like_python
+from utils.policy import current_policy
+
+DEFAULT_LOG_PATH = 'data/shadow/decisions.csv'
+LOG_FLUSH_SECONDS = 1.0
+
+LOG_COLUMNS = ['time', 'application_id', 'live_version', 'challenger_version', 'live_approved',
+               'challenger_approved', 'live_risk', 'challenger_risk', 'live_rate', 'challenger_rate']
+
+
+def challenger_policy():
+    """The compiled CHALLENGER_POLICY_PATH policy, or None when shadowing is off"""
+    path = os.environ.get('CHALLENGER_POLICY_PATH')
+    return current_policy(path) if path else None
+
+
+def _outcome(policy, measures, approved):
+    risk = measures['overall_risk']
+    return bool(approved), round(risk, 2), round(policy.interest_rate(risk), 2) if approved else 0.0
+
+
+class ShadowLog:
+    """Compact CSV log of champion/challenger outcomes plus running agreement counts
+
+    One short row per decision (versions, both outcomes, risk scores and
+    rates), appended through a buffered handle that is flushed at most
+    every LOG_FLUSH_SECONDS, so the submit path never waits on the disk.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.environ.get('SHADOW_LOG_PATH', DEFAULT_LOG_PATH))
+        self._lock = threading.Lock()
+        self._handle = None
+        self._writer = None
+        self._flushed_at = 0.0
+        self._counts = {'applications': 0, 'approve_both': 0, 'live_only': 0,
+                        'challenger_only': 0, 'decline_both': 0}
+        self._risk_delta = 0.0
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        self._handle = open(self.path, 'a', newline='', encoding='utf-8', buffering=64 * 1024)
+        self._writer = csv.writer(self._handle)
+        if new:
+            self._writer.writerow(LOG_COLUMNS)
+        atexit.register(self.flush)
+
+    def record(self, application_id, live_version, challenger_version, live, challenger):
+        """Log one decision; ``live`` and ``challenger`` are (approved, risk, rate)"""
+        key = ('approve_both' if live[0] and challenger[0] else 'live_only' if live[0] else
+               'challenger_only' if challenger[0] else 'decline_both')
+        now = time.time()
+        with self._lock:
+            if self._handle is None:
+                self._open()
+            self._writer.writerow([round(now, 3), application_id, live_version, challenger_version,
+                                   int(live[0]), int(challenger[0]), live[1], challenger[1],
+                                   live[2], challenger[2]])
+            self._counts['applications'] += 1
+            self._counts[key] += 1
+            self._risk_delta += challenger[1] - live[1]
+            if now - self._flushed_at >= LOG_FLUSH_SECONDS:
+                self._handle.flush()
+                self._flushed_at = now
+
+    def flush(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.flush()
+
+    def stats(self):
+        """Agreement counts for the decisions logged by this process"""
+        with self._lock:
+            counts, delta = dict(self._counts), self._risk_delta
+        n = counts['applications']
+        counts['agreement_rate'] = (counts['approve_both'] + counts['decline_both']) / n if n else None
+        counts['mean_risk_delta'] = delta / n if n else None
+        return counts
+
+
+_log = []
+_log_lock = threading.Lock()
+
+
+def shadow_log():
+    """The process-wide ShadowLog"""
+    if not _log:
+        with _log_lock:
+            if not _log:
+                _log.append(ShadowLog())
+    return _log[0]
+
+
+def record_shadow(decision, live_policy, live_measures, live_approved, challenger, features):
+    """Score ``challenger`` on the live decision's features and log both outcomes"""
+    _, measures, approved = challenger.score(features)
+    shadow_log().record(decision['application_id'], live_policy.version, challenger.version,
+                        _outcome(live_policy, live_measures, live_approved),
+                        _outcome(challenger, measures, approved))
+
+
+def agreement(live_approved, challenger_approved, live_risk=None, challenger_risk=None):
+    """Confusion counts and agreement rate between two sets of decisions"""
+    live_approved = np.asarray(live_approved, dtype=bool)
+    challenger_approved = np.asarray(challenger_approved, dtype=bool)
+    n = int(live_approved.size)
+    summary = {
+        'applications': n,
+        'approve_both': int((live_approved & challenger_approved).sum()),
+        'live_only': int((live_approved & ~challenger_approved).sum()),
+        'challenger_only': int((~live_approved & challenger_approved).sum()),
+        'decline_both': int((~live_approved & ~challenger_approved).sum()),
+    }
+    summary['agreement_rate'] = (summary['approve_both'] + summary['decline_both']) / n if n else None
+    if live_risk is not None and n:
+        summary['mean_risk_delta'] = float(np.mean(np.asarray(challenger_risk) - np.asarray(live_risk)))
+    return summary
+
+
+def shadow_batch(data, challenger, compliance_risk=None, seed=None):
+    """Score a historical batch under the live policy with ``challenger`` in shadow
+
+    Features (and compliance draws) are computed once; the challenger is
+    scored on them for approval, risk and rate only, as on the submit path.
+    Returns (live decisions with challenger_* columns, agreement).
+    """
+    features = batch_features(data, compliance_risk, seed)
+    live = simulate_loan_decision_batch(data, policy=current_policy(), features=features)
+    measures = challenger.score_batch(features)
+    approved = measures['approved']
+    risk = round_like_python(measures['overall_risk'], 2)
+    rate = np.where(approved, round_like_python(challenger.interest_rate(measures['overall_risk']), 2), 0.0)
+    live['challenger_status'] = np.where(approved, 'APPROVED', 'REJECTED')
+    live['challenger_risk_score'] = risk
+    live['challenger_interest_rate'] = rate
+    summary = agreement(np.asarray(live['status']) == 'APPROVED', approved, live['risk_score'], risk)
+    return live, summary
+
+
+def summarize_log(path=None):
+    """Agreement over everything in a shadow log, grouped by policy pair"""
+    frame = pd.read_csv(path or os.environ.get('SHADOW_LOG_PATH', DEFAULT_LOG_PATH),
+                        dtype={'live_version': str, 'challenger_version': str})
+    return {
+        (live, challenger): agreement(group['live_approved'], group['challenger_approved'],
+                                      group['live_risk'], group['challenger_risk'])
+        for (live, challenger), group in frame.groupby(['live_version', 'challenger_version'])
+    }
@@ -0,0 +1,187 @@
+"""
+Affordability Stress Testing
+Pass/fail surfaces for approved loans across base-rate rises, income drops
+and asset depreciation paths, broadcast with NumPy
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.amortization import monthly_payment
+from utils.numeric import as_column
+from utils.policy import current_policy
+
+# Percentage points added to the loan rate from the first payment
+RATE_SHOCKS = (0.0, 1.0, 2.0, 3.0, 5.0)
+# Fraction of annual income lost
+INCOME_SHOCKS = (0.0, 0.1, 0.2, 0.3)
+# Path name -> annual depreciation of the asset
+DEPRECIATION_PATHS = {'mild': 0.10, 'base': 0.15, 'severe': 0.25}
+
+# No negative equity; the DTI and payment-to-income limits come from the
+# policy (CompiledPolicy.stress_affordable)
+MAX_STRESSED_LTV = 100
+
+STRESS_CHUNK_ROWS = 4096
+
+PORTFOLIO_COLUMNS = [
+    'scenarios_passed', 'pass_rate', 'passes_base', 'passes_all',
+    'max_payment_to_income', 'peak_ltv',
+]
+
+
+def _balance(principal, rate_pm, payment, t):
+    """Balance after t level payments: P g^t - pmt (g^t - 1) / r"""
+    growth = np.exp(t * np.log1p(rate_pm))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        repaid = np.where(rate_pm > 0, np.expm1(t * np.log1p(rate_pm)) / rate_pm, t)
+    return principal * growth - payment * repaid
+
+
+def _peak_ltv(principal, rate, months, balloon, value, depreciation):
+    """Highest balance / asset value over the term, shape (loans, rates, paths)
+
+    With the asset losing ``depreciation`` a year (q^t = (1 - d)^(t/12) of
+    its value left after t months), LTV_t = (A (g/q)^t + B q^-t) / V where
+    A = P - pmt/r and B = pmt/r. That has at most one turning point, so
+    the peak over months 0..n-1 is at an end or either side of it: four
+    evaluations per scenario instead of one per month.
+    """
+    rate_pm = (rate / 100 / 12)[:, :, None]                          # (loans, rates, 1)
+    payment = monthly_payment(principal[:, None], rate, months[:, None], balloon[:, None])[:, :, None]
+    principal, value = principal[:, None, None], value[:, None, None]
+    last = (months - 1)[:, None, None].astype(float)
+    log_q = np.log1p(-np.asarray(depreciation, dtype=float))[None, None, :] / 12
+    log_g = np.log1p(rate_pm)
+
+    # Turning point of LTV_t, where its derivative in t is zero
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = payment / rate_pm
+        a = principal - b
+        interest_bearing = np.log(b * log_q / (a * (log_g - log_q))) / log_g
+        interest_free = principal / payment + 1 / log_q
+    turn = np.nan_to_num(np.where(rate_pm > 0, interest_bearing, interest_free),
+                         nan=0.0, posinf=0.0, neginf=0.0)
+    turn = np.clip(turn, 0, last)
+
+    t = np.stack(np.broadcast_arrays(0.0, last, np.floor(turn), np.ceil(turn)), axis=-1)
+    balance = _balance(principal[..., None], rate_pm[..., None], payment[..., None], t)
+    ltv = balance * np.exp(-t * log_q[..., None]) / value[..., None] * 100
+    with np.errstate(invalid='ignore'):
+        return np.where(value > 0, ltv.max(axis=3), np.inf)
+
+
+def stress_surface(principal, annual_rate, months, annual_income, asset_value, balloon=0.0,
+                   rate_shocks=RATE_SHOCKS, income_shocks=INCOME_SHOCKS,
+                   depreciation=tuple(DEPRECIATION_PATHS.values()), policy=None):
+    """Stress every loan under every combination of shocks
+
+    Arguments are scalars or one value per loan. Returns a dict with
+    'passed', a (loans, rate shocks, income shocks, depreciation paths)
+    boolean surface, and the measures behind it: 'debt_to_income' and
+    'payment_to_income' per (loan, rate, income) and 'peak_ltv' per
+    (loan, rate, path). A scenario passes when the loan stays within the
+    ``policy``'s (default: the current one) debt-to-income rules and
+    payment-to-income cap and never goes into negative equity.
+    """
+    principal, annual_rate, months, annual_income, asset_value, balloon = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float))
+          for v in (principal, annual_rate, months, annual_income, asset_value, balloon)))
+    rate_shocks, income_shocks = np.asarray(rate_shocks, float), np.asarray(income_shocks, float)
+    months = months.astype(np.int64)
+
+    rate = annual_rate[:, None] + rate_shocks[None, :]              # (loans, rates)
+    payment = monthly_payment(principal[:, None], rate, months[:, None], balloon[:, None])
+    income = annual_income[:, None] * (1 - income_shocks[None, :])  # (loans, incomes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        debt_to_income = np.where(income > 0, principal[:, None] / income * 100, np.inf)
+        payment_to_income = np.where(income[:, None, :] > 0,
+                                     payment[:, :, None] / (income[:, None, :] / 12) * 100, np.inf)
+    policy = policy or current_policy()
+    affordable = policy.stress_affordable({'debt_to_income': debt_to_income[:, None, :],
+                                           'payment_to_income': payment_to_income})
+
+    peak_ltv = np.empty((len(principal), len(rate_shocks), len(depreciation)))
+    for start in range(0, len(principal), STRESS_CHUNK_ROWS):
+        rows = slice(start, start + STRESS_CHUNK_ROWS)
+        peak_ltv[rows] = _peak_ltv(principal[rows], rate[rows], months[rows], balloon[rows],
+                                   asset_value[rows], depreciation)
+    covered = peak_ltv <= MAX_STRESSED_LTV
+
+    return {
+        'passed': affordable[:, :, :, None] & covered[:, :, None, :],
+        'debt_to_income': np.broadcast_to(debt_to_income[:, None, :], payment_to_income.shape),
+        'payment_to_income': payment_to_income,
+        'peak_ltv': peak_ltv,
+    }
+
+
+def stress_test(principal, annual_rate, term_years, annual_income, asset_value, balloon=0.0,
+                policy=None):
+    """Stress one approved loan; JSON-friendly result for the decision record"""
+    surface = stress_surface(principal, annual_rate, term_years * 12, annual_income,
+                             asset_value, balloon, policy=policy)
+    passed = surface['passed'][0]
+    failing = np.argwhere(~passed)
+    # Mildest failing scenario: smallest combined shock, rate first
+    first = min(failing.tolist(), key=lambda f: (sum(f), f)) if len(failing) else None
+    return {
+        'rate_shocks': list(RATE_SHOCKS),
+        'income_shocks': list(INCOME_SHOCKS),
+        'depreciation_paths': list(DEPRECIATION_PATHS),
+        'passed': passed.tolist(),
+        'scenarios_passed': int(passed.sum()),
+        'scenarios': int(passed.size),
+        'passes_base': bool(passed[0, 0, list(DEPRECIATION_PATHS).index('base')]),
+        'first_failure': None if first is None else {
+            'rate_shock': RATE_SHOCKS[first[0]],
+            'income_shock': INCOME_SHOCKS[first[1]],
+            'depreciation_path': list(DEPRECIATION_PATHS)[first[2]],
+        },
+    }
+
+
+def stress_frame(result):
+    """Long-format DataFrame of a stress_test result, one row per scenario"""
+    rates, incomes, paths = np.meshgrid(result['rate_shocks'], result['income_shocks'],
+                                        result['depreciation_paths'], indexing='ij')
+    return pd.DataFrame({
+        'rate_shock': rates.ravel(),
+        'income_shock': incomes.ravel(),
+        'depreciation_path': paths.ravel(),
+        'passed': np.asarray(result['passed']).ravel(),
+    })
+
+
+def stress_portfolio(data, policy=None):
+    """Stress a book of approved loans, e.g. simulate_loan_decision_batch output
+
+    ``data`` is a DataFrame or mapping with 'approved_amount', 'interest_rate',
+    'term_years', 'annual_income' and 'asset_value' (plus optional
+    'balloon_payment'); rows with no approved amount are skipped. Returns a
+    DataFrame of per-loan summaries keyed by PORTFOLIO_COLUMNS.
+    """
+    n = len(np.atleast_1d(data['approved_amount']))
+    principal = as_column(data['approved_amount'], n)
+    balloon = as_column(data['balloon_payment'] if 'balloon_payment' in data else 0.0, n)
+    idx = np.flatnonzero(principal > 0)
+    surface = stress_surface(principal[idx], as_column(data['interest_rate'], n)[idx],
+                             as_column(data['term_years'], n)[idx] * 12,
+                             as_column(data['annual_income'], n)[idx],
+                             as_column(data['asset_value'], n)[idx], balloon[idx], policy=policy)
+
+    base = list(DEPRECIATION_PATHS).index('base')
+    passed = surface['passed'].reshape(len(idx), -1)
+    values = {
+        'scenarios_passed': (np.zeros(n, dtype=np.int64), passed.sum(axis=1)),
+        'pass_rate': (np.full(n, np.nan), passed.mean(axis=1)),
+        'passes_base': (np.zeros(n, dtype=bool), surface['passed'][:, 0, 0, base]),
+        'passes_all': (np.zeros(n, dtype=bool), passed.all(axis=1)),
+        'max_payment_to_income': (np.full(n, np.nan),
+                                  surface['payment_to_income'].reshape(len(idx), -1).max(axis=1)),
+        'peak_ltv': (np.full(n, np.nan), surface['peak_ltv'].reshape(len(idx), -1).max(axis=1)),
+    }
+    for column, (out, value) in values.items():
+        out[idx] = value
+    return pd.DataFrame({column: out for column, (out, _) in values.items()},
+                        index=data.index if isinstance(data, pd.DataFrame) else None)
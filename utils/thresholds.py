@@ -0,0 +1,198 @@
+"""
+Threshold Optimisation
+Offline sweep of the loan policy's risk/LTV/DTI cutoffs and score weights over
+historical applications and outcomes, with the approvals vs loss-rate Pareto frontier
+"""
+
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.loan_batch import batch_features
+from utils.policy import RISK_COMPONENTS, compile_policy, current_policy
+
+# Swept measure -> grid axis name
+SWEPT = {'overall_risk': 'max_risk', 'ltv_ratio': 'max_ltv', 'debt_to_income': 'max_dti'}
+# Rows x weight vectors scored per chunk (bounds the risk matrix to ~32 MB)
+CHUNK_CELLS = 4_000_000
+
+
+def load_history(path):
+    """Historical applications (INPUT_COLUMNS plus 'defaulted' or 'loss') from CSV or Parquet"""
+    path = Path(path)
+    if path.suffix.lower() in ('.parquet', '.pq'):
+        try:
+            return pd.read_parquet(path)
+        except ImportError as exc:
+            raise ImportError("Reading Parquet history requires pyarrow: pip install pyarrow") from exc
+    return pd.read_csv(path)
+
+
+def weight_grid(step=0.05, minimum=0.05):
+    """Every score weighting on a ``step`` lattice that sums to 1, each weight >= ``minimum``"""
+    parts = int(round(1 / step))
+    if parts < 1 or not np.isclose(parts * step, 1):
+        raise ValueError("step must divide 1")
+    vectors = [combo for combo in itertools.product(range(parts + 1), repeat=len(RISK_COMPONENTS) - 1)
+               if sum(combo) <= parts]
+    grid = np.array([(*combo, parts - sum(combo)) for combo in vectors], dtype=float) / parts
+    return grid[(grid >= minimum - 1e-12).all(axis=1)]
+
+
+def _operators(policy):
+    """Comparison used by the policy for each swept measure ('<' or '<=')"""
+    ops = {measure: '<=' for measure in SWEPT}
+    for rule in policy.document['approval_rules']:
+        if rule['measure'] in SWEPT:
+            if rule['op'] not in ('<', '<='):
+                raise ValueError(f"cannot sweep {rule['measure']} {rule['op']}; only upper limits are swept")
+            ops[rule['measure']] = rule['op']
+    return ops
+
+
+def _fixed_rules(policy):
+    """approve_batch for the policy's rules on measures that are not swept (None if there are none)"""
+    rules = [rule for rule in policy.document['approval_rules'] if rule['measure'] not in SWEPT]
+    if not rules:
+        return None
+    return compile_policy({**policy.document, 'approval_rules': rules}).approve_batch
+
+
+def _bins(cutoffs, values, op):
+    """Index of the first cutoff that approves each value; len(cutoffs) where none does"""
+    return np.searchsorted(cutoffs, values, side='right' if op == '<' else 'left')
+
+
+def _outcomes(data, features):
+    """(exposure, loss) per application; loss defaults to the whole exposure on default"""
+    exposure = np.minimum(features['requested_amount'], features['asset_value'] * features['ltv_cap'])
+    if 'loss' in data:
+        loss = np.asarray(data['loss'], dtype=float)
+    elif 'defaulted' in data:
+        loss = np.asarray(data['defaulted'], dtype=float) * exposure
+    else:
+        raise ValueError("history needs a 'loss' or a 'defaulted' column")
+    return exposure, loss
+
+
+def sweep_thresholds(data, max_risk, max_ltv, max_dti, weights=None, policy=None, seed=None):
+    """Approvals, exposure and losses for every cutoff x weighting combination
+
+    Each application is scored once per weighting (a broadcast rows x
+    weightings matrix, in row chunks); its three scores are then binned
+    against the sorted cutoff axes and a cumulative sum over the 3-D
+    histogram gives every cutoff combination at once, so the cost is
+    rows x weightings plus the grid size, not rows x grid. Rules on other
+    measures and the risk-factor parameters stay as in ``policy`` (the
+    live one by default). Returns a DataFrame with one row per grid point.
+    """
+    policy = policy or current_policy()
+    axes = [np.unique(np.asarray(cutoffs, dtype=float)) for cutoffs in (max_risk, max_ltv, max_dti)]
+    order = list(policy.document['weights'])
+    if weights is None:
+        weights = [[policy.document['weights'][name] for name in RISK_COMPONENTS]]
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    if weights.shape[1] != len(RISK_COMPONENTS):
+        raise ValueError(f"weights must have one column per {RISK_COMPONENTS}")
+    columns = [RISK_COMPONENTS.index(name) for name in order]
+
+    compliance = data['compliance_risk'] if 'compliance_risk' in data else None
+    features = batch_features(data, compliance, seed)
+    measures = policy.score_batch(features)
+    exposure, loss = _outcomes(data, features)
+
+    keep = np.ones(len(exposure), dtype=bool)
+    fixed = _fixed_rules(policy)
+    if fixed is not None:
+        keep &= np.asarray(fixed(measures), dtype=bool)
+    ops = _operators(policy)
+    ltv_bin = _bins(axes[1], measures['ltv_ratio'][keep], ops['ltv_ratio'])
+    dti_bin = _bins(axes[2], measures['debt_to_income'][keep], ops['debt_to_income'])
+    components = [measures[name][keep] for name in order]
+    exposure, loss = exposure[keep], loss[keep]
+
+    shape = (len(weights), len(axes[0]) + 1, len(axes[1]) + 1, len(axes[2]) + 1)
+    size = int(np.prod(shape))
+    counts, exposed, lost = np.zeros(size), np.zeros(size), np.zeros(size)
+    chunk = max(1, CHUNK_CELLS // len(weights))
+    weight_index = np.arange(len(weights))
+    for start in range(0, len(exposure), chunk):
+        rows = slice(start, start + chunk)
+        # Summed in the policy's declared order, exactly as CompiledPolicy.overall_risk does
+        risk = components[0][rows, None] * weights[:, columns[0]]
+        for component, column in zip(components[1:], columns[1:]):
+            risk = risk + component[rows, None] * weights[:, column]
+        risk_bin = _bins(axes[0], risk, ops['overall_risk'])
+        cell = ((weight_index * shape[1] + risk_bin) * shape[2]
+                + ltv_bin[rows, None]) * shape[3] + dti_bin[rows, None]
+        cell = cell.ravel()
+        counts += np.bincount(cell, minlength=size)
+        exposed += np.bincount(cell, np.repeat(exposure[rows], len(weights)), minlength=size)
+        lost += np.bincount(cell, np.repeat(loss[rows], len(weights)), minlength=size)
+
+    def approved(histogram):
+        cumulative = histogram.reshape(shape).cumsum(axis=1).cumsum(axis=2).cumsum(axis=3)
+        return cumulative[:, :-1, :-1, :-1].ravel()
+
+    approvals, exposure_sum, losses = approved(counts), approved(exposed), approved(lost)
+    w, r, l, d = np.meshgrid(weight_index, *axes, indexing='ij')
+    results = pd.DataFrame(weights[w.ravel()], columns=list(RISK_COMPONENTS))
+    results['max_risk'] = r.ravel()
+    results['max_ltv'] = l.ravel()
+    results['max_dti'] = d.ravel()
+    results['approvals'] = approvals.astype(np.int64)
+    results['approval_rate'] = approvals / len(keep)
+    results['exposure'] = exposure_sum
+    results['losses'] = losses
+    results['loss_rate'] = np.divide(losses, exposure_sum, out=np.zeros_like(losses), where=exposure_sum > 0)
+    return results
+
+
+def pareto_frontier(results):
+    """Grid points no other point beats on both approvals (more) and loss rate (lower)"""
+    ranked = results.sort_values(['loss_rate', 'approvals'], ascending=[True, False], kind='stable')
+    best_so_far = ranked['approvals'].cummax().shift(fill_value=-1)
+    return ranked[ranked['approvals'] > best_so_far].reset_index(drop=True)
+
+
+def current_performance(data, policy=None, seed=None):
+    """Approvals and loss rate of the policy as it stands, on the same history"""
+    policy = policy or current_policy()
+    compliance = data['compliance_risk'] if 'compliance_risk' in data else None
+    features = batch_features(data, compliance, seed)
+    approved = np.asarray(policy.score_batch(features)['approved'], dtype=bool)
+    exposure, loss = _outcomes(data, features)
+    exposure_sum, losses = exposure[approved].sum(), loss[approved].sum()
+    return {
+        'policy_version': policy.version,
+        'approvals': int(approved.sum()),
+        'approval_rate': float(approved.mean()),
+        'exposure': float(exposure_sum),
+        'losses': float(losses),
+        'loss_rate': float(losses / exposure_sum) if exposure_sum > 0 else 0.0,
+    }
+
+
+def optimise_thresholds(data, max_risk, max_ltv, max_dti, weights=None, loss_ceiling=None,
+                        policy=None, seed=None):
+    """Sweep, frontier and the most approvals under ``loss_ceiling``
+
+    Returns a dict with the full 'grid', its 'frontier', the 'best' grid
+    point (a Series, or None when nothing meets the ceiling) and the
+    'current' policy's performance for comparison.
+    """
+    results = sweep_thresholds(data, max_risk, max_ltv, max_dti, weights, policy, seed)
+    frontier = pareto_frontier(results)
+    best = None
+    if loss_ceiling is not None:
+        feasible = frontier[frontier['loss_rate'] <= loss_ceiling]
+        if not feasible.empty:
+            best = feasible.loc[feasible['approvals'].idxmax()]
+    return {
+        'grid': results,
+        'frontier': frontier,
+        'best': best,
+        'current': current_performance(data, policy, seed),
+    }
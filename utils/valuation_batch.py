@@ -0,0 +1,110 @@
+"""
+Batch Vehicle Valuation
+Vectorized counterpart of the vehicle branch of simulate_asset_valuation
+for dealer stock and fleet files
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.numeric import as_column, round_like_python
+
+# Column name -> default used when the column is missing, mirroring the
+# .get() defaults in simulate_market_data / simulate_asset_valuation
+INPUT_COLUMNS = {
+    'year': 2020,
+    'mileage': 50000,
+    'condition': 'Good',
+}
+
+OUTPUT_COLUMNS = [
+    'market_value', 'value_range', 'condition_score', 'condition_rating',
+    'ltv_ratio', 'max_loan',
+]
+
+# The valuation model, shared with simulate_asset_valuation and comparables
+BASE_VALUE = 25000
+DEPRECIATION_PER_YEAR = 2000
+DEPRECIATION_PER_10K_MILES = 500
+VALUATION_YEAR = 2025
+MIN_VALUE = 1000
+
+# Condition -> (multiplier, condition score range), with the fallback used
+# for anything else
+CONDITIONS = {
+    'Excellent': (1.1, (9, 10)),
+    'Very Good': (1.0, (8, 9)),
+    'Good': (0.9, (6, 8)),
+    'Fair': (0.75, (4, 6)),
+    'Poor': (0.6, (2, 4)),
+}
+DEFAULT_CONDITION = (0.9, (6, 8))
+
+RATINGS = ['Poor', 'Fair', 'Good', 'Very Good', 'Excellent']
+RATING_FLOORS = np.array([4, 6, 8, 9])  # score at which each next rating starts
+
+
+def _conditions(data, length):
+    """Per-row multiplier, score low and score high from the condition column"""
+    values = data['condition'] if 'condition' in data else INPUT_COLUMNS['condition']
+    if np.ndim(values) == 0:
+        values = np.full(length, values, dtype=object)
+    elif not isinstance(values, (pd.Series, pd.Categorical, np.ndarray)):
+        values = np.asarray(values, dtype=object)
+    codes, labels = pd.factorize(values)
+    # Missing values get code -1, which picks the default appended last
+    table = np.array([(multiplier, low, high) for multiplier, (low, high) in
+                      [CONDITIONS.get(label, DEFAULT_CONDITION) for label in labels] +
+                      [DEFAULT_CONDITION]])
+    rows = table[codes]
+    return rows[:, 0], rows[:, 1], rows[:, 2]
+
+
+def simulate_asset_valuation_batch(data, condition_score=None, seed=None):
+    """Value many vehicles at once
+
+    ``data`` is a pandas DataFrame or a mapping of column name -> array with
+    the keys in INPUT_COLUMNS. ``condition_score`` replaces the random draw
+    the scalar function makes per vehicle; pass the same values to get the
+    market_value, ltv_ratio and condition_rating simulate_asset_valuation
+    returns. Returns a DataFrame when given one, otherwise a dict of NumPy
+    arrays keyed by OUTPUT_COLUMNS.
+    """
+    is_frame = isinstance(data, pd.DataFrame)
+    if is_frame:
+        n = len(data)
+    else:
+        n = max((len(np.atleast_1d(data[c])) for c in INPUT_COLUMNS if c in data), default=1)
+
+    year = as_column(data['year'] if 'year' in data else INPUT_COLUMNS['year'], n)
+    mileage = as_column(data['mileage'] if 'mileage' in data else INPUT_COLUMNS['mileage'], n)
+    multiplier, score_low, score_high = _conditions(data, n)
+
+    if condition_score is None:
+        rng = np.random.default_rng(seed)
+        condition_score = round_like_python(rng.uniform(score_low, score_high), 1)
+    else:
+        condition_score = as_column(condition_score, n)
+
+    age_depreciation = (VALUATION_YEAR - year) * DEPRECIATION_PER_YEAR
+    mileage_depreciation = (mileage / 10000) * DEPRECIATION_PER_10K_MILES
+    market_value = np.maximum(MIN_VALUE, (BASE_VALUE - age_depreciation - mileage_depreciation) *
+                              multiplier)
+
+    # LTV bands by condition score
+    ltv_ratio = np.where(condition_score >= 8, 0.75, np.where(condition_score >= 6, 0.70, 0.65))
+    rating_codes = np.searchsorted(RATING_FLOORS, condition_score, side='right')
+
+    result = {
+        'market_value': round_like_python(market_value, 2),
+        'value_range': round_like_python(market_value * 0.15, 2),
+        'condition_score': condition_score,
+        'condition_rating': np.array(RATINGS)[rating_codes],
+        'ltv_ratio': ltv_ratio,
+        'max_loan': round_like_python(market_value * ltv_ratio, 2),
+    }
+
+    if is_frame:
+        result['condition_rating'] = pd.Categorical.from_codes(rating_codes, categories=RATINGS)
+        return pd.DataFrame(result, index=data.index)
+    return result
@@ -0,0 +1,206 @@
+"""
+Valuation Pipeline
+Staged asset valuation (image processing, vision analysis, market data,
+valuation, report) with real progress and per-stage timings
+"""
+
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.ai_simulation import simulate_asset_valuation, simulate_market_data
+from utils.comparables import market_from_comparables
+from utils.image_ingest import PhotoStore
+from utils.photo_hash import check_photos
+
+# Stage key -> (label, share of the overall progress bar)
+STAGES = {
+    'image_processing': ('📸 Image processing', 0.30),
+    'vision_analysis': ('👁️ Vision analysis', 0.25),
+    'market_data': ('📊 Market data', 0.25),
+    'valuation': ('💰 Valuation', 0.15),
+    'report': ('✅ Report', 0.05),
+}
+
+# Vision thresholds on the analysis-resolution greyscale image (0-255 scale)
+DARK_BRIGHTNESS = 50
+BRIGHT_BRIGHTNESS = 215
+LOW_CONTRAST = 25
+BLUR_SHARPNESS = 60
+
+
+def analyze_photo(pixels):
+    """Exposure, contrast and sharpness metrics for one decoded photo"""
+    pixels = np.asarray(pixels, dtype=np.float32)
+    brightness = float(pixels.mean())
+    contrast = float(pixels.std())
+    # Variance of the 4-neighbour Laplacian: low values mean a blurry image
+    laplacian = (pixels[1:-1, :-2] + pixels[1:-1, 2:] + pixels[:-2, 1:-1] +
+                 pixels[2:, 1:-1] - 4 * pixels[1:-1, 1:-1])
+    sharpness = float(laplacian.var()) if laplacian.size else 0.0
+
+    issues = []
+    if brightness < DARK_BRIGHTNESS:
+        issues.append('underexposed')
+    elif brightness > BRIGHT_BRIGHTNESS:
+        issues.append('overexposed')
+    if contrast < LOW_CONTRAST:
+        issues.append('low contrast')
+    if sharpness < BLUR_SHARPNESS:
+        issues.append('blurry')
+
+    return {
+        'brightness': round(brightness, 1),
+        'contrast': round(contrast, 1),
+        'sharpness': round(sharpness, 1),
+        'quality_score': round(max(0.0, 10.0 - 2.5 * len(issues)), 1),
+        'issues': issues,
+    }
+
+
+class _Progress:
+    """Collects stage events from worker threads for the caller's thread
+
+    Streamlit elements can only be updated from the script thread, so
+    workers only enqueue events and run_valuation_pipeline replays them.
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.started = {}
+        self.timings = {}
+
+    def start(self, stage):
+        self.started[stage] = time.perf_counter()
+        self.events.put((stage, 0, 1))
+
+    def advance(self, stage, done, total):
+        self.events.put((stage, done, total))
+
+    def finish(self, stage):
+        self.timings[stage] = time.perf_counter() - self.started[stage]
+        self.events.put((stage, 1, 1))
+
+
+def _image_branch(photos, progress, store, photo_index, reference):
+    """Image processing then vision analysis; runs beside the market lookup"""
+    progress.start('image_processing')
+    images = store.ingest(photos, lambda done, total: progress.advance('image_processing', done, total))
+    progress.finish('image_processing')
+
+    progress.start('vision_analysis')
+    results = []
+    for i, image in enumerate(images):
+        entry = {'name': image['name']}
+        if 'error' in image:
+            entry.update(quality_score=0.0, issues=['unreadable'], error=image['error'])
+        else:
+            entry.update(width=image['width'], height=image['height'],
+                         format=image['format'], bytes=image['bytes'])
+            entry.update(analyze_photo(image['pixels']))
+        results.append(entry)
+        progress.advance('vision_analysis', i + 1, len(images))
+    photo_reuse = check_photos(photo_index, images, reference) if photo_index is not None else None
+    progress.finish('vision_analysis')
+
+    usable = [r for r in results if not r['issues']]
+    return {
+        'photos': results,
+        'photo_reuse': photo_reuse,
+        'usable_photos': len(usable),
+        'average_quality': round(float(np.mean([r['quality_score'] for r in results])), 1)
+                           if results else 0.0,
+    }
+
+
+def _market_branch(asset_info, progress, comparables):
+    progress.start('market_data')
+    market = simulate_market_data(asset_info)
+    market.update(market_from_comparables(comparables, asset_info) or {})
+    progress.finish('market_data')
+    return market
+
+
+def _summary(result, image_analysis):
+    total = len(image_analysis['photos'])
+    usable = image_analysis['usable_photos']
+    summary = (f"AI analysis of {total} photos indicates {result['condition_rating'].lower()} "
+               f"condition. Market valuation based on comparable assets and current market trends. ")
+    if usable < total:
+        flagged = sorted({issue for p in image_analysis['photos'] for issue in p['issues']})
+        summary += (f"{total - usable} photo(s) flagged for image quality ({', '.join(flagged)}); "
+                    f"consider re-uploading clearer photos. ")
+    reuse = result.get('photo_reuse') or {}
+    if reuse.get('matches'):
+        reused = len({match['photo'] for match in reuse['matches']})
+        summary += (f"{reused} photo(s) closely match images submitted with other applications; "
+                    f"manual review required. ")
+    if result.get('dvla_verification'):
+        summary += "Asset verified against official databases."
+    return summary.strip()
+
+
+def run_valuation_pipeline(asset_info, photos, on_progress=None, store=None,
+                           photo_index=None, reference=None, comparables=None):
+    """Value an asset through the staged pipeline
+
+    ``on_progress(stage, done, total, overall)`` runs on the calling thread
+    as stages advance (``overall`` is the 0-1 share done). ``store`` reuses
+    the session's ingested photos, ``photo_index`` checks them for reuse
+    under ``reference`` and ``comparables`` prices vehicles from listings.
+    Returns the simulate_asset_valuation result plus 'image_analysis',
+    'photo_reuse' and 'pipeline' timings, or None with nothing to value.
+    """
+    if not asset_info or not photos:
+        return None
+
+    if store is None:
+        store = PhotoStore()
+    progress = _Progress()
+    fractions = dict.fromkeys(STAGES, 0.0)
+    started = time.perf_counter()
+
+    def drain(wait=0.0):
+        """Replay queued events, blocking up to ``wait`` seconds for the first"""
+        while True:
+            try:
+                stage, done, total = progress.events.get(timeout=wait) if wait else \
+                    progress.events.get_nowait()
+            except queue.Empty:
+                return
+            wait = 0.0
+            fractions[stage] = done / total if total else 1.0
+            if on_progress:
+                overall = sum(STAGES[s][1] * f for s, f in fractions.items())
+                on_progress(stage, done, total, overall)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='valuation') as pool:
+        image_future = pool.submit(_image_branch, photos, progress, store,
+                                   photo_index, reference)
+        market_future = pool.submit(_market_branch, asset_info, progress, comparables)
+        while not (image_future.done() and market_future.done()):
+            drain(wait=0.05)
+        image_analysis = image_future.result()
+        market = market_future.result()
+    drain()
+
+    progress.start('valuation')
+    result = simulate_asset_valuation(asset_info, photos, market=market)
+    progress.finish('valuation')
+    drain()
+
+    progress.start('report')
+    result['photo_reuse'] = image_analysis.pop('photo_reuse')
+    result['image_analysis'] = image_analysis
+    result['analysis_summary'] = _summary(result, image_analysis)
+    progress.finish('report')
+    drain()
+
+    result['pipeline'] = {
+        'stage_seconds': {stage: round(progress.timings[stage], 4) for stage in STAGES},
+        'total_seconds': round(time.perf_counter() - started, 4),
+        'concurrent_stages': ['image_processing', 'vision_analysis', 'market_data'],
+    }
+    return result
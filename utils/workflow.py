@@ -0,0 +1,307 @@
+"""
+Headless Workflow
+Runs Onboarding → eKYC → Asset Valuation → Loan Application → Results without
+Streamlit, with the same simulation calls and session-state transitions as the views
+"""
+
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from PIL import Image
+
+from utils.ai_simulation import (simulate_fraud_screening, simulate_kyc_verification,
+                                 simulate_loan_decision, simulate_nfc_reading, update_kyc_status)
+from utils.amortization import schedule
+from utils.comparables import build_index as build_comparables_index
+from utils.image_ingest import PhotoStore
+from utils.photo_hash import load_index
+from utils.policy import current_policy
+from utils.pricing import grid_amounts, pricing_grid, quote_for
+from utils.screening import build_index as build_screening_index, screening_checks
+from utils.stress import stress_frame
+from utils.valuation_pipeline import run_valuation_pipeline
+
+STAGE_NAMES = ['onboarding', 'ekyc', 'asset_valuation', 'loan_application', 'results']
+
+FIRST_NAMES = ['Oliver', 'Amelia', 'George', 'Isla', 'Harry', 'Ava', 'Noah', 'Mia', 'Jack',
+               'Sophia', 'Leo', 'Grace', 'Arthur', 'Lily', 'Muhammad', 'Freya', 'Priya', 'Wei']
+LAST_NAMES = ['Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Johnson', 'Davies',
+              'Patel', 'Robinson', 'Wright', 'Thompson', 'Evans', 'Walker', 'Khan', 'Chen']
+CITIES = [('London', 'SW1A 1AA'), ('Manchester', 'M1 1AE'), ('Birmingham', 'B1 1BB'),
+          ('Leeds', 'LS1 4DY'), ('Glasgow', 'G1 1XQ'), ('Bristol', 'BS1 4ST')]
+VEHICLES = [('BMW', '320d'), ('Audi', 'A4'), ('Ford', 'Focus'), ('Volkswagen', 'Golf'),
+            ('Toyota', 'Corolla'), ('Nissan', 'Qashqai'), ('Tesla', 'Model 3')]
+CONDITIONS = ['Excellent', 'Very Good', 'Good', 'Fair', 'Poor']
+EMPLOYMENT = ['Employed', 'Employed', 'Employed', 'Self-Employed', 'Retired']
+
+PHOTO_SIZE = (1280, 960)
+
+# Shared, read-mostly resources (the views keep these in st.cache_resource);
+# set per process by _init_process when workflows run in a process pool
+_process_resources = None
+
+
+def shared_resources():
+    """Screening, comparables and photo-hash indexes shared by every workflow"""
+    return {
+        'screening': build_screening_index(),
+        'comparables': build_comparables_index(),
+        'photo_index': load_index(os.environ.get('PHOTO_HASH_INDEX')),
+    }
+
+
+def synthetic_photo(rng, size=PHOTO_SIZE):
+    """JPEG bytes of a smooth random image, distinct per call"""
+    w, h = size
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    image = Image.fromarray(coarse).resize((w, h), Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def synthetic_applicant(seed, photos=3, photo_size=PHOTO_SIZE):
+    """One applicant: onboarding form values, asset details, loan choices and photos"""
+    rng = np.random.default_rng(seed)
+    pick = lambda options: options[int(rng.integers(len(options)))]
+    first, last = pick(FIRST_NAMES), pick(LAST_NAMES)
+    city, postcode = pick(CITIES)
+    employment = pick(EMPLOYMENT)
+    make, model = pick(VEHICLES)
+    year = int(rng.integers(2012, 2026))
+    return {
+        'customer': {
+            'first_name': first,
+            'last_name': last,
+            'date_of_birth': date(1950, 1, 1) + timedelta(days=int(rng.integers(0, 365 * 55))),
+            'nationality': 'United Kingdom',
+            'email': f"{first.lower()}.{last.lower()}.{seed}@example.com",
+            'phone': f"07{int(rng.integers(100000000, 999999999))}",
+            'address_line1': f"{int(rng.integers(1, 200))} High Street",
+            'address_line2': '',
+            'city': city,
+            'postcode': postcode,
+            'country': 'United Kingdom',
+            'employment_status': employment,
+            'employer_name': 'Acme Ltd' if employment == 'Employed' else '',
+            'annual_income': int(rng.integers(18, 120)) * 1000,
+            'years_employed': int(rng.integers(0, 20)),
+            'loan_purpose': 'Vehicle Purchase',
+            'requested_amount': int(rng.integers(3, 30)) * 1000,
+        },
+        'asset': {
+            'type': 'Vehicle',
+            'make': make,
+            'model': model,
+            'year': year,
+            'mileage': int(max(0, rng.normal((2025 - year) * 9000, 5000)) // 1000 * 1000),
+            'condition': pick(CONDITIONS),
+            'registration': f"AB{int(rng.integers(10, 99))} CDE",
+        },
+        'doc_type': 'Passport',
+        'term_years': int(rng.integers(1, 8)),
+        'balloon': float(rng.choice([0.0, 0.0, 0.0, 1000.0, 3000.0])),
+        'overpayment': float(rng.choice([0.0, 0.0, 50.0, 100.0])),
+        'photos': [synthetic_photo(rng, photo_size) for _ in range(photos)],
+    }
+
+
+def onboarding(state, applicant, resources):
+    """Onboarding form submit"""
+    state['customer_data'] = dict(applicant['customer'], submitted_at=date.today().isoformat())
+
+
+def ekyc(state, applicant, resources):
+    """NFC read, document verification and screening, then the overall status"""
+    customer = state['customer_data']
+    kyc_status = state.setdefault('kyc_status', {})
+
+    nfc_data = simulate_nfc_reading(customer)
+    if nfc_data:
+        kyc_status['nfc_data'] = nfc_data
+        kyc_status['nfc_verified'] = True
+
+    doc_verification = simulate_kyc_verification(customer, applicant['doc_type'], 'document.jpg')
+    if doc_verification:
+        kyc_status['document_verified'] = True
+        kyc_status['document_data'] = doc_verification
+
+    full_name = f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip()
+    screening_results = screening_checks(resources['screening'], full_name)
+    screening_results.update(simulate_fraud_screening())
+    kyc_status['screening'] = screening_results
+    kyc_status['screening_complete'] = True
+
+    update_kyc_status(kyc_status)
+
+
+def asset_valuation(state, applicant, resources):
+    """Photo ingest and the valuation pipeline"""
+    customer = state['customer_data']
+    photos = applicant['photos']
+    store = state.setdefault('photo_store', PhotoStore())
+    store.ingest(photos)
+    asset_info = dict(applicant['asset'], photos_count=len(photos), has_v5c=False)
+    reference = customer.get('email') or f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip()
+    valuation_result = run_valuation_pipeline(
+        asset_info, photos, store=store, photo_index=resources['photo_index'],
+        reference=reference, comparables=resources['comparables']
+    )
+    if valuation_result:
+        state['asset_data'] = {**asset_info, **valuation_result}
+
+
+def loan_application(state, applicant, resources):
+    """Pricing grid, quote and schedule for the chosen term, then the decision"""
+    customer_data, asset_data = state['customer_data'], state['asset_data']
+    requested_amount = customer_data.get('requested_amount', 0)
+    annual_income = customer_data.get('annual_income', 0)
+    asset_value = asset_data.get('market_value', 0)
+    max_loan = asset_value * asset_data.get('ltv_ratio', 0.7)
+    term_years = applicant['term_years']
+    balloon = min(applicant['balloon'], float(requested_amount))
+
+    fees = current_policy().arrangement_fee
+    grid = pricing_grid(annual_income, asset_value, max_loan,
+                        grid_amounts(requested_amount, max_loan), balloon=balloon, fees=fees)
+    quote = quote_for(grid, requested_amount, term_years)
+    interest_rate = float(quote['interest_rate'])
+    monthly_payment = float(quote['monthly_payment'])
+    schedule(requested_amount, interest_rate, term_years * 12, balloon,
+             overpayments=[[0.0], [applicant['overpayment']]])
+
+    decision = simulate_loan_decision({
+        'customer': customer_data,
+        'kyc': state['kyc_status'],
+        'asset': asset_data,
+        'loan_request': {
+            'amount': requested_amount,
+            'term_years': term_years,
+            'interest_rate': interest_rate,
+            'monthly_payment': monthly_payment,
+            'balloon': balloon,
+            'fees': fees
+        },
+    })
+    if decision:
+        state['loan_decision'] = decision
+        state['loan_decision']['submitted_at'] = datetime.now().isoformat()
+
+
+def results(state, applicant, resources):
+    """What the Results page derives from the decision"""
+    decision = state['loan_decision']
+    if decision.get('stress_test'):
+        stress_frame(decision['stress_test'])
+    return decision.get('monthly_payment', 0) * decision.get('term_years', 0) * 12
+
+
+STAGES = {
+    'onboarding': onboarding,
+    'ekyc': ekyc,
+    'asset_valuation': asset_valuation,
+    'loan_application': loan_application,
+    'results': results,
+}
+
+# Session-state key each stage needs before it can run, as the views check
+PREREQUISITES = {
+    'ekyc': lambda state: state.get('customer_data'),
+    'asset_valuation': lambda state: state.get('kyc_status', {}).get('overall_status') == 'COMPLETE',
+    'loan_application': lambda state: state.get('asset_data', {}).get('market_value'),
+    'results': lambda state: state.get('loan_decision'),
+}
+
+
+def run_workflow(applicant, resources, state=None):
+    """Run every stage for one applicant
+
+    ``state`` is a dict standing in for st.session_state. Stops early, like
+    the views' warnings, when a stage's prerequisite is missing. Returns
+    (state, {stage: seconds}, outcome).
+    """
+    state = {} if state is None else state
+    timings = {}
+    for stage in STAGE_NAMES:
+        ready = PREREQUISITES.get(stage)
+        if ready and not ready(state):
+            return state, timings, f"STOPPED_BEFORE_{stage.upper()}"
+        start = time.perf_counter()
+        STAGES[stage](state, applicant, resources)
+        timings[stage] = time.perf_counter() - start
+    return state, timings, state['loan_decision'].get('status', 'UNKNOWN')
+
+
+def _run_one(seed, photos, photo_size, resources):
+    applicant = synthetic_applicant(seed, photos, photo_size)
+    start = time.perf_counter()
+    try:
+        _, timings, outcome = run_workflow(applicant, resources)
+    except Exception as exc:  # one failed session must not stop the run
+        timings, outcome = {}, f"ERROR: {type(exc).__name__}: {exc}"
+    timings['total'] = time.perf_counter() - start
+    return timings, outcome
+
+
+def _init_process():
+    global _process_resources
+    _process_resources = shared_resources()
+
+
+def _run_in_process(seed, photos, photo_size):
+    return _run_one(seed, photos, photo_size, _process_resources)
+
+
+def latency_summary(samples):
+    """count, mean and p50/p95/p99 in milliseconds for a list of seconds"""
+    values = np.asarray(samples) * 1000
+    if not values.size:
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': int(values.size), 'mean_ms': float(values.mean()),
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+def run_workflows(count, workers=8, mode='thread', seed=0, photos=3, photo_size=PHOTO_SIZE,
+                  resources=None):
+    """Run ``count`` synthetic workflows concurrently and report latencies
+
+    ``mode`` is 'thread' (one process, shared resources, like the sessions
+    of one Streamlit server) or 'process' (each worker builds its own
+    resources). Returns a report dict with throughput, per-stage latency
+    summaries and outcome counts.
+    """
+    seeds = range(seed, seed + count)
+    started = time.perf_counter()
+    if mode == 'thread':
+        resources = shared_resources() if resources is None else resources
+        setup_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='workflow') as pool:
+            runs = list(pool.map(lambda s: _run_one(s, photos, photo_size, resources), seeds))
+    elif mode == 'process':
+        setup_seconds = 0.0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_process) as pool:
+            runs = list(pool.map(_run_in_process, seeds, [photos] * count, [photo_size] * count))
+    else:
+        raise ValueError(f"unknown mode {mode!r}; use 'thread' or 'process'")
+    wall_seconds = time.perf_counter() - started
+
+    outcomes = {}
+    for _, outcome in runs:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        'workflows': count,
+        'workers': workers,
+        'mode': mode,
+        'setup_seconds': setup_seconds,
+        'wall_seconds': wall_seconds,
+        'throughput_per_second': count / wall_seconds if wall_seconds else 0.0,
+        'stages': {stage: latency_summary([t[stage] for t, _ in runs if stage in t])
+                   for stage in STAGE_NAMES + ['total']},
+        'outcomes': outcomes,
+    }
@@ -0,0 +1,145 @@
+"""
+Admin Panel
+Sidebar view of rerun, section and simulate_* call timings, page import
+costs, rerun profiles, champion/challenger agreement and risk-score drift
+(INSTRUMENTATION_ADMIN=1)
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+from utils import drift, instrumentation, profiling, shadow
+from utils.instrumentation import REGISTRY, histogram_rows
+from utils.page_registry import import_costs
+from utils.policy import current_policy
+
+
+def _table(rows, label):
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        st.caption(f"No {label} recorded yet.")
+        return
+    st.dataframe(frame.round(2), hide_index=True, use_container_width=True)
+
+
+def show():
+    if instrumentation.ENABLED:
+        show_metrics()
+    show_page_imports()
+    show_profiles()
+    if shadow.challenger_policy() is not None:
+        show_shadow()
+    if drift.ENABLED:
+        show_drift()
+
+
+def show_metrics():
+    with st.expander("⏱️ Instrumentation", expanded=False):
+        snapshot = REGISTRY.snapshot()
+
+        st.markdown("**Reruns by page** (ms)")
+        _table(histogram_rows(snapshot, 'app_rerun_seconds'), "reruns")
+
+        st.markdown("**Sections** (ms)")
+        _table(histogram_rows(snapshot, 'app_section_seconds'), "sections")
+
+        st.markdown("**simulate_* calls** (ms)")
+        calls = histogram_rows(snapshot, 'simulate_call_seconds')
+        errors = snapshot.get('simulate_errors_total', {})
+        payloads = {(row['function'], row['direction']): row['mean']
+                    for row in histogram_rows(snapshot, 'simulate_payload_bytes', scale=1)}
+        for row in calls:
+            row['errors'] = errors.get((('function', row['function']),), 0)
+            row['in_bytes'] = payloads.get((row['function'], 'in'), 0.0)
+            row['out_bytes'] = payloads.get((row['function'], 'out'), 0.0)
+        _table(calls, "calls")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Metrics", REGISTRY.render(), file_name="metrics.prom",
+                               mime="text/plain")
+        with col2:
+            if st.button("Reset", key="instrumentation_reset"):
+                REGISTRY.reset()
+                st.rerun()
+
+
+def show_page_imports():
+    with st.expander("📦 Page imports", expanded=False):
+        st.caption("First-visit import time of each view module loaded in this process; "
+                   "modules shared with earlier pages are counted once, on the page that loaded them.")
+        _table([{'page': name, 'import_ms': seconds * 1000} for name, seconds in import_costs().items()],
+               "page imports")
+
+
+def show_profiles():
+    with st.expander("🔬 Profiling", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            reruns = st.number_input("Reruns", min_value=1, max_value=20, value=1,
+                                     key="profile_reruns")
+        with col2:
+            memory = st.checkbox("tracemalloc", key="profile_memory")
+        if st.button("Profile next reruns", key="profile_arm"):
+            # The click's own rerun is already under way; the next ones are profiled
+            profiling.arm(st.session_state, reruns, memory=memory)
+            st.caption(f"Profiling the next {reruns} rerun(s).")
+
+        profiles = profiling.list_profiles()
+        if not profiles:
+            st.caption(f"No profiles in {profiling.PROFILE_DIR}/ yet.")
+            return
+        path = st.selectbox("Profile", profiles, format_func=lambda p: p.stem, key="profile_file")
+        sort = st.radio("Sort by", ['cumulative', 'tottime'], horizontal=True, key="profile_sort")
+        rows = profiling.top_functions(path, limit=25, sort=sort)
+        frame = pd.DataFrame(rows)
+        frame[['tottime', 'cumtime']] = (frame[['tottime', 'cumtime']] * 1000).round(2)
+        st.dataframe(frame.rename(columns={'tottime': 'tottime (ms)', 'cumtime': 'cumtime (ms)'}),
+                     hide_index=True, use_container_width=True)
+
+        downloads = [Path(path), Path(str(path).replace('.pstats', '.collapsed')),
+                     Path(str(path).replace('.pstats', '.tracemalloc.txt'))]
+        for column, download in zip(st.columns(len(downloads)), downloads):
+            if download.exists():
+                with column:
+                    st.download_button(download.suffix.lstrip('.'), download.read_bytes(),
+                                       file_name=download.name, key=f"profile_download{download.suffix}")
+
+
+def show_shadow():
+    with st.expander("🥊 Shadow scoring", expanded=False):
+        log = shadow.shadow_log()
+        stats = log.stats()
+        st.caption(f"Live {current_policy().version} vs challenger "
+                   f"{shadow.challenger_policy().version}")
+        if not stats['applications']:
+            st.caption("No shadowed decisions in this process yet.")
+        else:
+            col1, col2 = st.columns(2)
+            col1.metric("Agreement", f"{stats['agreement_rate']:.1%}")
+            col2.metric("Risk Δ", f"{stats['mean_risk_delta']:+.3f}")
+            _table([{'outcome': key, 'applications': stats[key]}
+                    for key in ('approve_both', 'live_only', 'challenger_only', 'decline_both')],
+                   "decisions")
+        log.flush()
+        if log.path.exists():
+            st.download_button("Shadow log", log.path.read_bytes(), file_name=log.path.name,
+                               mime="text/csv", key="shadow_download")
+
+
+def show_drift():
+    with st.expander("📉 Risk drift", expanded=False):
+        monitor = drift.monitor()
+        rows = monitor.report()
+        if not rows[0]['reference_n']:
+            st.caption("No decisions observed yet.")
+            return
+        st.caption(f"Reference: {rows[0]['reference_n']:,} decisions · window: {rows[0]['window_n']:,} "
+                   f"decisions · PSI ≥ {drift.PSI_WATCH} watch, ≥ {drift.PSI_SHIFT} shift")
+        frame = pd.DataFrame(rows)[['metric', 'psi', 'ks', 'ks_p_value', 'p50_reference', 'p50_window',
+                                    'p90_reference', 'p90_window', 'status']]
+        st.dataframe(frame.round(3), hide_index=True, use_container_width=True)
+        st.download_button("Drift state", json.dumps(monitor.state()), file_name="drift_state.json",
+                           mime="application/json", key="drift_download")
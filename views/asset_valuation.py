@@ -3,9 +3,33 @@ Asset Valuation Page
 AI-powered asset analysis and valuation
 """
 
+import os
+
 import streamlit as st
-from utils.ai_simulation import simulate_asset_valuation
-import random
+from utils.comparables import build_index as build_comparables_index, listings_fingerprint
+from utils.image_ingest import PhotoStore
+from utils.photo_hash import load_index
+from utils.valuation_pipeline import STAGES, run_valuation_pipeline
+
+def _photo_store():
+    """This session's cache of processed photo previews and analysis copies"""
+    if 'photo_store' not in st.session_state:
+        st.session_state.photo_store = PhotoStore()
+    return st.session_state.photo_store
+
+@st.cache_resource
+def _photo_index():
+    """Process-wide perceptual hash index of previously submitted asset photos"""
+    return load_index(os.environ.get('PHOTO_HASH_INDEX'))
+
+@st.cache_resource(max_entries=1)
+def _comparables_index(listings_version):
+    """Comparable-listings index, rebuilt when the listings file changes"""
+    return build_comparables_index()
+
+def _applicant_reference():
+    customer = st.session_state.get('customer_data', {})
+    return customer.get('email') or f"{customer.get('first_name', '')} {customer.get('last_name', '')}".strip()
 
 def show():
     st.markdown('<h1 class="main-header">🚗 Asset Valuation</h1>', unsafe_allow_html=True)
@@ -93,11 +117,22 @@ def show():
     if uploaded_photos:
         st.markdown(f"**{len(uploaded_photos)} photo(s) uploaded**")
         
-        # Display photos in a grid
-        cols = st.columns(min(3, len(uploaded_photos)))
-        for idx, photo in enumerate(uploaded_photos):
+        # Display downsized previews in a grid
+        photo_store = _photo_store()
+        previews = photo_store.ingest(uploaded_photos)
+        cols = st.columns(min(3, len(previews)))
+        for idx, record in enumerate(previews):
             with cols[idx % 3]:
-                st.image(photo, caption=f"Photo {idx + 1}", use_container_width=True)
+                if 'error' in record:
+                    st.error(f"Photo {idx + 1}: could not read {record['name']}")
+                else:
+                    st.image(record['preview'], caption=f"Photo {idx + 1}", use_container_width=True)
+        
+        store_stats = photo_store.stats()
+        st.caption(
+            f"🗂️ Photo cache: {store_stats['entries']} photo(s), "
+            f"{store_stats['used_bytes'] / 1024 / 1024:.1f} / {store_stats['budget_bytes'] / 1024 / 1024:.0f} MB"
+        )
     
     st.markdown("---")
     
@@ -122,7 +157,24 @@ def show():
         if not uploaded_photos:
             st.error("⚠️ Please upload at least one asset photo.")
         else:
-            # Show visual analysis progress
+            # Prepare asset info
+            asset_info = {
+                'type': asset_type,
+                'photos_count': len(uploaded_photos),
+                'has_v5c': v5c_document is not None if asset_type == "Vehicle" else False
+            }
+            
+            if asset_type == "Vehicle":
+                asset_info.update({
+                    'make': make,
+                    'model': model,
+                    'year': year,
+                    'mileage': mileage,
+                    'condition': condition,
+                    'registration': registration
+                })
+            
+            # Show real pipeline progress
             progress_container = st.container()
             with progress_container:
                 st.markdown("### 🤖 AI Analysis in Progress")
@@ -130,98 +182,31 @@ def show():
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 analysis_steps = st.empty()
+                stage_progress = {}
                 
-                import time
-                
-                # Step 1: Image Processing
-                status_text.markdown("**Step 1/5:** Processing images...")
-                analysis_steps.markdown("""
-                <div style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 5px 0;">
-                    📸 Analyzing {0} photo(s) for quality and content...
-                </div>
-                """.format(len(uploaded_photos)), unsafe_allow_html=True)
-                
-                for i in range(20):
-                    time.sleep(0.05)
-                    progress_bar.progress(i + 1)
-                
-                # Step 2: Computer Vision Analysis
-                status_text.markdown("**Step 2/5:** Computer vision analysis...")
-                analysis_steps.markdown("""
-                <div style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 5px 0;">
-                    📸 Analyzing {0} photo(s) for quality and content...<br>
-                    👁️ Computer vision: Detecting condition, damage, and features...
-                </div>
-                """.format(len(uploaded_photos)), unsafe_allow_html=True)
-                
-                for i in range(20, 40):
-                    time.sleep(0.05)
-                    progress_bar.progress(i + 1)
-                
-                # Step 3: Market Data Integration
-                status_text.markdown("**Step 3/5:** Fetching market data...")
-                analysis_steps.markdown("""
-                <div style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 5px 0;">
-                    📸 Analyzing {0} photo(s) for quality and content...<br>
-                    👁️ Computer vision: Detecting condition, damage, and features...<br>
-                    📊 Querying market databases (CAP HPI, DVLA)...
-                </div>
-                """.format(len(uploaded_photos)), unsafe_allow_html=True)
-                
-                for i in range(40, 70):
-                    time.sleep(0.05)
-                    progress_bar.progress(i + 1)
+                def on_progress(stage, done, total, overall):
+                    stage_progress[stage] = (done, total)
+                    progress_bar.progress(min(1.0, overall))
+                    label = STAGES[stage][0]
+                    status_text.markdown(f"**{label}** ({done}/{total})")
+                    lines = []
+                    for key, (stage_label, _) in STAGES.items():
+                        if key not in stage_progress:
+                            continue
+                        stage_done, stage_total = stage_progress[key]
+                        icon = "✔️" if stage_done == stage_total and stage_total else "⏳"
+                        lines.append(f"{icon} {stage_label}: {stage_done}/{stage_total}")
+                    analysis_steps.markdown(f"""
+                    <div style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 5px 0;">
+                        {'<br>'.join(lines)}
+                    </div>
+                    """, unsafe_allow_html=True)
                 
-                # Step 4: Valuation Calculation
-                status_text.markdown("**Step 4/5:** Calculating valuation...")
-                analysis_steps.markdown("""
-                <div style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 5px 0;">
-                    📸 Analyzing {0} photo(s) for quality and content...<br>
-                    👁️ Computer vision: Detecting condition, damage, and features...<br>
-                    📊 Querying market databases (CAP HPI, DVLA)...<br>
-                    💰 Calculating market value based on condition and market data...
-                </div>
-                """.format(len(uploaded_photos)), unsafe_allow_html=True)
-                
-                for i in range(70, 90):
-                    time.sleep(0.05)
-                    progress_bar.progress(i + 1)
-                
-                # Step 5: Finalizing
-                status_text.markdown("**Step 5/5:** Finalizing results...")
-                analysis_steps.markdown("""
-                <div style="background: #e8f5e9; padding: 10px; border-radius: 5px; margin: 5px 0;">
-                    📸 Analyzing {0} photo(s) for quality and content...<br>
-                    👁️ Computer vision: Detecting condition, damage, and features...<br>
-                    📊 Querying market databases (CAP HPI, DVLA)...<br>
-                    💰 Calculating market value based on condition and market data...<br>
-                    ✅ Generating comprehensive valuation report...
-                </div>
-                """.format(len(uploaded_photos)), unsafe_allow_html=True)
-                
-                for i in range(90, 100):
-                    time.sleep(0.05)
-                    progress_bar.progress(i + 1)
-                
-                # Prepare asset info
-                asset_info = {
-                    'type': asset_type,
-                    'photos_count': len(uploaded_photos),
-                    'has_v5c': v5c_document is not None if asset_type == "Vehicle" else False
-                }
-                
-                if asset_type == "Vehicle":
-                    asset_info.update({
-                        'make': make,
-                        'model': model,
-                        'year': year,
-                        'mileage': mileage,
-                        'condition': condition,
-                        'registration': registration
-                    })
-                
-                # Simulate AI valuation
-                valuation_result = simulate_asset_valuation(asset_info, uploaded_photos)
+                valuation_result = run_valuation_pipeline(
+                    asset_info, uploaded_photos, on_progress, store=_photo_store(),
+                    photo_index=_photo_index(), reference=_applicant_reference(),
+                    comparables=_comparables_index(listings_fingerprint())
+                )
                 
                 # Clear progress indicators
                 progress_bar.empty()
@@ -296,8 +281,13 @@ def show():
                         - **Price Range:** £{market_data.get('min_price', 0):,.0f} - £{market_data.get('max_price', 0):,.0f}
                         - **Market Trend:** {market_data.get('trend', 'Stable')}
                         - **Comparable Listings:** {market_data.get('comparables', 0)}
+                        - **Source:** {market_data.get('source', 'Market Data')}
                         """)
                         
+                        if market_data.get('nearest'):
+                            with st.expander("Nearest Comparable Listings", expanded=False):
+                                st.dataframe(market_data['nearest'], use_container_width=True, hide_index=True)
+                        
                         if asset_type == "Vehicle":
                             st.markdown("#### DVLA Verification")
                             dvla_status = valuation_result.get('dvla_verification', {})
@@ -309,6 +299,33 @@ def show():
                             - **Mileage Check:** {dvla_status.get('mileage_check', 'N/A')}
                             """)
                     
+                    # Photo reuse check
+                    photo_reuse = valuation_result.get('photo_reuse') or {}
+                    if photo_reuse.get('status') == 'REUSED':
+                        st.error("🚨 Photos match images submitted with other applications — manual review required.")
+                        st.dataframe(photo_reuse['matches'], use_container_width=True, hide_index=True)
+                    elif photo_reuse:
+                        st.caption(
+                            f"🔁 Photo reuse check: {photo_reuse['photos_checked']} photo(s) checked against "
+                            f"{photo_reuse['index_size']:,} on file — no matches"
+                        )
+                    
+                    # Image quality and pipeline timings
+                    image_analysis = valuation_result.get('image_analysis', {})
+                    flagged = [p for p in image_analysis.get('photos', []) if p['issues']]
+                    if flagged:
+                        st.warning("📸 " + "; ".join(
+                            f"{p['name']}: {', '.join(p['issues'])}" for p in flagged
+                        ))
+                    
+                    pipeline = valuation_result.get('pipeline', {})
+                    if pipeline:
+                        timings = " · ".join(
+                            f"{STAGES[stage][0]} {seconds * 1000:.0f} ms"
+                            for stage, seconds in pipeline['stage_seconds'].items()
+                        )
+                        st.caption(f"⏱️ Completed in {pipeline['total_seconds'] * 1000:.0f} ms — {timings}")
+                    
                     # Full JSON for debugging
                     with st.expander("View Full Valuation Data", expanded=False):
                         st.json(valuation_result)
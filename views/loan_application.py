@@ -5,8 +5,34 @@ Final loan application submission and automated decisioning
 
 import streamlit as st
 from utils.ai_simulation import simulate_loan_decision
+from utils.amortization import schedule, schedule_frame
+from utils.policy import current_policy
+from utils.pricing import grid_amounts, pricing_grid, quote_for
 from datetime import datetime
 
+MAX_CACHED_SCHEDULES = 64
+
+def _pricing(annual_income, asset_value, max_loan, requested_amount, balloon):
+    """Pricing grid (and schedules) for this application, kept in session
+    
+    Recomputed only when an input that changes prices does.
+    """
+    fees = current_policy().arrangement_fee
+    key = (annual_income, asset_value, max_loan, requested_amount, balloon, fees)
+    cached = st.session_state.get('pricing_grid')
+    if not cached or cached['key'] != key:
+        cached = {
+            'key': key,
+            'fees': fees,
+            'grid': pricing_grid(annual_income, asset_value, max_loan,
+                                 grid_amounts(requested_amount, max_loan), balloon=balloon, fees=fees),
+            'schedules': {},
+        }
+        st.session_state.pricing_grid = cached
+    if len(cached['schedules']) > MAX_CACHED_SCHEDULES:
+        cached['schedules'].clear()
+    return cached
+
 def show():
     st.markdown('<h1 class="main-header">💼 Loan Application</h1>', unsafe_allow_html=True)
     st.markdown("Review your application and submit for automated loan decision.")
@@ -83,29 +109,50 @@ def show():
     annual_income = customer_data.get('annual_income', 0)
     debt_to_income = (requested_amount / annual_income * 100) if annual_income > 0 else 0
     
-    # Simulate interest rate based on risk
-    base_rate = 5.5
-    risk_adjustment = 0
-    if debt_to_income > 40:
-        risk_adjustment += 1.5
-    if ltv_requested > 80:
-        risk_adjustment += 1.0
-    
-    interest_rate = base_rate + risk_adjustment
     loan_term_years = st.slider("Loan Term (Years)", 1, 7, 5)
     loan_term_months = loan_term_years * 12
     
-    # Calculate monthly payment (simplified)
-    monthly_rate = interest_rate / 100 / 12
-    if monthly_rate > 0:
-        monthly_payment = requested_amount * (monthly_rate * (1 + monthly_rate)**loan_term_months) / ((1 + monthly_rate)**loan_term_months - 1)
-    else:
-        monthly_payment = requested_amount / loan_term_months
+    with st.expander("⚙️ Repayment Options", expanded=False):
+        opt_col1, opt_col2 = st.columns(2)
+        
+        with opt_col1:
+            balloon = st.number_input(
+                "Balloon / Final Payment (£)",
+                min_value=0.0, max_value=float(requested_amount), value=0.0, step=500.0,
+                help="PCP-style final payment; lowers the monthly payment"
+            )
+        
+        with opt_col2:
+            overpayment = st.number_input(
+                "Monthly Overpayment (£)",
+                min_value=0.0, value=0.0, step=50.0,
+                help="Extra principal each month; the payment stays the same and the term shortens"
+            )
+    
+    # Slider moves are lookups into the grid priced once for this application
+    pricing = _pricing(annual_income, asset_value, max_loan, requested_amount, balloon)
+    grid = pricing['grid']
+    fees = pricing['fees']
+    quote = quote_for(grid, requested_amount, loan_term_years)
+    interest_rate = float(quote['interest_rate'])
+    monthly_payment = float(quote['monthly_payment'])
+    apr = float(quote['apr'])
+    
+    # Schedules with and without the overpayment, computed together
+    schedule_key = (loan_term_years, overpayment)
+    if schedule_key not in pricing['schedules']:
+        pricing['schedules'][schedule_key] = schedule(
+            requested_amount, interest_rate, loan_term_months, balloon,
+            overpayments=[[0.0], [overpayment]]
+        )
+    repayment = pricing['schedules'][schedule_key]
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Interest Rate", f"{interest_rate:.2f}%")
+        fee_note = f"APR includes the £{fees:,.0f} arrangement fee" if fees else "No arrangement fee"
+        st.metric("Interest Rate", f"{interest_rate:.2f}%", delta=f"APR {apr:.1f}%",
+                  delta_color="off", help=fee_note)
     
     with col2:
         st.metric("Loan Term", f"{loan_term_years} years")
@@ -114,9 +161,49 @@ def show():
         st.metric("Monthly Payment", f"£{monthly_payment:,.2f}")
     
     with col4:
-        total_payable = monthly_payment * loan_term_months
+        total_payable = float(repayment['total_paid'][1])
         st.metric("Total Payable", f"£{total_payable:,.0f}")
     
+    with st.expander("📊 Compare Terms & Amounts", expanded=False):
+        measure = st.radio(
+            "Compare",
+            ["Monthly Payment", "Total Interest", "Interest Rate", "APR"],
+            horizontal=True
+        )
+        column = {'Monthly Payment': 'monthly_payment', 'Total Interest': 'total_interest',
+                  'Interest Rate': 'interest_rate', 'APR': 'apr'}[measure]
+        table = grid.pivot(index='amount', columns='term_years', values=column)
+        table.index = [
+            f"£{amount:,.0f}" + ("" if amount <= max_loan else " ⚠️") + (" ◀" if amount == requested_amount else "")
+            for amount in table.index
+        ]
+        table.columns = [f"{term} yr" for term in table.columns]
+        fmt = {'interest_rate': "{:.2f}%", 'apr': "{:.1f}%"}.get(column, "£{:,.2f}")
+        st.dataframe(table.style.format(fmt), use_container_width=True)
+        st.caption("◀ requested amount · ⚠️ above the maximum loan for this asset")
+    
+    with st.expander("📅 Repayment Schedule", expanded=False):
+        schedule_df = schedule_frame(repayment)
+        schedule_df = schedule_df[schedule_df['loan'] == 1].drop(columns='loan')
+        
+        if overpayment > 0:
+            saved = repayment['total_interest'][0] - repayment['total_interest'][1]
+            st.caption(
+                f"Overpaying £{overpayment:,.0f}/month repays in {repayment['months'][1]} months "
+                f"instead of {repayment['months'][0]} and saves £{saved:,.0f} in interest."
+            )
+        if balloon > 0:
+            st.caption(f"Final payment includes a balloon of £{balloon:,.0f}.")
+        
+        st.line_chart(schedule_df.set_index('month')['balance'])
+        st.dataframe(schedule_df, use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Download Schedule (CSV)",
+            schedule_df.to_csv(index=False),
+            file_name="repayment_schedule.csv",
+            mime="text/csv"
+        )
+    
     st.markdown("---")
     
     # Risk Assessment Preview
@@ -184,7 +271,11 @@ def show():
                         'requested_amount': requested_amount,
                         'interest_rate': interest_rate,
                         'term_years': loan_term_years,
-                        'monthly_payment': monthly_payment
+                        'monthly_payment': monthly_payment,
+                        'apr': apr,
+                        'fees': fees,
+                        'balloon': balloon,
+                        'monthly_overpayment': overpayment
                     }
                 })
     
@@ -200,7 +291,9 @@ def show():
                         'amount': requested_amount,
                         'term_years': loan_term_years,
                         'interest_rate': interest_rate,
-                        'monthly_payment': monthly_payment
+                        'monthly_payment': monthly_payment,
+                        'balloon': balloon,
+                        'fees': fees
                     },
                     'risk_factors': risk_factors
                 }
@@ -221,7 +314,7 @@ def show():
                         ### 🎉 Loan Approved!
                         
                         **Approved Amount:** £{decision.get('approved_amount', 0):,.0f}
-                        **Interest Rate:** {decision.get('interest_rate', 0):.2f}%
+                        **Interest Rate:** {decision.get('interest_rate', 0):.2f}% (APR {decision.get('apr', 0):.1f}%)
                         **Term:** {decision.get('term_years', 0)} years
                         **Monthly Payment:** £{decision.get('monthly_payment', 0):,.2f}
                         
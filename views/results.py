@@ -7,6 +7,7 @@ import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
+from utils.stress import stress_frame
 
 def show():
     st.markdown('<h1 class="main-header">📊 Results & Analytics</h1>', unsafe_allow_html=True)
@@ -42,6 +43,16 @@ def show():
         **Application ID:** {decision.get('application_id', 'N/A')}
         **Decision Date:** {decision.get('decision_date', 'N/A')}
         """)
+        counterfactual = decision.get('counterfactual')
+        if counterfactual and counterfactual['approvable']:
+            st.info(
+                f"💡 **What would get this approved:** borrowing at most "
+                f"£{counterfactual['max_amount']:,.2f}, i.e. £{counterfactual['reduction']:,.2f} less "
+                f"(or a deposit that much larger). The loan term does not affect approval."
+            )
+        elif counterfactual:
+            st.info("💡 No lower loan amount would get this approved: "
+                    + '; '.join(counterfactual['blocking_reasons']))
     
     # Key Metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -57,7 +68,8 @@ def show():
         st.metric(
             "Interest Rate",
             f"{decision.get('interest_rate', 0):.2f}%",
-            delta="APR"
+            delta=f"APR {decision.get('apr', 0):.1f}%",
+            delta_color="off"
         )
     
     with col3:
@@ -227,11 +239,15 @@ def show():
             'status': decision.get('status'),
             'approved_amount': decision.get('approved_amount'),
             'interest_rate': decision.get('interest_rate'),
+            'apr': decision.get('apr'),
+            'fees': decision.get('fees'),
             'term_years': decision.get('term_years'),
             'monthly_payment': decision.get('monthly_payment'),
             'total_payable': decision.get('monthly_payment', 0) * decision.get('term_years', 0) * 12,
             'reason': decision.get('reason', 'N/A'),
-            'conditions': decision.get('conditions', [])
+            'conditions': decision.get('conditions', []),
+            'counterfactual': decision.get('counterfactual'),
+            'policy_version': decision.get('policy_version')
         })
     
     with tab2:
@@ -293,6 +309,28 @@ def show():
             </div>
             """, unsafe_allow_html=True)
         
+        stress = decision.get('stress_test')
+        if stress:
+            st.markdown("#### Affordability Stress Test")
+            st.caption(
+                f"Passes {stress['scenarios_passed']} of {stress['scenarios']} scenarios "
+                f"(rate rises × income drops × depreciation paths)."
+            )
+            failure = stress.get('first_failure')
+            if failure:
+                st.warning(
+                    f"First fails at +{failure['rate_shock']:.1f}pp rate, "
+                    f"-{failure['income_shock']:.0%} income, {failure['depreciation_path']} depreciation."
+                )
+            path = st.selectbox("Depreciation path", stress['depreciation_paths'],
+                                index=stress['depreciation_paths'].index('base'))
+            surface = stress_frame(stress)
+            table = surface[surface['depreciation_path'] == path].pivot(
+                index='rate_shock', columns='income_shock', values='passed')
+            table.index = [f"+{shock:.1f}pp rate" for shock in table.index]
+            table.columns = [f"-{shock:.0%} income" for shock in table.columns]
+            st.dataframe(table.map(lambda passed: "✅" if passed else "❌"), use_container_width=True)
+
         with st.expander("Full Risk Analysis"):
             st.json(decision.get('risk_analysis', {}))
     